@@ -1,11 +1,12 @@
+import asyncio
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
-from sqlalchemy import pool
+from sqlalchemy import inspect, pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
-from data.config import DATABASE_NAME
+from data.config import DATABASE_URL
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -57,29 +58,45 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    """Run migrations in 'online' mode.
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection, target_metadata=target_metadata
+    )
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
+    with context.begin_transaction():
+        # The revision history before PostgreSQL support only runs on SQLite, so an empty database of any other
+        # backend is created from the models and stamped with the current head
+        if connection.dialect.name != 'sqlite' and len(inspect(connection).get_table_names()) == 0:
+            target_metadata.create_all(connection)
+            context.get_context().stamp(context.script, 'heads')
+        else:
+            context.run_migrations()
 
-    """
-    connectable = engine_from_config(
+
+async def run_async_migrations() -> None:
+    connectable = async_engine_from_config(
         config.get_section(config.config_ini_section),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
 
-        with context.begin_transaction():
-            context.run_migrations()
+    await connectable.dispose()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode.
+
+    In this scenario we need to create an Engine
+    and associate a connection with the context.
+
+    """
+    asyncio.run(run_async_migrations())
 
 
-config.set_main_option('sqlalchemy.url', f'sqlite:///{DATABASE_NAME}')
+config.set_main_option('sqlalchemy.url', DATABASE_URL.replace('%', '%%'))
 
 if context.is_offline_mode():
     run_migrations_offline()
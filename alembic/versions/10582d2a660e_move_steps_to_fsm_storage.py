@@ -0,0 +1,80 @@
+"""move steps and editing tables to fsm storage
+
+Revision ID: 10582d2a660e
+Revises: dce42c5cb937
+Create Date: 2026-10-18 12:04:31.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '10582d2a660e'
+down_revision = 'dce42c5cb937'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index(op.f('ix_organizer_to_user_achievement_user_id'), table_name='organizer_to_user_achievement')
+    op.drop_index(op.f('ix_organizer_to_user_achievement_organizer_id'), table_name='organizer_to_user_achievement')
+    op.drop_table('organizer_to_user_achievement')
+    op.drop_index(op.f('ix_user_rate_user_id'), table_name='user_rate')
+    op.drop_index(op.f('ix_user_rate_org_id'), table_name='user_rate')
+    op.drop_table('user_rate')
+    op.drop_index(op.f('ix_event_editors_user_id'), table_name='event_editors')
+    op.drop_index(op.f('ix_event_editors_event_id'), table_name='event_editors')
+    op.drop_table('event_editors')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('step')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('step', sa.Enum(
+            'NONE', 'FIRST_NAME', 'MIDDLE_NAME', 'LAST_NAME', 'PHONE', 'EMAIL', 'ACHIEVEMENT_NAME',
+            'ACHIEVEMENT_IMAGE', 'EVENT_NAME', 'NEW_ORGANIZER_ID', 'INTEREST_NAME_FOR_ADD',
+            'INTEREST_NAME_FOR_REMOVE', 'GROUP_NAME_FOR_ADD', 'GROUP_NAME_FOR_REMOVE', 'FEEDBACK_TEXT',
+            'VERIFICATION_PRESENT', 'NEW_MODER_ID', 'FIRST_NAME_ONLY', 'MIDDLE_NAME_ONLY', 'LAST_NAME_ONLY',
+            'PHONE_ONLY', 'EMAIL_ONLY', 'EVENT_DESCRIPTION', 'EVENT_DATE', 'EVENT_LOCATION', 'ADD_FRIEND',
+            'GIVE_RATING', 'GIVE_ACHIEVEMENT', name='step'), nullable=True))
+    op.create_table('event_editors',
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index(op.f('ix_event_editors_event_id'), 'event_editors', ['event_id'], unique=False)
+    op.create_index(op.f('ix_event_editors_user_id'), 'event_editors', ['user_id'], unique=False)
+    op.create_table('user_rate',
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('org_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['org_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index(op.f('ix_user_rate_org_id'), 'user_rate', ['org_id'], unique=False)
+    op.create_index(op.f('ix_user_rate_user_id'), 'user_rate', ['user_id'], unique=False)
+    op.create_table('organizer_to_user_achievement',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('updated_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('organizer_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['organizer_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+    op.create_index(op.f('ix_organizer_to_user_achievement_organizer_id'), 'organizer_to_user_achievement', ['organizer_id'], unique=False)
+    op.create_index(op.f('ix_organizer_to_user_achievement_user_id'), 'organizer_to_user_achievement', ['user_id'], unique=False)
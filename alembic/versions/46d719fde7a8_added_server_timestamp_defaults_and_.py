@@ -0,0 +1,50 @@
+"""added server timestamp defaults and time indexes
+
+Revision ID: 46d719fde7a8
+Revises: 3bbeb826b6f1
+Create Date: 2026-10-18 11:41:04.792666
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '46d719fde7a8'
+down_revision = '3bbeb826b6f1'
+branch_labels = None
+depends_on = None
+
+tables = ('achievement', 'event', 'event_codes', 'event_feedback_summary', 'event_feedbacks', 'event_groups',
+          'event_interests', 'event_users', 'interest', 'local_group', 'user', 'user_achievements', 'user_friends',
+          'user_groups', 'user_interests')
+
+
+def timestamp_now():
+    if op.get_bind().dialect.name == 'sqlite':
+        return sa.text("(strftime('%Y-%m-%d %H:%M:%f000', 'now', 'localtime'))")
+    return sa.func.now()
+
+
+def upgrade() -> None:
+    for table in tables:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.TIMESTAMP(), existing_nullable=False,
+                                  server_default=timestamp_now())
+            batch_op.alter_column('updated_at', existing_type=sa.TIMESTAMP(), existing_nullable=False,
+                                  server_default=timestamp_now())
+        op.create_index(op.f(f'ix_{table}_created_at'), table, ['created_at'], unique=False)
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+    op.create_index(op.f('ix_event_date'), 'event', ['date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_event_date'), table_name='event')
+    for table in tables:
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_index(op.f(f'ix_{table}_created_at'), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.TIMESTAMP(), existing_nullable=False,
+                                  server_default=None)
+            batch_op.alter_column('created_at', existing_type=sa.TIMESTAMP(), existing_nullable=False,
+                                  server_default=None)
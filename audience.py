@@ -0,0 +1,86 @@
+import asyncio
+import time
+from typing import Dict, Set, List, Iterable, Optional
+
+from sqlalchemy import select
+
+from data import config
+from models import User, UserGroups, UserInterests
+from models.dbsession import AsyncDBSession
+
+
+class AudienceIndex(object):
+    chunk_size: int
+    ttl: float
+
+    def __init__(self, chunk_size: int, ttl: float):
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.users: Set[int] = set()
+        self.groups: Dict[int, Set[int]] = {}
+        self.interests: Dict[int, Set[int]] = {}
+        self.loaded = False
+        self.expires_at = 0.0
+        self.pending: Optional[list] = None
+        self.lock = asyncio.Lock()
+
+    async def ensure_loaded(self, db_session: AsyncDBSession):
+        if self.loaded and self.expires_at > time.monotonic():
+            return
+        async with self.lock:
+            if not self.loaded or self.expires_at <= time.monotonic():
+                await self.load(db_session)
+
+    async def load(self, db_session: AsyncDBSession):
+        self.pending = []
+        expires_at = time.monotonic() + self.ttl
+        try:
+            users = set()
+            async for chunk in (await db_session.stream(
+                    select(User.id).execution_options(yield_per=self.chunk_size))).partitions():
+                users.update(uid for uid, in chunk)
+            groups = await self.load_members(db_session, UserGroups.group_id, UserGroups.user_id)
+            interests = await self.load_members(db_session, UserInterests.interest_id, UserInterests.user_id)
+
+            self.users, self.groups, self.interests = users, groups, interests
+            self.loaded, self.expires_at = True, expires_at
+            for change in self.pending:
+                self.apply(*change)
+        finally:
+            self.pending = None
+
+    async def load_members(self, db_session: AsyncDBSession, key_column, user_column) -> Dict[int, Set[int]]:
+        members = {}
+        async for chunk in (await db_session.stream(
+                select(key_column, user_column).execution_options(yield_per=self.chunk_size))).partitions():
+            for key, uid in chunk:
+                members.setdefault(key, set()).add(uid)
+        return members
+
+    def apply(self, kind: str, key: Optional[int], uid: int, attach: bool):
+        if self.pending is not None:
+            self.pending.append((kind, key, uid, attach))
+            return
+        if not self.loaded:
+            return
+
+        if kind == 'user':
+            (self.users.add if attach else self.users.discard)(uid)
+            return
+        index = self.groups if kind == 'group' else self.interests
+        if attach:
+            index.setdefault(key, set()).add(uid)
+        elif key in index:
+            index[key].discard(uid)
+
+    def audience(self, group_ids: Iterable[int], interest_ids: Iterable[int], exclude: Iterable[int]) -> List[int]:
+        candidates = self.users
+        group_ids, interest_ids = list(group_ids), list(interest_ids)
+        if len(group_ids) != 0:
+            candidates = set().union(*(self.groups.get(gid, ()) for gid in group_ids))
+        if len(interest_ids) != 0:
+            candidates = candidates & set().union(*(self.interests.get(iid, ()) for iid in interest_ids))
+        return sorted(candidates.difference(exclude))
+
+
+audience_index = AudienceIndex(config.AUDIENCE_CHUNK_SIZE, config.AUDIENCE_TTL)
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import random
+import time
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from audience import audience_index
+from benchmarks.common import LATENCY_HEADERS, latency_columns, print_table, run_concurrently
+from cache import UserStateCache
+from controller import AsyncController
+from data import config
+from database import create_database_engine
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from loadtest import create_schema, temporary_database_url
+from models import User, Event, EventUsers, Interest, LocalGroup, UserGroups, UserInterests
+from models.dbsession import AsyncDBSession
+from models.event import EventGroups, EventInterests
+
+
+async def insert_chunked(connection, model, rows: list):
+    for start in range(0, len(rows), config.SYNC_BATCH_SIZE):
+        await connection.execute(insert(model), rows[start:start + config.SYNC_BATCH_SIZE])
+
+
+async def seed(engine, args) -> dict:
+    users = range(1, args.users + 1)
+    async with engine.begin() as connection:
+        await insert_chunked(connection, User, [{'id': uid, 'first_name': f'User{uid}', 'rank': Rank.USER,
+                                                 'rating': 0} for uid in users])
+        await insert_chunked(connection, LocalGroup, [{'id': gid, 'name': f'Группа{gid}'}
+                                                      for gid in range(1, args.groups + 1)])
+        await insert_chunked(connection, Interest, [{'id': iid, 'name': f'Интерес{iid}'}
+                                                    for iid in range(1, args.interests + 1)])
+        await insert_chunked(connection, UserGroups, [
+            {'user_id': uid, 'group_id': gid} for uid in users
+            for gid in random.sample(range(1, args.groups + 1), random.randint(1, 3))])
+        await insert_chunked(connection, UserInterests, [
+            {'user_id': uid, 'interest_id': iid} for uid in users
+            for iid in random.sample(range(1, args.interests + 1), random.randint(0, 5))])
+
+        events = {}
+        for eid, groups in enumerate(args.event_groups, 1):
+            await connection.execute(insert(Event).values(id=eid, name=f'Event{eid}', status=StatusEvent.UNFINISHED))
+            await insert_chunked(connection, EventGroups, [
+                {'event_id': eid, 'group_id': gid} for gid in random.sample(range(1, args.groups + 1), groups)])
+            await insert_chunked(connection, EventInterests, [
+                {'event_id': eid, 'interest_id': iid} for iid in random.sample(range(1, args.interests + 1), 2)])
+            await insert_chunked(connection, EventUsers, [
+                {'event_id': eid, 'user_id': uid} for uid in random.sample(users, args.participants)])
+            events[eid] = groups
+    return events
+
+
+def nested_subquery_audience(eid: int):
+    return select(User.id).where(
+        User.id.not_in(select(EventUsers.user_id).where(EventUsers.event_id == eid)),
+        User.id.in_(select(UserGroups.user_id).join(EventGroups, EventGroups.group_id == UserGroups.group_id)
+                    .where(EventGroups.event_id == eid)),
+        User.id.in_(select(UserInterests.user_id).join(EventInterests,
+                                                       EventInterests.interest_id == UserInterests.interest_id)
+                    .where(EventInterests.event_id == eid))).order_by(User.id)
+
+
+async def main(args):
+    random.seed(args.seed)
+    engine = create_database_engine(args.database or temporary_database_url('audience.db'))
+    await create_schema(engine)
+    events = await seed(engine, args)
+
+    def create_controller() -> AsyncController:
+        return AsyncController(AsyncDBSession(AsyncSession(engine)), UserStateCache(1, 1), MemoryStorage())
+
+    controller = create_controller()
+    start = time.perf_counter()
+    await audience_index.ensure_loaded(controller.db_session)
+    load_seconds = time.perf_counter() - start
+    await controller.db_session.close_session()
+
+    rows = []
+    try:
+        for eid, groups in events.items():
+            async with AsyncSession(engine) as session:
+                expected = (await session.scalars(nested_subquery_audience(eid))).all()
+                event = await session.get(Event, eid)
+
+            async def nested_subqueries(index: int):
+                async with AsyncSession(engine) as session:
+                    (await session.scalars(nested_subquery_audience(eid))).all()
+
+            async def id_sets(index: int):
+                controller = create_controller()
+                try:
+                    assert await controller.get_event_audience(event) == expected
+                finally:
+                    await controller.db_session.close_session()
+
+            for name, operation in (('nested subqueries', nested_subqueries), ('id sets', id_sets)):
+                latencies, seconds = await run_concurrently(operation, args.runs, 1)
+                rows.append([name, groups, len(expected), *latency_columns(latencies, seconds)])
+    finally:
+        await engine.dispose()
+
+    print(f'Index of {args.users} users, {len(audience_index.groups)} groups and {len(audience_index.interests)} interests '
+          f'loaded in {load_seconds:.2f} s\n')
+    print_table(('method', 'groups', 'audience', *LATENCY_HEADERS), rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Event audience computation with SQL subqueries and id sets')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--groups', type=int, default=500)
+    parser.add_argument('--interests', type=int, default=50)
+    parser.add_argument('--event-groups', type=int, nargs='+', default=[1, 10, 100, 500],
+                        help='number of groups targeted by each event')
+    parser.add_argument('--participants', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', help='empty database URL, a temporary SQLite file by default')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
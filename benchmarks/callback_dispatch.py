@@ -0,0 +1,66 @@
+import argparse
+import timeit
+
+from aiogram.types import CallbackQuery
+
+from benchmarks.common import print_table
+from cache import UserState
+from callbacks import callbacks, get_callback, unknown_callback
+from enums.ranks import Rank
+from enums.steps import Step
+from models.basemodel import Base
+
+
+def linear_callback(user, query):
+    for callback in callbacks:
+        if callback.can_callback(user, query):
+            return callback
+    return unknown_callback
+
+
+def sample_data() -> list:
+    names = [table.name for table in Base.metadata.sorted_tables] + [
+        callback.model_name for callback in callbacks if hasattr(callback, 'model_name')]
+    data = []
+    for prefix in dict.fromkeys(prefix for callback in callbacks for prefix in callback.prefixes):
+        data += [f'{prefix}_{suffix}' for suffix in ('1', 'all_n_1', 'my_n_1', 'csv_1', 'jsonl_1', 'n_1_1')]
+        data += [f'{prefix}_{name}{suffix}' for name in names for suffix in ('', '_1')]
+    return data
+
+
+def sample_queries() -> list:
+    samples = {}
+    for data in sample_data():
+        query = CallbackQuery(id='1', chat_instance='1', data=data)
+        for rank in Rank:
+            user = UserState(1, rank, Step.NONE)
+            callback = linear_callback(user, query)
+            prefix = data.split('_', 1)[0]
+            if prefix in callback.prefixes:
+                samples.setdefault((type(callback).__name__, prefix), (user, query, callback))
+    samples[('UnknownCallback', 'nope')] = (UserState(1, Rank.USER, Step.NONE),
+                                           CallbackQuery(id='1', chat_instance='1', data='nope_1'),
+                                           unknown_callback)
+    return sorted(samples.items())
+
+
+def main(args):
+    rows = []
+    for (name, prefix), (user, query, callback) in sample_queries():
+        assert get_callback(user, query) is callback
+        linear = min(timeit.repeat(lambda: linear_callback(user, query), number=args.number, repeat=args.repeat))
+        indexed = min(timeit.repeat(lambda: get_callback(user, query), number=args.number, repeat=args.repeat))
+        rows.append([name, prefix, f'{linear / args.number * 1e9:.0f}', f'{indexed / args.number * 1e9:.0f}',
+                     f'{linear / indexed:.1f}x'])
+    print_table(('callback', 'prefix', 'linear ns', 'indexed ns', 'speedup'), rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Cost of resolving a callback query to its handler')
+    parser.add_argument('--number', type=int, default=20000, help='dispatches per timing')
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(parse_args())
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import LATENCY_HEADERS, latency_columns, print_table, run_concurrently
+from cache import UserStateCache
+from checkin import check_in_sessions
+from controller import AsyncController
+from database import create_database_engine
+from enums.ranks import Rank
+from enums.status_attendion import StatusAttendion
+from enums.status_event import StatusEvent
+from loadtest import create_schema, temporary_database_url
+from models import User, Event, EventUsers
+from models.dbsession import AsyncDBSession
+from models.event import EventCodes
+
+EVENT_ID = 1
+
+
+async def seed(engine, participants: int) -> list:
+    codes = [f'{uid:08}' for uid in range(1, participants + 1)]
+    async with engine.begin() as connection:
+        await connection.execute(insert(Event).values(id=EVENT_ID, name='Event', status=StatusEvent.UNFINISHED))
+        await connection.execute(insert(User), [{'id': uid, 'first_name': f'User{uid}', 'rank': Rank.USER,
+                                                 'rating': 0} for uid in range(1, participants + 1)])
+        await connection.execute(insert(EventUsers), [{'event_id': EVENT_ID, 'user_id': uid}
+                                                      for uid in range(1, participants + 1)])
+        await connection.execute(insert(EventCodes), [{'event_id': EVENT_ID, 'user_id': uid, 'code': code}
+                                                      for uid, code in enumerate(codes, 1)])
+    return codes
+
+
+async def per_code_commit(engine, code: str):
+    async with AsyncSession(engine) as session:
+        event_code = (await session.scalars(select(EventCodes).where(EventCodes.code == code))).one()
+        event_user = (await session.scalars(select(EventUsers).where(
+            EventUsers.event_id == event_code.event_id, EventUsers.user_id == event_code.user_id))).one()
+        event_user.status_attendion = StatusAttendion.ARRIVED
+        await session.delete(event_code)
+        await session.commit()
+
+
+async def scan_session_flush(engine, codes: list):
+    controller = AsyncController(AsyncDBSession(AsyncSession(engine)), UserStateCache(1, 1), MemoryStorage())
+    try:
+        checked_in, unknown = await controller.check_in_codes(EVENT_ID, codes)
+        await controller.save()
+    finally:
+        await controller.db_session.close_session()
+    assert len(checked_in) == len(codes) and len(unknown) == 0
+
+
+async def measure(args, batch: int) -> list:
+    engine = create_database_engine(args.database or temporary_database_url('check_in.db'))
+
+    async def check_in(index: int):
+        if batch == 0:
+            await per_code_commit(engine, batches[index][0])
+        else:
+            await scan_session_flush(engine, batches[index])
+
+    try:
+        await create_schema(engine)
+        codes = await seed(engine, args.participants)
+        batches = [codes[start:start + (batch or 1)] for start in range(0, len(codes), batch or 1)]
+        latencies, seconds = await run_concurrently(check_in, len(batches), args.moderators)
+        async with engine.connect() as connection:
+            arrived = await connection.scalar(select(func.count()).select_from(EventUsers).where(
+                EventUsers.status_attendion == StatusAttendion.ARRIVED))
+    finally:
+        check_in_sessions.finish(EVENT_ID)
+        await engine.dispose()
+
+    assert arrived == len(codes)
+    return ['per-code commit' if batch == 0 else f'scan session, {batch} per flush',
+            *latency_columns(latencies, seconds), f'{len(codes) / seconds:.1f}']
+
+
+async def main(args):
+    rows = [await measure(args, 0)]
+    for batch in args.batches:
+        rows.append(await measure(args, batch))
+    print_table(('mode', *LATENCY_HEADERS, 'check-ins/s'), rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Check-in throughput of per-code commits and batched scan sessions')
+    parser.add_argument('--participants', type=int, default=5000)
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 10, 100],
+                        help='codes sent in one message')
+    parser.add_argument('--moderators', type=int, default=4, help='moderators scanning concurrently')
+    parser.add_argument('--database', help='empty database URL, a temporary SQLite file by default')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
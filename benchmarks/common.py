@@ -0,0 +1,62 @@
+import asyncio
+import time
+from typing import List, Sequence, Tuple, Callable, Awaitable
+
+from loadtest import percentile
+
+LATENCY_HEADERS = ('ops', 'ops/s', 'p50 ms', 'p95 ms', 'p99 ms')
+
+
+def latency_columns(latencies: List[float], seconds: float) -> list:
+    return [len(latencies), f'{len(latencies) / seconds:.1f}',
+            *(f'{percentile(latencies, q) * 1000:.1f}' for q in (50, 95, 99))]
+
+
+def print_table(headers: Sequence[str], rows: Sequence[Sequence]):
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in (headers, *rows):
+        print('  '.join(str(value).ljust(width) if index == 0 else str(value).rjust(width)
+                        for index, (value, width) in enumerate(zip(row, widths))))
+
+
+async def run_concurrently(operation: Callable[[int], Awaitable], count: int,
+                           concurrency: int) -> Tuple[List[float], float]:
+    pending = iter(range(count))
+    latencies = []
+
+    async def worker():
+        for index in pending:
+            start = time.perf_counter()
+            await operation(index)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, count))))
+    return latencies, time.perf_counter() - start
+
+
+class LoopLagProbe(object):
+    interval: float
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.lags = []
+        self.task = None
+
+    def start(self):
+        self.lags = []
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> List[float]:
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        return self.lags or [0.0]
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
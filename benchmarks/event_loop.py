@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from benchmarks.common import LATENCY_HEADERS, LoopLagProbe, latency_columns, print_table, run_concurrently
+from controller import AsyncController
+from data import config
+from database import create_database_engine, set_pragmas
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from loadtest import create_schema, percentile
+from models import User, Event, EventUsers
+
+
+async def seed(engine, users: int, events: int):
+    now = datetime.datetime.now()
+    async with engine.begin() as connection:
+        await connection.execute(insert(User), [{'id': uid, 'first_name': f'User{uid}', 'rank': Rank.USER, 'rating': 0}
+                                                for uid in range(1, users + 1)])
+        await connection.execute(insert(Event), [
+            {'name': f'Event{eid}', 'description': '-', 'date': now + datetime.timedelta(days=eid), 'lat': 0.0,
+             'lng': 0.0, 'status': StatusEvent.UNFINISHED} for eid in range(1, events + 1)])
+        await connection.execute(insert(EventUsers), [
+            {'event_id': eid, 'user_id': uid} for uid in range(1, users + 1)
+            for eid in random.sample(range(1, events + 1), min(5, events))])
+
+
+def feed_queries(uid: int):
+    return (select(User).where(User.id == uid),
+            AsyncController.events_not_participate_user_query(uid).order_by(Event.date, Event.id).limit(
+                config.EVENTS_PAGE_SIZE))
+
+
+async def measure(name: str, operation, args) -> list:
+    probe = LoopLagProbe()
+    probe.start()
+    latencies, seconds = await run_concurrently(operation, args.updates, args.concurrency)
+    lags = await probe.stop()
+    return [name, *latency_columns(latencies, seconds), f'{percentile(lags, 99) * 1000:.1f}',
+            f'{max(lags) * 1000:.1f}']
+
+
+async def main(args):
+    path = os.path.join(tempfile.mkdtemp(), 'event_loop.db')
+    engine = create_database_engine(f'sqlite+aiosqlite:///{path}')
+    await create_schema(engine)
+    await seed(engine, args.users, args.events)
+
+    sync_engine = create_engine(f'sqlite:///{path}')
+    event.listen(sync_engine, 'connect', set_pragmas(config.DATABASE_PROFILES[config.DATABASE_PROFILE]))
+
+    async def blocking_feed(index: int):
+        with Session(sync_engine) as session:
+            for query in feed_queries(random.randint(1, args.users)):
+                session.scalars(query).all()
+        await asyncio.sleep(args.api_latency / 1000)
+
+    async def async_feed(index: int):
+        async with AsyncSession(engine) as session:
+            for query in feed_queries(random.randint(1, args.users)):
+                (await session.scalars(query)).all()
+        await asyncio.sleep(args.api_latency / 1000)
+
+    rows = [await measure('sync session', blocking_feed, args), await measure('async session', async_feed, args)]
+    print_table(('mode', *LATENCY_HEADERS, 'lag p99 ms', 'lag max ms'), rows)
+
+    sync_engine.dispose()
+    await engine.dispose()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Handler latency and event loop lag with blocking and async '
+                                                 'database access')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--api-latency', type=float, default=20, help='simulated reply latency, ms')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
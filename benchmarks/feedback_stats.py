@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import logging
+import random
+
+from sqlalchemy import insert
+
+from benchmarks.common import LATENCY_HEADERS, latency_columns, print_table, run_concurrently
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from loadtest import FakeTelegram, callback_update, create_schema, start_bot
+from models import User, Event
+from models.event import EventFeedbacks, EventFeedbackSummary
+
+ORGANIZER = 1
+
+
+async def seed(engine, eid: int, feedbacks: int):
+    scores = [random.random() for _ in range(feedbacks)]
+    async with engine.begin() as connection:
+        await connection.execute(insert(Event).values(id=eid, name=f'Event{eid}', status=StatusEvent.FINISHED))
+        await connection.execute(insert(EventFeedbacks), [
+            {'event_id': eid, 'fb_text': f'Отзыв номер {number}: всё было хорошо, но хотелось бы больше времени',
+             'neutral': 1 - score, 'negative': 0.0, 'positive': score} for number, score in enumerate(scores)])
+        await connection.execute(insert(EventFeedbackSummary).values(
+            event_id=eid, count=feedbacks, neutral=feedbacks - sum(scores), negative=0.0, positive=sum(scores)))
+
+
+async def main(args):
+    api = FakeTelegram(args.api_latency / 1000)
+    telegrambot = start_bot(api, args.database)
+    await create_schema(telegrambot.engine)
+    async with telegrambot.engine.begin() as connection:
+        await connection.execute(insert(User).values(id=ORGANIZER, first_name='Organizer', rank=Rank.ORGANIZER,
+                                                     rating=0))
+
+    rows = []
+    try:
+        for eid, feedbacks in enumerate(args.sizes, 1):
+            await seed(telegrambot.engine, eid, feedbacks)
+            errors = []
+
+            async def click(index: int):
+                try:
+                    await telegrambot.dp.process_update(callback_update(ORGANIZER, f'fbst_{eid}'))
+                except Exception as e:
+                    errors.append(type(e).__name__)
+
+            latencies, seconds = await run_concurrently(click, args.clicks, 1)
+            rows.append([feedbacks, *latency_columns(latencies, seconds), len(errors), ', '.join(sorted(set(errors)))])
+    finally:
+        await telegrambot.on_shutdown(telegrambot.dp)
+
+    print_table(('feedbacks', *LATENCY_HEADERS, 'errors', 'error types'), rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Click-to-response latency of the feedback statistics view')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--clicks', type=int, default=50)
+    parser.add_argument('--api-latency', type=float, default=0, help='simulated Bot API latency, ms')
+    parser.add_argument('--database', help='empty database URL, a temporary SQLite file by default')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(main(parse_args()))
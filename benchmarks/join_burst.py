@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy import insert, select, func
+
+from benchmarks.common import LATENCY_HEADERS, LoopLagProbe, latency_columns, print_table, run_concurrently
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from loadtest import FakeTelegram, callback_update, create_schema, percentile, start_bot
+from models import User, Event
+from models.event import EventCodes
+
+EVENT_ID = 1
+FIRST_UID = 1000000
+
+
+async def seed(engine, users: int):
+    async with engine.begin() as connection:
+        await connection.execute(insert(Event).values(id=EVENT_ID, name='Нагрузочный тест',
+                                                      status=StatusEvent.UNFINISHED,
+                                                      date=datetime.datetime.now() + datetime.timedelta(days=1)))
+        await connection.execute(insert(User), [
+            {'id': uid, 'first_name': f'User{uid}', 'middle_name': '-', 'last_name': '-', 'phone': f'+7{uid}',
+             'email': f'user{uid}@example.com', 'rank': Rank.USER, 'rating': 0}
+            for uid in range(FIRST_UID, FIRST_UID + users)])
+
+
+async def main(args):
+    api = FakeTelegram(args.api_latency / 1000)
+    telegrambot = start_bot(api, args.database)
+    await create_schema(telegrambot.engine)
+    await seed(telegrambot.engine, args.users)
+
+    rows = []
+    try:
+        for name, prefix in (('join', 'tp'), ('code again', 'qr')):
+            errors = []
+            photos = api.calls['sendPhoto']
+
+            async def click(index: int):
+                try:
+                    await telegrambot.dp.process_update(callback_update(FIRST_UID + index, f'{prefix}_{EVENT_ID}'))
+                except Exception as e:
+                    errors.append(type(e).__name__)
+
+            probe = LoopLagProbe()
+            probe.start()
+            latencies, seconds = await run_concurrently(click, args.users, args.concurrency)
+            lags = await probe.stop()
+            rows.append([name, *latency_columns(latencies, seconds), len(errors), api.calls['sendPhoto'] - photos,
+                         f'{percentile(lags, 99) * 1000:.1f}'])
+
+        async with telegrambot.engine.connect() as connection:
+            codes = await connection.scalar(select(func.count(func.distinct(EventCodes.code))))
+    finally:
+        await telegrambot.on_shutdown(telegrambot.dp)
+
+    print_table(('phase', *LATENCY_HEADERS, 'errors', 'photos', 'lag p99 ms'), rows)
+    print(f'\nUnique codes: {codes} of {args.users}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Burst of users joining one event and requesting their codes')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--api-latency', type=float, default=0, help='simulated Bot API latency, ms')
+    parser.add_argument('--database', help='empty database URL, a temporary SQLite file by default')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(main(parse_args()))
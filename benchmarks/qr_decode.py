@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+import random
+from collections import namedtuple
+from io import BytesIO
+
+import qrcode
+from PIL import Image, ImageFilter
+from pyzbar.pyzbar import decode, ZBarSymbol
+
+from benchmarks.common import LATENCY_HEADERS, LoopLagProbe, latency_columns, print_table, run_concurrently
+from controller import read_code_from_photo, photo_sizes_for_decoding
+from loadtest import percentile
+
+TELEGRAM_SIDES = (90, 320, 800, 1280, 2560)
+
+PhotoSize = namedtuple('PhotoSize', 'width height data')
+
+
+def jpeg(image: Image.Image) -> bytes:
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=85)
+    return output.getvalue()
+
+
+def generate_photo(code: str, side: int) -> list:
+    background = Image.effect_noise((side, side), random.randint(20, 60)).convert('RGB')
+    qr_side = int(side * random.uniform(0.2, 0.5))
+    qr = qrcode.make(code).get_image().convert('RGB').resize((qr_side, qr_side))
+    qr = qr.rotate(random.uniform(-15, 15), expand=True, fillcolor=(255, 255, 255))
+    background.paste(qr, (random.randint(0, side - qr.width), random.randint(0, side - qr.height)))
+    photo = background.filter(ImageFilter.GaussianBlur(random.uniform(0, 1.2)))
+
+    sizes = []
+    for telegram_side in TELEGRAM_SIDES:
+        if telegram_side <= side:
+            size = photo.copy()
+            size.thumbnail((telegram_side, telegram_side))
+            sizes.append(PhotoSize(size.width, size.height, jpeg(size)))
+    return sizes
+
+
+def generate_corpus(photos: int, side: int) -> list:
+    return [(f'{number:08}', generate_photo(f'{number:08}', side)) for number in range(photos)]
+
+
+def get_code_from_full_size(data: bytes):
+    with Image.open(BytesIO(data)) as image:
+        symbols = decode(image, symbols=[ZBarSymbol.QRCODE])
+    return symbols[-1].data.decode('utf-8') if len(symbols) != 0 else None
+
+
+async def main(args):
+    random.seed(args.seed)
+    corpus = generate_corpus(args.photos, args.side)
+    rows = []
+
+    async def full_size_in_loop(index: int):
+        code, sizes = corpus[index % len(corpus)]
+        decoded[index] = get_code_from_full_size(sizes[-1].data) == code
+
+    async def pipeline(index: int):
+        code, sizes = corpus[index % len(corpus)]
+        for size in photo_sizes_for_decoding(sizes):
+            result = await read_code_from_photo(BytesIO(size.data))
+            if result is not None:
+                decoded[index] = result == code
+                return
+        decoded[index] = False
+
+    for name, operation in (('full size, event loop', full_size_in_loop), ('pipeline', pipeline)):
+        decoded = {}
+        probe = LoopLagProbe()
+        probe.start()
+        latencies, seconds = await run_concurrently(operation, args.scans, args.concurrency)
+        lags = await probe.stop()
+        rows.append([name, *latency_columns(latencies, seconds), f'{sum(decoded.values()) / len(decoded):.1%}',
+                     f'{percentile(lags, 99) * 1000:.1f}'])
+
+    print_table(('mode', *LATENCY_HEADERS, 'decoded', 'lag p99 ms'), rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='QR code decoding throughput over generated photos')
+    parser.add_argument('--photos', type=int, default=50)
+    parser.add_argument('--side', type=int, default=2560, help='side of the original photo, px')
+    parser.add_argument('--scans', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import resource
+import sys
+
+from sqlalchemy import insert
+
+from benchmarks.common import print_table, run_concurrently
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from loadtest import FakeTelegram, callback_update, create_schema, message_update, start_bot
+from models import User, Event
+
+FIRST_UID = 1000000
+
+
+def rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+async def seed(engine, users: int, events: int):
+    now = datetime.datetime.now()
+    async with engine.begin() as connection:
+        await connection.execute(insert(Event), [
+            {'id': eid, 'name': f'Event{eid}', 'description': 'Описание', 'lat': 0.0, 'lng': 0.0,
+             'date': now + datetime.timedelta(days=eid), 'status': StatusEvent.UNFINISHED}
+            for eid in range(1, events + 1)])
+        await connection.execute(insert(User), [
+            {'id': uid, 'first_name': f'User{uid}', 'middle_name': '-', 'last_name': '-', 'phone': f'+7{uid}',
+             'email': f'user{uid}@example.com', 'rank': Rank.USER, 'rating': 0}
+            for uid in range(FIRST_UID, FIRST_UID + users)])
+
+
+def soak_update(index: int, users: int, events: int):
+    kind, step = index % 6, index // 6
+    uid = FIRST_UID + step % users
+    eid = step // users % events + 1
+    if kind == 0:
+        return callback_update(uid, f'tp_{eid}')
+    if kind == 1:
+        return callback_update(uid, f'qr_{eid}')
+    if kind == 2:
+        return callback_update(uid, f'evc_all_{eid}')
+    return message_update(uid, ('мой профиль', 'все мероприятия', 'мои мероприятия')[kind - 3])
+
+
+async def main(args) -> bool:
+    api = FakeTelegram(0)
+    telegrambot = start_bot(api, args.database)
+    await create_schema(telegrambot.engine)
+    await seed(telegrambot.engine, args.users, args.events)
+
+    samples = []
+    errors = []
+
+    async def process(index: int):
+        try:
+            await telegrambot.dp.process_update(soak_update(index, args.users, args.events))
+        except Exception as e:
+            errors.append(type(e).__name__)
+        if index % args.sample == 0:
+            samples.append((index, rss_mb()))
+
+    try:
+        await run_concurrently(process, args.updates, args.concurrency)
+    finally:
+        await telegrambot.on_shutdown(telegrambot.dp)
+
+    samples.sort()
+    warm = next(rss for index, rss in samples if index >= args.updates * args.warmup)
+    growth = samples[-1][1] - warm
+    print_table(('updates', 'peak rss MB'), [(index, f'{rss:.1f}') for index, rss in samples])
+    print(f'\nErrors: {len(errors)} {", ".join(sorted(set(errors)))}')
+    print(f'RSS growth after warm-up: {growth:.1f} MB (limit {args.max_growth} MB)')
+    return growth <= args.max_growth and len(errors) == 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Soak test: peak RSS while the dispatcher processes many updates')
+    parser.add_argument('--updates', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--sample', type=int, default=10000, help='updates between RSS samples')
+    parser.add_argument('--warmup', type=float, default=0.2, help='share of updates before the baseline sample')
+    parser.add_argument('--max-growth', type=float, default=25, help='allowed RSS growth after warm-up, MB')
+    parser.add_argument('--database', help='empty database URL, a temporary SQLite file by default')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.CRITICAL)
+    sys.exit(0 if asyncio.run(main(parse_args())) else 1)
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.common import LATENCY_HEADERS, latency_columns, print_table, run_concurrently
+from data import config
+from database import create_database_engine
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from models import User, Event
+from models.basemodel import Base
+from models.event import EventFeedbacks
+
+EVENT_ID = 1
+
+
+async def seed(engine, users: int):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(Event).values(id=EVENT_ID, name='Event', status=StatusEvent.FINISHED))
+        await connection.execute(insert(User), [{'id': uid, 'first_name': f'User{uid}', 'rank': Rank.USER, 'rating': 0}
+                                                for uid in range(1, users + 1)])
+
+
+async def measure(engine, args, concurrency: int) -> list:
+    errors = []
+
+    async def write(index: int):
+        uid = index % args.users + 1
+        try:
+            async with AsyncSession(engine) as session:
+                await session.scalar(select(User.rating).where(User.id == uid))
+                await session.execute(update(User).where(User.id == uid).values(rating=User.rating + 1))
+                await session.execute(insert(EventFeedbacks).values(event_id=EVENT_ID, fb_text=f'Отзыв {index}'))
+                await session.commit()
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+    latencies, seconds = await run_concurrently(write, args.commits, concurrency)
+    return [*latency_columns(latencies, seconds), len(errors), ', '.join(sorted(set(errors)))]
+
+
+async def main(args):
+    databases = [(f'sqlite {profile}', f'sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), "contention.db")}',
+                  profile) for profile in args.profiles]
+    databases += [(url.split(':', 1)[0], url, config.DATABASE_PROFILE) for url in args.database]
+
+    rows = []
+    for name, url, profile in databases:
+        engine = create_database_engine(url, profile)
+        await seed(engine, args.users)
+        try:
+            for concurrency in args.concurrency:
+                rows.append([name, concurrency, *await measure(engine, args, concurrency)])
+        finally:
+            await engine.dispose()
+
+    print_table(('database', 'writers', *LATENCY_HEADERS, 'errors', 'error types'), rows)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Concurrent commit throughput of each SQLite profile and '
+                                                 'other databases')
+    parser.add_argument('--profiles', nargs='+', default=list(config.DATABASE_PROFILES),
+                        choices=list(config.DATABASE_PROFILES))
+    parser.add_argument('--database', nargs='*', default=[],
+                        help='URLs of databases to compare with SQLite, their tables are recreated')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--commits', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=1000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(main(parse_args()))
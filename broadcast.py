@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Optional, List, Callable
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.exceptions import RetryAfter, TelegramAPIError
+
+from data import config
+
+
+class TokenBucket(object):
+    rate: float
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.resume_at:
+                    await asyncio.sleep(self.resume_at - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BroadcastJob(object):
+    id: int
+    bot: Bot
+    organizer_id: int
+    recipients: List[int]
+    text: str
+    report: Callable[['BroadcastJob'], str]
+    reply_markup: Optional[InlineKeyboardMarkup]
+
+    def __init__(self, jid: int, bot: Bot, organizer_id: int, recipients: List[int], text: str,
+                 report: Callable[['BroadcastJob'], str],
+                 reply_markup: Optional[InlineKeyboardMarkup] = None):
+        self.id = jid
+        self.bot = bot
+        self.organizer_id = organizer_id
+        self.recipients = recipients
+        self.text = text
+        self.report = report
+        self.reply_markup = reply_markup
+        self.sent = 0
+        self.failed = 0
+        self.done = asyncio.Event()
+
+    @property
+    def total(self) -> int:
+        return len(self.recipients)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+
+class Broadcaster(object):
+    bucket: TokenBucket
+    concurrency: int
+    max_retries: int
+
+    def __init__(self, rate: float, concurrency: int, max_retries: int):
+        self.bucket = TokenBucket(rate, rate)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.jobs = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.ids = itertools.count(1)
+
+    @property
+    def pending_jobs(self) -> int:
+        return 0 if self.queue is None else self.queue.qsize()
+
+    @property
+    def pending_messages(self) -> int:
+        return sum(job.total - job.processed for job in self.jobs.values())
+
+    def submit(self, bot: Bot, organizer_id: int, recipients: List[int], text: str,
+               report: Callable[[BroadcastJob], str],
+               reply_markup: Optional[InlineKeyboardMarkup] = None) -> BroadcastJob:
+        if self.worker is None or self.worker.done():
+            self.queue = asyncio.Queue()
+            self.worker = asyncio.create_task(self.work())
+        job = BroadcastJob(next(self.ids), bot, organizer_id, recipients, text, report, reply_markup)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+
+    async def work(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self.run(job)
+            except Exception:
+                logging.exception(f'Broadcast job {job.id} failed')
+            finally:
+                job.done.set()
+                self.jobs.pop(job.id, None)
+                self.queue.task_done()
+
+    async def run(self, job: BroadcastJob):
+        recipients = iter(job.recipients)
+        await asyncio.gather(*(self.send_all(job, recipients) for _ in range(min(self.concurrency, job.total))))
+        await self.send(job.bot, job.organizer_id, job.report(job))
+
+    async def send_all(self, job: BroadcastJob, recipients):
+        for uid in recipients:
+            if await self.send(job.bot, uid, job.text, job.reply_markup):
+                job.sent += 1
+            else:
+                job.failed += 1
+
+    async def send(self, bot: Bot, chat_id: int, text: str, reply_markup=None) -> bool:
+        for _ in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, reply_markup=reply_markup)
+                return True
+            except RetryAfter as e:
+                self.bucket.pause(e.timeout)
+            except TelegramAPIError as e:
+                logging.warning(f'Broadcast to {chat_id} failed: {e}')
+                return False
+            except Exception:
+                logging.exception(f'Broadcast to {chat_id} failed')
+                return False
+        return False
+
+
+broadcaster = Broadcaster(config.BROADCAST_RATE, config.BROADCAST_CONCURRENCY, config.BROADCAST_MAX_RETRIES)
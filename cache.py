@@ -0,0 +1,92 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from enums.ranks import Rank
+from enums.steps import Step
+
+
+class UserState(object):
+    id: int
+    rank: Rank
+    step: Step
+    previous_step: Optional[Step]
+
+    def __init__(self, uid: int, rank: Rank, step: Step, previous_step: Optional[Step] = None):
+        self.id = uid
+        self.rank = rank
+        self.step = step
+        self.previous_step = previous_step
+
+    @classmethod
+    def from_user(cls, user) -> 'UserState':
+        return cls(user.id, user.rank, user.step, getattr(user, 'previous_step', None))
+
+
+class UserStateCache(object):
+    max_size: int
+    ttl: float
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._states = OrderedDict()
+
+    def get(self, uid: int) -> Optional[UserState]:
+        entry = self._states.get(uid)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._states[uid]
+            self.misses += 1
+            return None
+
+        self._states.move_to_end(uid)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, state: UserState):
+        self._states[state.id] = (time.monotonic() + self.ttl, state)
+        self._states.move_to_end(state.id)
+        while len(self._states) > self.max_size:
+            self._states.popitem(last=False)
+
+    def invalidate(self, uid: int):
+        self._states.pop(uid, None)
+
+    def __len__(self):
+        return len(self._states)
+
+
+class FileIdCache(object):
+    max_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._file_ids = OrderedDict()
+
+    def get(self, key) -> Optional[str]:
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            self.misses += 1
+            return None
+
+        self._file_ids.move_to_end(key)
+        self.hits += 1
+        return file_id
+
+    def put(self, key, file_id: str):
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_size:
+            self._file_ids.popitem(last=False)
+
+    def __len__(self):
+        return len(self._file_ids)
@@ -1,22 +1,30 @@
+import os
 from abc import ABC, abstractmethod
+from io import BytesIO
 
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InputFile, Message
 from sqlalchemy.exc import NoResultFound
 
-from controller import Controller
+from broadcast import broadcaster
+from cache import FileIdCache
+from controller import AsyncController, read_qr_code_image
+from data import config
 from data.keyboards import change_user_data_keyboard, change_event_data_keyboard
 from enums.ranks import Rank
+from enums.status_attendion import StatusAttendion
 from enums.status_event import StatusEvent
 from enums.steps import Step
-from models import User, Interest, LocalGroup, UserInterests, UserGroups, EventEditors, EventInterests, EventGroups
-from models.achievement import OrganizerToUserAchievement
+from eventpages import render_events_page, send_event_card
+from export import write_event_export
+from models import User, Interest, LocalGroup, UserInterests, UserGroups, EventInterests, EventGroups
 from models.basemodel import BaseModel
-from models.user import OrganizerRateUser
 
 
 class Callback(ABC):
+    prefixes: tuple = ()
+
     @abstractmethod
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         pass
 
     @abstractmethod
@@ -25,7 +33,7 @@ class Callback(ABC):
 
 
 class UnknownCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
         await query.message.answer('Ты куда жмав?')
         await query.message.delete()
@@ -35,10 +43,12 @@ class UnknownCallback(Callback, ABC):
 
 
 class AcceptFriendRequestCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('acceptreq',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
         fid = query.data.split('_')[-1]
-        controller.accept_friend_request(user.id, fid)
+        await controller.accept_friend_request(user.id, fid)
         await query.message.answer('Вы приняли заявку в друзья!')
         await query.message.delete()
 
@@ -47,10 +57,12 @@ class AcceptFriendRequestCallback(Callback, ABC):
 
 
 class DeclineFriendRequestCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('declinereq',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
         fid = query.data.split('_')[-1]
-        controller.decline_friend_request(user.id, fid)
+        await controller.decline_friend_request(user.id, fid)
         await query.message.answer('Вы отклонили заявку в друзья.')
         await query.message.delete()
 
@@ -59,10 +71,12 @@ class DeclineFriendRequestCallback(Callback, ABC):
 
 
 class DeleteFriendCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('deletefr',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
         fid = query.data.split('_')[-1]
-        controller.delete_friend(user.id, fid)
+        await controller.delete_friend(user.id, fid)
         await query.message.answer('Вы удалили этого пользователя из друзей.')
         await query.message.delete()
 
@@ -70,8 +84,29 @@ class DeleteFriendCallback(Callback, ABC):
         return query.data.startswith('deletefr_') and user.rank == Rank.USER
 
 
+class ShowCodeCallback(Callback, ABC):
+    prefixes = ('qr',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
+
+        eid = int(query.data.split('_')[-1])
+        try:
+            code = (await controller.get_code_model_by_id(eid, user.id)).code
+            await query.message.answer(f'Ваш код, который вы должны предоставить модератору мероприятия: {code}\n'
+                                       f'Или QR-код:')
+            await answer_qr_code(query.message, code)
+        except NoResultFound:
+            await query.message.answer('Код для этого мероприятия не найден')
+
+    def can_callback(self, user: User, query: CallbackQuery) -> bool:
+        return query.data.startswith('qr_') and user.rank is Rank.USER
+
+
 class ChangeDataInEventCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('ech',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         name = None
@@ -79,8 +114,8 @@ class ChangeDataInEventCallback(Callback, ABC):
         _type = query.data.split('_')[-1]
         try:
             eid = int(_type)
-            controller.db_session.add_model(EventEditors(event_id=eid, user_id=user.id))
-            controller.save()
+            await controller.add_event_editor(eid, user.id)
+            await controller.save()
 
             await query.message.answer('Пожалуйста, выберите параметр, который Вы хотите изменить.',
                                        reply_markup=change_event_data_keyboard)
@@ -100,7 +135,7 @@ class ChangeDataInEventCallback(Callback, ABC):
                 user.step = Step.EVENT_LOCATION
                 name = 'локацию'
 
-            controller.save()
+            await controller.save()
             await query.message.answer(f'Пожалуйста, введите {name}')
 
     def can_callback(self, user: User, query: CallbackQuery) -> bool:
@@ -108,7 +143,9 @@ class ChangeDataInEventCallback(Callback, ABC):
 
 
 class ChangeDataInUserCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('change',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         name = None
@@ -134,7 +171,7 @@ class ChangeDataInUserCallback(Callback, ABC):
             user.step = Step.EMAIL_ONLY
             name = 'почту'
 
-        controller.save()
+        await controller.save()
         await query.message.answer(f'Пожалуйста, введите {name}')
 
     def can_callback(self, user: User, query: CallbackQuery) -> bool:
@@ -154,12 +191,13 @@ class ManageSomethingCallback(Callback, ABC):
         self.action = action
         self.step = step
         self.message = message
+        self.prefixes = (action,)
 
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         user.step = self.step
-        controller.save()
+        await controller.save()
 
         await query.message.answer(self.message)
 
@@ -169,31 +207,29 @@ class ManageSomethingCallback(Callback, ABC):
 
 
 class TakePartCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('tp',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         eid = int(query.data.split('_')[-1])
         try:
-            event = controller.get_event_by_id(eid)
-            if user in event.users or event.status == StatusEvent.FINISHED:
+            event = await controller.get_event_by_id(eid)
+            if await controller.has_user_in_event(event.id, user.id) or event.status == StatusEvent.FINISHED:
                 await query.message.answer("Вы уже принимаете участие в мероприятии или оно уже завершилось")
+            elif not await controller.add_user_to_event(event, user):
+                await query.message.answer("Вы уже принимаете участие в мероприятии")
             else:
-                event.users.append(user)
+                code = await controller.add_new_code(event, user) if user.rank == Rank.USER else None
+                await controller.save()
 
                 await query.message.answer('Поздравляем, Вы принимаете участие в мероприятии!')
 
-                if user.rank == Rank.USER:
-                    code, output = controller.generate_qr_code(event, user)
-
+                if code is not None:
                     await query.message.answer(
                         f'Ваш код, который вы должны предоставить модератору мероприятия: {code}\n'
                         f'Или QR-код:')
-                    try:
-                        await query.message.answer_photo(output)
-                    finally:
-                        output.close()
-
-                controller.save()
+                    await answer_qr_code(query.message, code)
         except NoResultFound:
             await query.message.answer('Такого мероприятия нет')
 
@@ -202,23 +238,25 @@ class TakePartCallback(Callback, ABC):
 
 
 class ManageUserAttachmentCallback(Callback, ABC):
-    def __init__(self, name, name_remove_form, model, relation_model, relation_column, _lambda):
+    prefixes = ('att', 'deatt')
+
+    def __init__(self, name, name_remove_form, model, relation_model, relation_column):
         self.name = name
         self.name_remove_form = name_remove_form
         self.model = model
         self.relation_model = relation_model
         self.relation_column = relation_column
-        self._lambda = _lambda
 
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         de_attach = query.data.startswith('de')
 
         if query.data.endswith(self.model.__tablename__):
-            entities = controller.get_entities_by_model_with_relationship(user, self.model, self.relation_model,
-                                                                          self.relation_column,
-                                                                          self.relation_model.user_id, de_attach)
+            entities = await controller.get_entities_by_model_with_relationship(user, self.model,
+                                                                                self.relation_model,
+                                                                                self.relation_column,
+                                                                                self.relation_model.user_id, de_attach)
             if len(entities) == 0:
                 await query.message.answer('Тут пусто')
             else:
@@ -230,9 +268,10 @@ class ManageUserAttachmentCallback(Callback, ABC):
         else:
             try:
                 eid = int(query.data.split('_')[-1])
-                entity = controller.get_entity_by_model_id(self.model, eid)
-                self._lambda(user, entity, not de_attach)
-                controller.save()
+                entity = await controller.get_entity_by_model_id(self.model, eid)
+                await controller.manage_relationship(user, entity, self.relation_model, self.relation_column,
+                                                     self.relation_model.user_id, not de_attach)
+                await controller.save()
 
                 await query.message.answer(
                     f'{entity.name} успешно {"добавлен в " + self.name.lower() if not de_attach else "удален из " + self.name_remove_form.lower()}')
@@ -246,91 +285,165 @@ class ManageUserAttachmentCallback(Callback, ABC):
 
 
 class GetAttendentStatisticsCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('atst',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
         eid = int(query.data.split('_')[-1])
 
-        visited_users = controller.get_visited_users(eid)
-        for visited_user in visited_users:
-            keyboard = InlineKeyboardMarkup() \
-                .row(InlineKeyboardButton('Начислить баллы активности', callback_data=f"addrate_{visited_user.id}")) \
-                .row(InlineKeyboardButton('Выдать достижение', callback_data=f"addachieve_{visited_user.id}"))
-            await query.message.answer(
-                visited_user.first_name + " " + visited_user.middle_name + " " + visited_user.last_name,
-                reply_markup=keyboard)
+        counts = await controller.get_attendance_counts(eid)
+        registered = sum(counts.values())
+        arrived = counts.get(StatusAttendion.ARRIVED, 0)
+        conversion = f'{arrived / registered:.1%}' if registered != 0 else '—'
+        await query.message.answer(f'Статистика посещения:\n\n'
+                                   f'Зарегистрировалось: {registered}\n'
+                                   f'Пришло: {arrived}\n'
+                                   f'Конверсия: {conversion}')
+
+        if arrived != 0:
+            text, keyboard = await render_visitors_page(controller, eid)
+            await query.message.answer(text, reply_markup=keyboard)
 
     def can_callback(self, user: User, query: CallbackQuery) -> bool:
         return query.data.startswith('atst_') and user.rank is Rank.ORGANIZER
 
 
+class ExportEventCallback(Callback, ABC):
+    prefixes = ('exp',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
+
+        _, kind, eid = query.data.split('_')
+        try:
+            event = await controller.get_event_by_id(int(eid))
+        except NoResultFound:
+            await query.message.answer('Такого мероприятия нет')
+            return
+        if not await controller.has_user_in_event(event.id, user.id):
+            await query.message.answer('Выгрузка доступна только организатору мероприятия')
+            return
+        if event.status != StatusEvent.FINISHED:
+            await query.message.answer('Выгрузка доступна только для завершенных мероприятий')
+            return
+
+        path = await write_event_export(controller, event, kind)
+        try:
+            await query.message.answer_document(InputFile(path, f'event_{event.id}.{kind}'))
+        finally:
+            os.remove(path)
+
+    def can_callback(self, user: User, query: CallbackQuery) -> bool:
+        return query.data.split('_')[:2] in (['exp', 'csv'], ['exp', 'jsonl']) and user.rank is Rank.ORGANIZER
+
+
+class VisitorsPageCallback(Callback, ABC):
+    prefixes = ('atsp',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
+
+        _, eid, direction, cursor = query.data.split('_')
+        text, keyboard = await render_visitors_page(controller, int(eid), int(cursor), direction == 'p')
+        await query.message.edit_text(text, reply_markup=keyboard)
+
+    def can_callback(self, user: User, query: CallbackQuery) -> bool:
+        return query.data.startswith('atsp_') and user.rank is Rank.ORGANIZER
+
+
 class GiveRateToUserCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('addrate',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
         await query.message.answer('Введите количество баллов')
 
         uid = int(query.data.split('_')[-1])
-        controller.db_session.add_model(OrganizerRateUser(org_id=user.id, user_id=uid))
+        await controller.add_rate_editor(user.id, uid)
         user.step = Step.GIVE_RATING
-        controller.db_session.commit_session()
+        await controller.save()
 
     def can_callback(self, user: User, query: CallbackQuery) -> bool:
         return query.data.startswith('addrate_')
 
 
 class UserFeedbackCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('feb',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
         await query.message.answer('Оставьте свой отзыв :)')
 
         eid = int(query.data.split('_')[-1])
-        controller.add_event_editor(eid, user.id)
+        await controller.add_event_editor(eid, user.id)
         user.step = Step.FEEDBACK_TEXT
-        controller.save()
+        await controller.save()
 
     def can_callback(self, user: User, query: CallbackQuery) -> bool:
         return query.data.startswith('feb_') and (user.rank is Rank.USER or user.rank is Rank.MODER)
 
 
 class FeedbackStatisticsCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('fbst',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         eid = int(query.data.split('_')[-1])
-        messages, neutral_list, negative_list, positive_list = controller.get_feedbacks_statistics(eid)
-
-        if len(messages) != 0:
-            neutral = sum(neutral_list)
-            negative = sum(negative_list)
-            positive = sum(positive_list)
-            _max = neutral + negative + positive
-            feedbacks = f'Сентимент-анализ:\n' \
-                        f'Доля нейтральных отзывов: {neutral / _max:.1%}\n' \
-                        f'Доля отрицательных отзывов: {negative / _max:.1%}\n' \
-                        f'Доля положительных отзывов: {positive / _max:.1%}\n\n'
-            feedbacks += '\n'.join(messages)
+        text, keyboard = await render_feedbacks_page(controller, eid)
+        if text is None:
+            await query.message.answer('Отзывы:\n\nотсутствуют')
+            return
+
+        summary = await controller.get_feedback_summary(eid)
+        _max = 0 if summary is None else summary.neutral + summary.negative + summary.positive
+        if _max != 0:
+            await query.message.answer(f'Сентимент-анализ:\n'
+                                       f'Оценено отзывов: {summary.count}\n'
+                                       f'Доля нейтральных отзывов: {summary.neutral / _max:.1%}\n'
+                                       f'Доля отрицательных отзывов: {summary.negative / _max:.1%}\n'
+                                       f'Доля положительных отзывов: {summary.positive / _max:.1%}')
         else:
-            feedbacks = 'отсутствуют'
-        await query.message.answer(f'Отзывы:\n\n{feedbacks}')
+            await query.message.answer('Сентимент-анализ ещё выполняется')
+        await query.message.answer(text, reply_markup=keyboard)
 
     def can_callback(self, user: User, query: CallbackQuery) -> bool:
         return query.data.startswith('fbst_') and user.rank is Rank.ORGANIZER
 
 
+class FeedbacksPageCallback(Callback, ABC):
+    prefixes = ('fbsp',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
+
+        _, eid, direction, cursor = query.data.split('_')
+        text, keyboard = await render_feedbacks_page(controller, int(eid), int(cursor), direction == 'p')
+        if text is not None:
+            await query.message.edit_text(text, reply_markup=keyboard)
+
+    def can_callback(self, user: User, query: CallbackQuery) -> bool:
+        return query.data.startswith('fbsp_') and user.rank is Rank.ORGANIZER
+
+
 class CancelEventCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('ecan',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         try:
             eid = int(query.data.split('_')[-1])
-            event = controller.get_event_by_id(eid)
+            event = await controller.get_event_by_id(eid)
 
-            if user in event.users and event.status == StatusEvent.UNFINISHED:
-                event.users.remove(user)
+            if await controller.has_user_in_event(event.id, user.id) and event.status == StatusEvent.UNFINISHED:
+                await controller.remove_user_from_event(event, user)
 
-                controller.remove_code(event, user)
+                await controller.remove_code(event, user)
 
                 await query.message.answer('Вы отменили заявку на участие в мероприятии')
 
-                controller.save()
+                await controller.save()
             else:
                 await query.message.answer("Вы уже не принимаете участие в этом мероприятии или оно завершилось")
         except NoResultFound:
@@ -341,22 +454,25 @@ class CancelEventCallback(Callback, ABC):
 
 
 class MarkPresentCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('marpr',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         eid = int(query.data.split('_')[-1])
         try:
-            event = controller.get_event_by_id(eid)
+            event = await controller.get_event_by_id(eid)
             if event.status == StatusEvent.UNFINISHED:
                 user.step = Step.VERIFICATION_PRESENT
 
-                controller.add_event_editor(event.id, user.id)
+                await controller.add_event_editor(event.id, user.id)
+                await controller.start_check_in(event.id)
 
                 await query.message.answer(
-                    'Вам необходимо прислать фото QR-кода, текстовый код для подтверждения или \'отмена\' для отмены '
-                    'действия')
+                    'Вам необходимо прислать фото QR-кода или текстовые коды для подтверждения. Можно отправлять '
+                    'их подряд или списком в одном сообщении. Напишите \'отмена\' для завершения')
 
-                controller.save()
+                await controller.save()
             else:
                 await query.message.answer("Мероприятие уже завершилось")
         except NoResultFound:
@@ -367,21 +483,25 @@ class MarkPresentCallback(Callback, ABC):
 
 
 class EndEventCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('ende',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         eid = int(query.data.split('_')[-1])
         try:
-            event = controller.get_event_by_id(eid)
+            event = await controller.get_event_by_id(eid)
             if event.status == StatusEvent.UNFINISHED:
                 event.status = StatusEvent.FINISHED
-                controller.save()
+                await controller.finish_check_in(event.id)
+                await controller.save()
 
                 keyboard = InlineKeyboardMarkup().add(
                     InlineKeyboardButton('Оставить отзыв', callback_data=f"feb_{event.id}"))
-                for user in controller.get_visited_users(eid):
-                    await query.message.bot.send_message(chat_id=user.id, text=f'Мероприятие {event.name} завершено',
-                                                         reply_markup=keyboard)
+                visitors = await controller.get_visited_user_ids(eid)
+                broadcaster.submit(query.bot, user.id, visitors, f'Мероприятие {event.name} завершено',
+                                   lambda job: f'Уведомление о завершении мероприятия {event.name} получили '
+                                               f'{job.sent} из {job.total} участников', keyboard)
 
                 await query.message.answer('Мероприятие успешно завершено')
             else:
@@ -396,13 +516,15 @@ class EndEventCallback(Callback, ABC):
 
 
 class GiveAchievementListCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('addachieve',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         uid = int(query.data.split('_')[-1])
-        if controller.has_user_by_id(uid):
-            controller.db_session.add_model(OrganizerToUserAchievement(organizer_id=user.id, user_id=uid))
-            achievements = controller.get_achievement_list()
+        if await controller.has_user_by_id(uid):
+            await controller.add_achievement_reciever(user.id, uid)
+            achievements = await controller.get_achievement_list()
             replKeyboard = InlineKeyboardMarkup()
             for achievement in achievements:
                 replKeyboard.insert(InlineKeyboardButton(f'{achievement.name}', callback_data=f'ach_{achievement.id}'))
@@ -416,20 +538,18 @@ class GiveAchievementListCallback(Callback, ABC):
 
 
 class GiveAchievementCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('ach',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
-        uid = controller.get_achievement_reciever(user.id).user_id
+        uid = await controller.get_achievement_reciever(user.id)
         aid = int(query.data.split('_')[-1])
         try:
-            achievement = controller.get_achievement_by_id(aid)
-            target_user = controller.get_user_by_id(uid)
-            target_user.achievements.append(achievement)
-            req = controller.db_session.query(OrganizerToUserAchievement) \
-                .filter(OrganizerToUserAchievement.organizer_id == user.id,
-                        OrganizerToUserAchievement.user_id == uid).one()
-            controller.db_session.delete_model(req)
-            controller.save()
+            achievement = await controller.get_achievement_by_id(aid)
+            await controller.give_achievement(uid, achievement)
+            await controller.remove_achievement_reciever(user.id)
+            await controller.save()
             await query.message.answer("Достижение вручено пользователю!")
         except NoResultFound:
             await query.message.answer("Достижение не найдено")
@@ -441,29 +561,32 @@ class GiveAchievementCallback(Callback, ABC):
 
 
 class ManageEventAttachmentCallback(Callback, ABC):
-    def __init__(self, name, name_remove_form, model, model_name, relation_model, relation_column, _lambda):
+    prefixes = ('eat', 'edeat')
+
+    def __init__(self, name, name_remove_form, model, model_name, relation_model, relation_column):
         self.name = name
         self.name_remove_form = name_remove_form
         self.model = model
         self.model_name = model_name
         self.relation_model = relation_model
         self.relation_column = relation_column
-        self._lambda = _lambda
 
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         try:
             args = query.data.split('_')
             event_id = int(args[2])
-            event = controller.get_event_by_id(event_id)
+            event = await controller.get_event_by_id(event_id)
 
             de_attach = query.data.startswith('ede')
 
             if len(args) == 3:
-                entities = controller.get_entities_by_model_with_relationship(event, self.model, self.relation_model,
-                                                                              self.relation_column,
-                                                                              self.relation_model.event_id, de_attach)
+                entities = await controller.get_entities_by_model_with_relationship(event, self.model,
+                                                                                    self.relation_model,
+                                                                                    self.relation_column,
+                                                                                    self.relation_model.event_id,
+                                                                                    de_attach)
                 if len(entities) == 0:
                     await query.message.answer('Тут пусто')
                 else:
@@ -475,9 +598,10 @@ class ManageEventAttachmentCallback(Callback, ABC):
             else:
                 try:
                     eid = int(args[3])
-                    entity = controller.get_entity_by_model_id(self.model, eid)
-                    self._lambda(event, entity, not de_attach)
-                    controller.save()
+                    entity = await controller.get_entity_by_model_id(self.model, eid)
+                    await controller.manage_relationship(event, entity, self.relation_model, self.relation_column,
+                                                         self.relation_model.event_id, not de_attach)
+                    await controller.save()
 
                     await query.message.answer(
                         f'{entity.name} успешно {"добавлен в " + self.name.lower() if not de_attach else "удален из " + self.name_remove_form.lower()}')
@@ -493,24 +617,25 @@ class ManageEventAttachmentCallback(Callback, ABC):
 
 
 class NotificationEventCallback(Callback, ABC):
-    async def callback(self, controller: Controller, user: User, query: CallbackQuery):
+    prefixes = ('notif',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
         await query.answer()
 
         try:
             event_id = int(query.data.split('_')[-1])
-            event = controller.get_event_by_id(event_id)
+            event = await controller.get_event_by_id(event_id)
 
             if event.description is None or event.lat is None or event.lng is None or event.date is None:
                 await query.message.answer('Для уведомления у мероприятия должно быть указано описание, дата и локация')
                 return
 
-            users = controller.get_users_not_at_event(event)
+            recipients = await controller.get_event_audience(event)
             text = f'{user.first_name} {user.middle_name} {user.last_name} приглашает вас поучаствовать в мероприятии {event.name}'
-            for user in controller.get_users_not_at_event(event):
-                await query.bot.send_message(chat_id=user.id,
-                                             text=text)
+            broadcaster.submit(query.bot, user.id, recipients, text,
+                               lambda job: f'{job.sent} уведомлений было отправлено')
 
-            await query.message.answer(f'{len(users)} уведомлений было отправлено')
+            await query.message.answer(f'Рассылка запущена, получателей: {len(recipients)}')
         except ValueError or NoResultFound:
             await query.message.answer('Такое мероприятие отсутствует')
 
@@ -518,6 +643,93 @@ class NotificationEventCallback(Callback, ABC):
         return query.data.startswith('notif_') and user.rank is Rank.ORGANIZER
 
 
+class EventsPageCallback(Callback, ABC):
+    prefixes = ('evp',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
+
+        _, kind, direction, cursor = query.data.split('_')
+        text, keyboard = await render_events_page(controller, user, kind, int(cursor), direction == 'p')
+        await query.message.edit_text(text, reply_markup=keyboard)
+
+    def can_callback(self, user: User, query: CallbackQuery) -> bool:
+        return can_view_events_page(user, query.data[len('evp_'):])
+
+
+class EventCardCallback(Callback, ABC):
+    prefixes = ('evc',)
+
+    async def callback(self, controller: AsyncController, user: User, query: CallbackQuery):
+        await query.answer()
+
+        _, kind, eid = query.data.split('_')
+        try:
+            await send_event_card(controller, user, query.message, kind,
+                                  await controller.get_event_with_relations_by_id(int(eid)))
+        except NoResultFound:
+            await query.message.answer('Такого мероприятия нет')
+
+    def can_callback(self, user: User, query: CallbackQuery) -> bool:
+        return can_view_events_page(user, query.data[len('evc_'):])
+
+
+async def answer_qr_code(message: Message, code: str):
+    photo = qr_code_file_ids.get(code)
+    if photo is None:
+        photo = InputFile(BytesIO(await read_qr_code_image(code)), f'{code}.png')
+    answer = await message.answer_photo(photo)
+    qr_code_file_ids.put(code, answer.photo[-1].file_id)
+
+
+async def render_visitors_page(controller: AsyncController, eid: int, cursor: int = None,
+                               backward: bool = False) -> (str, InlineKeyboardMarkup):
+    visitors, has_prev, has_next = await controller.get_visited_users_page(eid, cursor, backward)
+    if len(visitors) == 0:
+        return 'Посетителей нет', None
+
+    lines = []
+    keyboard = InlineKeyboardMarkup()
+    for number, visitor in enumerate(visitors, 1):
+        lines.append(f'{number}. {visitor.first_name} {visitor.middle_name} {visitor.last_name}')
+        keyboard.row(InlineKeyboardButton(f'{number}. Начислить баллы', callback_data=f'addrate_{visitor.id}'),
+                     InlineKeyboardButton(f'{number}. Выдать достижение', callback_data=f'addachieve_{visitor.id}'))
+
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton('◀️', callback_data=f'atsp_{eid}_p_{visitors[0].id}'))
+    if has_next:
+        navigation.append(InlineKeyboardButton('▶️', callback_data=f'atsp_{eid}_n_{visitors[-1].id}'))
+    if len(navigation) != 0:
+        keyboard.row(*navigation)
+
+    return 'Посетители:\n\n' + '\n'.join(lines), keyboard
+
+
+async def render_feedbacks_page(controller: AsyncController, eid: int, cursor: int = None,
+                                backward: bool = False) -> (str, InlineKeyboardMarkup):
+    feedbacks, has_prev, has_next = await controller.get_feedbacks_page(eid, cursor, backward)
+    if len(feedbacks) == 0:
+        return None, None
+
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton('◀️', callback_data=f'fbsp_{eid}_p_{feedbacks[0].id}'))
+    if has_next:
+        navigation.append(InlineKeyboardButton('▶️', callback_data=f'fbsp_{eid}_n_{feedbacks[-1].id}'))
+    keyboard = InlineKeyboardMarkup().row(*navigation) if len(navigation) != 0 else None
+
+    return 'Отзывы:\n\n' + '\n'.join(str(feedback.fb_text) for feedback in feedbacks), keyboard
+
+
+def can_view_events_page(user: User, data: str) -> bool:
+    if data.startswith('my_'):
+        return user.rank is Rank.USER or user.rank is Rank.MODER or user.rank is Rank.ORGANIZER
+    if data.startswith('all_'):
+        return user.rank is Rank.USER or user.rank is Rank.MODER
+    return False
+
+
 callbacks = [TakePartCallback(),
              UserFeedbackCallback(),
              CancelEventCallback(),
@@ -525,15 +737,14 @@ callbacks = [TakePartCallback(),
              ChangeDataInUserCallback(),
              EndEventCallback(),
              NotificationEventCallback(),
-             ManageUserAttachmentCallback('Интересы', 'Интересов', Interest, UserInterests, UserInterests.interest_id,
-                                          lambda u, i, a: u.interests.append(i) if a else u.interests.remove(i)),
-             ManageUserAttachmentCallback('Группы', 'Групп', LocalGroup, UserGroups, UserGroups.group_id,
-                                          lambda u, g, a: u.groups.append(g) if a else u.groups.remove(g)),
+             ShowCodeCallback(),
+             EventsPageCallback(),
+             EventCardCallback(),
+             ManageUserAttachmentCallback('Интересы', 'Интересов', Interest, UserInterests, UserInterests.interest_id),
+             ManageUserAttachmentCallback('Группы', 'Групп', LocalGroup, UserGroups, UserGroups.group_id),
              ManageEventAttachmentCallback('Интересы', 'Интересов', Interest, 'interest', EventInterests,
-                                           EventInterests.interest_id,
-                                           lambda e, i, a: e.interests.append(i) if a else e.interests.remove(i)),
-             ManageEventAttachmentCallback('Группы', 'Групп', LocalGroup, 'group', EventGroups, EventGroups.group_id,
-                                           lambda e, g, a: e.groups.append(g) if a else e.groups.remove(g)),
+                                           EventInterests.interest_id),
+             ManageEventAttachmentCallback('Группы', 'Групп', LocalGroup, 'group', EventGroups, EventGroups.group_id),
              ManageSomethingCallback(Rank.ADMIN, Interest, 'add', Step.INTEREST_NAME_FOR_ADD,
                                      'Напишите название нового интереса'),
              ManageSomethingCallback(Rank.ADMIN, Interest, 'remove', Step.INTEREST_NAME_FOR_REMOVE,
@@ -543,18 +754,35 @@ callbacks = [TakePartCallback(),
              ManageSomethingCallback(Rank.ADMIN, LocalGroup, 'remove', Step.GROUP_NAME_FOR_REMOVE,
                                      'Напишите название группы для удаления'),
              GetAttendentStatisticsCallback(),
+             VisitorsPageCallback(),
+             ExportEventCallback(),
              FeedbackStatisticsCallback(),
+             FeedbacksPageCallback(),
              ChangeDataInEventCallback(),
              AcceptFriendRequestCallback(),
              DeclineFriendRequestCallback(),
              DeleteFriendCallback(),
              GiveRateToUserCallback(),
              GiveAchievementListCallback(),
-             GiveAchievementCallback(),
-             UnknownCallback()]
+             GiveAchievementCallback()]
+unknown_callback = UnknownCallback()
+qr_code_file_ids = FileIdCache(config.QR_CACHE_SIZE)
+
+
+def index_by_prefix(_callbacks) -> dict:
+    index = {}
+    for callback in _callbacks:
+        for prefix in callback.prefixes:
+            index.setdefault(prefix, []).append(callback)
+    return index
+
+
+callbacks_by_prefix = index_by_prefix(callbacks)
 
 
 def get_callback(user, query) -> Callback:
-    for callback in callbacks:
+    for callback in callbacks_by_prefix.get(query.data.split('_', 1)[0], ()):
         if callback.can_callback(user, query):
             return callback
+
+    return unknown_callback
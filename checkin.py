@@ -0,0 +1,51 @@
+from typing import Optional, Dict, List, Tuple
+
+
+class CheckInSession(object):
+    event_id: int
+    codes: Dict[str, int]
+    checked_in: int
+
+    def __init__(self, event_id: int, codes: Dict[str, int]):
+        self.event_id = event_id
+        self.codes = codes
+        self.checked_in = 0
+
+    def take(self, codes: List[str]) -> Tuple[Dict[str, int], List[str]]:
+        found = {}
+        unknown = []
+        for code in codes:
+            uid = self.codes.pop(code, None)
+            if uid is not None:
+                found[code] = uid
+            elif code not in found:
+                unknown.append(code)
+        return found, unknown
+
+
+class CheckInSessions(object):
+    def __init__(self):
+        self.sessions = {}
+
+    def start(self, event_id: int, codes: Dict[str, int]) -> CheckInSession:
+        session = self.sessions[event_id] = CheckInSession(event_id, codes)
+        return session
+
+    def get(self, event_id: int) -> Optional[CheckInSession]:
+        return self.sessions.get(event_id)
+
+    def finish(self, event_id: int):
+        self.sessions.pop(event_id, None)
+
+    def add_code(self, event_id: int, code: str, uid: int):
+        session = self.sessions.get(event_id)
+        if session is not None:
+            session.codes[code] = uid
+
+    def discard_code(self, event_id: int, code: str):
+        session = self.sessions.get(event_id)
+        if session is not None:
+            session.codes.pop(code, None)
+
+
+check_in_sessions = CheckInSessions()
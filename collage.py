@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+import os
+from typing import Union, Optional, Tuple
+
+from aiogram.types import InputFile
+
+from cache import FileIdCache
+from controller import AsyncController, generate_image_achievements, image_executor
+from data import config
+
+CollagePhoto = Union[str, InputFile, None]
+
+
+class AchievementCollageCache(object):
+    path: str
+    file_ids: FileIdCache
+
+    def __init__(self, path: str, max_size: int):
+        self.path = path
+        self.file_ids = FileIdCache(max_size)
+
+    @staticmethod
+    def key(image_versions) -> str:
+        return hashlib.sha1(','.join(f'{aid}:{updated_at}' for aid, updated_at in image_versions).encode()).hexdigest()
+
+    def file_path(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.jpg')
+
+    async def get(self, controller: AsyncController, achievement_ids) -> Tuple[Optional[str], CollagePhoto]:
+        image_versions = await controller.get_achievement_image_versions(achievement_ids)
+        if len(image_versions) == 0:
+            return None, None
+
+        key = self.key(image_versions)
+        file_id = self.file_ids.get(key)
+        if file_id is not None:
+            return key, file_id
+
+        path = self.file_path(key)
+        if not os.path.exists(path):
+            images = await controller.get_achievement_images([aid for aid, _ in image_versions])
+            if len(images) == 0:
+                return None, None
+            await asyncio.get_running_loop().run_in_executor(image_executor, self.render, images, path)
+        return key, InputFile(path)
+
+    def remember(self, key: str, file_id: str):
+        self.file_ids.put(key, file_id)
+
+    def render(self, images, path: str):
+        os.makedirs(self.path, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(generate_image_achievements(images))
+        os.replace(temp_path, path)
+
+
+achievement_collages = AchievementCollageCache(config.ACHIEVEMENT_COLLAGE_PATH, config.COLLAGE_CACHE_SIZE)
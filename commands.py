@@ -1,29 +1,38 @@
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardRemove
 
-from controller import Controller, generate_image_achievements
-from data.keyboards import profile_inline_keyboard, keyboards_by_status_event_and_by_rank
+from collage import achievement_collages
+from controller import AsyncController
+from data.keyboards import profile_inline_keyboard
 from enums.ranks import Rank
 from enums.steps import Step
-from formatter import plurals
+from eventpages import render_events_page
 from models import User, Interest, LocalGroup
 from models.basemodel import BaseModel
 
 
 class Command(ABC):
+    phrase: str
+
     @abstractmethod
-    async def execute(self, controller: Controller, user: User, message: Message):
+    async def execute(self, controller: AsyncController, user: User, message: Message):
         pass
 
     @abstractmethod
-    def can_execute(self, user: User, message: Message) -> bool:
+    def has_access(self, user: User) -> bool:
         pass
 
+    def can_execute(self, user: User, message: Message) -> bool:
+        return self.has_access(user) and self.phrase in message.text.lower()
+
 
 class GetFriendListCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
-        friend_list = controller.get_friend_list(user)
+    phrase = 'мои друзья'
+
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        friend_list = await controller.get_friend_list(user)
         if len(friend_list) == 0:
             await message.answer("У Вас пока нет друзей.")
         else:
@@ -32,13 +41,15 @@ class GetFriendListCommand(Command, ABC):
                     InlineKeyboardButton('Удалить из друзей', callback_data=f"deletefr_{friend.friend_id}"))
                 await message.answer(friend[0] + " " + friend[1] + " " + friend[2], reply_markup=keyboard)
 
-    def can_execute(self, user: User, message: Message) -> bool:
-        return (user.rank == Rank.USER or user.rank == Rank.MODER) and 'мои друзья' in message.text.lower()
+    def has_access(self, user: User) -> bool:
+        return user.rank == Rank.USER or user.rank == Rank.MODER
 
 
 class GetFriendRequestListCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
-        requests_list = controller.get_friend_requests(user.id)
+    phrase = 'мои заявки в друзья'
+
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        requests_list = await controller.get_friend_requests(user.id)
         if len(requests_list) == 0:
             await message.answer("У Вас пока нет заявок в друзья.")
         else:
@@ -49,61 +60,45 @@ class GetFriendRequestListCommand(Command, ABC):
                 await message.answer(request[0] + " " + request[1] + " " + request[2] + " хочет добавить Вас в друзья!",
                                      reply_markup=keyboard)
 
-    def can_execute(self, user: User, message: Message) -> bool:
-        return (user.rank == Rank.USER or user.rank == Rank.MODER) and 'мои заявки в друзья' in message.text.lower()
+    def has_access(self, user: User) -> bool:
+        return user.rank == Rank.USER or user.rank == Rank.MODER
 
 
 class AddFriendCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
+    phrase = 'добавить друга'
+
+    async def execute(self, controller: AsyncController, user: User, message: Message):
         user.step = Step.ADD_FRIEND
-        controller.save()
+        await controller.save()
         await message.answer("Введите телеграмм-id друга:", reply_markup=ReplyKeyboardRemove())
 
-    def can_execute(self, user: User, message: Message) -> bool:
-        return (user.rank == Rank.USER or user.rank == Rank.MODER) and 'добавить друга' in message.text.lower()
+    def has_access(self, user: User) -> bool:
+        return user.rank == Rank.USER or user.rank == Rank.MODER
 
 
 class GetMyEventsCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
-        events = controller.get_events_by_user(
-            user.id) if user.rank == Rank.ORGANIZER else controller.get_events_by_user_without_finished(user.id)
-        if len(events) == 0:
-            await message.answer('В данный момент у вас нет мероприятий')
-        else:
-            for event in events:
-                try:
-                    keyboard = keyboards_by_status_event_and_by_rank[event.status][user.rank](event)
-                except KeyError:
-                    keyboard = None
-                if event.lat is not None and event.lng is not None:
-                    await message.answer_location(event.lat, event.lng)
-                await message.answer(str(event), reply_markup=keyboard)
+    phrase = 'мои мероприятия'
 
-    def can_execute(self, user: User, message: Message) -> bool:
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        text, keyboard = await render_events_page(controller, user, 'my')
+        await message.answer(text, reply_markup=keyboard)
+
+    def has_access(self, user: User) -> bool:
         return (user.rank == Rank.USER or
                 user.rank == Rank.MODER or
-                user.rank == Rank.ORGANIZER) and 'мои мероприятия' in message.text.lower()
+                user.rank == Rank.ORGANIZER)
 
 
 class GetAllEventsCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
-        events = controller.get_events_not_participate_user(user.id)
-        if len(events) == 0:
-            await message.answer('В данный момент нет активных мероприятий')
-        else:
-            for event in events:
-                keyboard = InlineKeyboardMarkup().add(
-                    InlineKeyboardButton('Записаться на мероприятие', callback_data=f'tp_{event.id}'))
-                friends = controller.get_friends_on_event(user, event)
-                friends_str = f'\n\n{plurals(len(friends), "ваш друг", "ваших друга", "ваших друзей")} на этом мероприятии: {", ".join(f"{friend.first_name} {friend.middle_name} {friend.last_name}" for friend in friends)}' if len(
-                    friends) != 0 else ''
-                if event.lat is not None and event.lng is not None:
-                    await message.answer_location(event.lat, event.lng)
-                await message.answer(f'{event}{friends_str}', reply_markup=keyboard)
+    phrase = 'все мероприятия'
 
-    def can_execute(self, user: User, message: Message) -> bool:
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        text, keyboard = await render_events_page(controller, user, 'all')
+        await message.answer(text, reply_markup=keyboard)
+
+    def has_access(self, user: User) -> bool:
         return (user.rank == Rank.USER or
-                user.rank == Rank.MODER) and 'все мероприятия' in message.text.lower()
+                user.rank == Rank.MODER)
 
 
 class AddSomethingCommand(Command, ABC):
@@ -117,14 +112,15 @@ class AddSomethingCommand(Command, ABC):
         self.name = name
         self._type = _type
         self.name_in_message = name_in_message
+        self.phrase = f'добавить {name}'
 
-    async def execute(self, controller: Controller, user: User, message: Message):
-        controller.set_step_to_user(user, self.step)
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        await controller.set_step_to_user(user, self.step)
         await message.answer(
             f'Ввведите {self._type} нового {self.name_in_message if self.name_in_message is not None else self.name}')
 
-    def can_execute(self, user: User, message: Message) -> bool:
-        return user.rank == self.rank and f'добавить {self.name}' in message.text.lower()
+    def has_access(self, user: User) -> bool:
+        return user.rank == self.rank
 
 
 class ManageSomethingCommand(Command, ABC):
@@ -134,9 +130,10 @@ class ManageSomethingCommand(Command, ABC):
     def __init__(self, name, model):
         self.name = name
         self.model = model
+        self.phrase = name.lower()
 
-    async def execute(self, controller: Controller, user: User, message: Message):
-        entities = controller.get_entities_by_model(self.model)
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        entities = await controller.get_entities_by_model(self.model)
         keyboard = InlineKeyboardMarkup()
         keyboard.row(InlineKeyboardButton('Добавить', callback_data='add_' + self.model.__tablename__))
         if len(entities) != 0:
@@ -145,12 +142,15 @@ class ManageSomethingCommand(Command, ABC):
                              f'{", ".join([entity.name for entity in entities]) if len(entities) != 0 else "пока отсутствуют"}',
                              reply_markup=keyboard)
 
-    def can_execute(self, user: User, message: Message) -> bool:
-        return user.rank == Rank.ADMIN and f'{self.name.lower()}' in message.text.lower()
+    def has_access(self, user: User) -> bool:
+        return user.rank == Rank.ADMIN
 
 
 class GetMyProfileCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
+    phrase = 'мой профиль'
+
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        user = await controller.get_user_with_relations_by_id(user.id)
         text = f'🦔{user.first_name} {user.middle_name} {user.last_name}\n' \
                f'├ Номер телефона: {user.phone}\n' \
                f'├ Почта: {user.email}\n' \
@@ -158,20 +158,37 @@ class GetMyProfileCommand(Command, ABC):
                f'├ Ваши интересы {", ".join([interest.name for interest in user.interests]) if len(user.interests) != 0 else "отсутствуют"}\n' \
                f'└ Ваш рейтинг: {user.rating}'
         await message.answer(text, reply_markup=profile_inline_keyboard)
-        image_achievements = generate_image_achievements(user)
-        if image_achievements is not None:
-            await message.answer_photo(photo=image_achievements, caption='Ваши достижения')
-            image_achievements.close()
+        achievement_ids = await controller.get_achievement_ids_by_user(user.id)
+        if len(achievement_ids) != 0:
+            key, image_achievements = await achievement_collages.get(controller, achievement_ids)
+            if image_achievements is not None:
+                answer = await message.answer_photo(photo=image_achievements, caption='Ваши достижения')
+                achievement_collages.remember(key, answer.photo[-1].file_id)
+
+    def has_access(self, user: User) -> bool:
+        return True
 
-    def can_execute(self, user: User, message: Message) -> bool:
-        return 'мой профиль' in message.text.lower()
+
+class ImportUsersCommand(Command, ABC):
+    phrase = 'импорт пользователей'
+
+    async def execute(self, controller: AsyncController, user: User, message: Message):
+        await controller.set_step_to_user(user, Step.IMPORT_USERS)
+        await message.answer('Пришлите файл .csv или .jsonl с колонками id, rank, groups и interests. Группы и интересы '
+                             'перечисляются через \';\'. Чтобы только проверить файл, добавьте к нему подпись '
+                             '\'проверка\'. Напишите \'отмена\' для отмены действия')
+
+    def has_access(self, user: User) -> bool:
+        return user.rank == Rank.ADMIN or user.rank == Rank.ORGANIZER
 
 
 class UnknownCommand(Command, ABC):
-    async def execute(self, controller: Controller, user: User, message: Message):
+    phrase = ''
+
+    async def execute(self, controller: AsyncController, user: User, message: Message):
         await message.answer('Неизвестная команда')
 
-    def can_execute(self, user: User, message: Message) -> bool:
+    def has_access(self, user: User) -> bool:
         return True
 
 
@@ -186,13 +203,20 @@ commands = [GetMyEventsCommand(),
             AddSomethingCommand(Rank.ADMIN, Step.NEW_ORGANIZER_ID, 'организатора', 'ID'),
             AddSomethingCommand(Rank.ORGANIZER, Step.NEW_MODER_ID, 'модератора', 'ID'),
             AddSomethingCommand(Rank.ORGANIZER, Step.EVENT_NAME, 'мероприятие', 'название'),
-            AddSomethingCommand(Rank.ORGANIZER, Step.ACHIEVEMENT_NAME, 'достижение', 'название', 'достижения')]
+            AddSomethingCommand(Rank.ORGANIZER, Step.ACHIEVEMENT_NAME, 'достижение', 'название', 'достижения'),
+            ImportUsersCommand()]
 unknown_command = UnknownCommand()
 
 
+@lru_cache(maxsize=1024)
+def match_commands(text: str) -> tuple:
+    return tuple(command for command in commands if command.phrase in text)
+
+
 def get_command(user, message) -> Command:
-    for command in commands:
-        if message.text is not None and command.can_execute(user, message):
-            return command
+    if message.text is not None:
+        for command in match_commands(message.text.lower()):
+            if command.has_access(user):
+                return command
 
     return unknown_command
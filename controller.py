@@ -1,17 +1,22 @@
+import asyncio
 import datetime
-import random
+import secrets
 import string
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from typing import Dict, List, Optional, Set, Tuple
 
 import qrcode
 from PIL import Image
-from dostoevsky.models import FastTextSocialNetworkModel
-from dostoevsky.tokenization import RegexTokenizer
-from pyzbar.pyzbar import decode
-from sqlalchemy import create_engine, and_
+from aiogram.dispatcher.storage import BaseStorage
+from pyzbar.pyzbar import decode, ZBarSymbol
+from sqlalchemy import and_, or_, select, insert, update, delete, func, bindparam
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import selectinload, aliased
 
+from audience import audience_index
+from cache import UserState, UserStateCache
+from checkin import check_in_sessions
 from data import config
 from enums.friend_request_status import FriendRequestStatus
 from enums.ranks import Rank
@@ -19,17 +24,23 @@ from enums.status_attendion import StatusAttendion
 from enums.status_event import StatusEvent
 from enums.steps import Step
 from exceptions import NotFoundObjectError, ObjectAlreadyCreatedError
-from models import User, EventUsers, Event, EventEditors, Achievement
-from models.achievement import OrganizerToUserAchievement
-from models.dbsession import DBSession
-from models.event import EventCodes, EventFeedbacks, EventGroups, EventInterests
-from models.user import UserFriends, OrganizerRateUser, UserGroups, UserInterests
+from models import User, EventUsers, Event, Achievement
+from models.dbsession import AsyncDBSession
+from models.event import EventCodes, EventFeedbacks, EventFeedbackSummary, EventGroups, EventInterests
+from models.user import UserFriends, UserGroups, UserInterests, UserAchievements
+from sentiment import feedback_scorer
+
+
+image_executor = ThreadPoolExecutor(max_workers=config.IMAGE_WORKERS)
 
 
 def get_code_from_photo(_bytes: BytesIO):
     img = Image.open(_bytes)
     try:
-        return decode(img)[-1].data.decode("utf-8")
+        img.draft('L', (config.QR_DECODE_MAX_SIDE, config.QR_DECODE_MAX_SIDE))
+        gray = img.convert('L')
+        gray.thumbnail((config.QR_DECODE_MAX_SIDE, config.QR_DECODE_MAX_SIDE))
+        return decode(gray, symbols=[ZBarSymbol.QRCODE])[-1].data.decode("utf-8")
     except IndexError:
         return None
     finally:
@@ -37,9 +48,27 @@ def get_code_from_photo(_bytes: BytesIO):
         _bytes.close()
 
 
-def generate_image_achievements(user: User):
-    achievements = user.achievements
-    size = len(achievements)
+async def read_code_from_photo(_bytes: BytesIO):
+    return await asyncio.get_running_loop().run_in_executor(image_executor, get_code_from_photo, _bytes)
+
+
+def render_qr_code(code: str) -> bytes:
+    output = BytesIO()
+    qrcode.make(code).save(output, "PNG")
+    return output.getvalue()
+
+
+async def read_qr_code_image(code: str) -> bytes:
+    return await asyncio.get_running_loop().run_in_executor(image_executor, render_qr_code, code)
+
+
+def photo_sizes_for_decoding(photos):
+    photos = sorted(photos, key=lambda photo: photo.width * photo.height)
+    return [photo for photo in photos[:-1] if min(photo.width, photo.height) >= config.QR_DECODE_MIN_SIDE] + photos[-1:]
+
+
+def generate_image_achievements(images) -> bytes:
+    size = len(images)
     if size == 0:
         return None
     line_size = int(size / 4)
@@ -47,8 +76,8 @@ def generate_image_achievements(user: User):
         line_size += 1
     new_image = Image.new('RGB', (size * 200 if line_size == 1 else 800, 200 * line_size), (250, 250, 250))
     x, y = 0, 0
-    for achievement in user.achievements:
-        _bytes = BytesIO(achievement.image)
+    for achievement_image in images:
+        _bytes = BytesIO(achievement_image)
         image = Image.open(_bytes)
         try:
             new_image.paste(image, (x, y))
@@ -64,262 +93,527 @@ def generate_image_achievements(user: User):
     try:
         output = BytesIO()
         new_image.save(output, 'JPEG')
-        output.seek(0)
-        return output
+        return output.getvalue()
     finally:
         new_image.close()
 
 
-class Controller:
-    db_session = DBSession(sessionmaker(bind=create_engine(f'sqlite:///{config.DATABASE_NAME}', echo=True))())
-
-    def manage_something_model(self, model, model_column, new_name, _lambda_creating_object, removing):
+class AsyncController:
+    db_session: AsyncDBSession
+    user_states: UserStateCache
+    storage: BaseStorage
+
+    def __init__(self, db_session: AsyncDBSession, user_states: UserStateCache, storage: BaseStorage):
+        self.db_session = db_session
+        self.user_states = user_states
+        self.storage = storage
+        self.users = {}
+        self.steps = {}
+        self.contexts = {}
+        self.changed_contexts = set()
+        self.new_feedbacks = []
+        self.new_codes = []
+        self.audience_changes = []
+
+    async def manage_something_model(self, model, model_column, new_name, _lambda_creating_object, removing):
         if removing:
             try:
-                self.db_session.delete_model(self.get_entity_by_model_with_name(model, model_column, new_name))
+                await self.db_session.delete_model(
+                    await self.get_entity_by_model_with_name(model, model_column, new_name))
             except NoResultFound:
                 raise NotFoundObjectError
         else:
             try:
-                self.get_entity_by_model_with_name(model, model_column, new_name)
+                await self.get_entity_by_model_with_name(model, model_column, new_name)
                 raise ObjectAlreadyCreatedError
             except NoResultFound:
-                self.db_session.add_model(_lambda_creating_object(new_name))
-
-    def generate_qr_code(self, event, user) -> (str, BytesIO):
-        code = self.get_new_code()
-
-        self.add_code(event, user, code)
-
-        img = qrcode.make(code)
-
-        output = BytesIO()
-        img.save(output, "PNG")
-        output.seek(0)
-
-        return code, output
-
-    def create_event(self, name, creator):
+                await self.db_session.add_model(_lambda_creating_object(new_name))
+
+    async def add_new_code(self, event, user) -> str:
+        code = await self.db_session.scalar(
+            select(EventCodes.code).where(EventCodes.event_id == event.id, EventCodes.user_id == user.id))
+        if code is not None:
+            return code
+        for _ in range(config.CODE_INSERT_ATTEMPTS):
+            code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+            if await self.db_session.add_unique_model(EventCodes(event_id=event.id, user_id=user.id, code=code),
+                                                      ['code']):
+                self.new_codes.append((event.id, code, user.id))
+                return code
+        raise ObjectAlreadyCreatedError
+
+    async def create_event(self, name, creator):
         event = Event(name=name, status=StatusEvent.UNFINISHED)
         event.users.append(creator)
-        self.db_session.add_model(event)
-
-    def get_user_by_id(self, uid: int) -> User:
-        return self.db_session.query(User).filter(User.id == uid).one()
-
-    def has_user_by_id(self, uid: int) -> bool:
-        return self.db_session.query(User).filter(User.id == uid).one_or_none() is not None
-
-    def has_user_in_event(self, ev_id, uid: int) -> bool:
-        return self.db_session.query(EventUsers).filter(EventUsers.user_id == uid,
-                                                        EventUsers.event_id == ev_id).one_or_none() is not None
-
-    def get_event_by_id(self, eid: int) -> Event:
-        return self.db_session.query(Event).filter(Event.id == eid).one()
-
-    def get_events_by_user(self, uid: int):
-        return self.db_session.query(Event).filter(Event.users.any(User.id == uid)).all()
-
-    def get_events_by_user_without_finished(self, uid: int):
-        return self.db_session.query(Event).filter(Event.users.any(User.id == uid)).filter(
-            Event.status == StatusEvent.UNFINISHED).all()
-
-    def get_events_not_participate_user(self, uid: int):
+        await self.db_session.add_model(event)
+
+    async def get_user_by_id(self, uid: int) -> User:
+        user = (await self.db_session.scalars(select(User).where(User.id == uid))).one()
+        if user.id not in self.users:
+            user.step = self.steps[user.id] = await self.get_step(user.id)
+            self.users[user.id] = user
+        return user
+
+    async def get_user_state(self, uid: int) -> UserState:
+        state = self.user_states.get(uid)
+        if state is None:
+            row = (await self.db_session.execute(select(User.id, User.rank).where(User.id == uid))).one()
+            state = UserState(row.id, row.rank, await self.get_step(row.id))
+            self.user_states.put(state)
+        return state
+
+    async def get_event_with_relations_by_id(self, eid: int) -> Event:
+        return (await self.db_session.scalars(
+            select(Event).where(Event.id == eid).options(selectinload(Event.interests),
+                                                         selectinload(Event.groups)))).one()
+
+    async def get_user_with_relations_by_id(self, uid: int) -> User:
+        return (await self.db_session.scalars(
+            select(User).where(User.id == uid).options(selectinload(User.groups),
+                                                       selectinload(User.interests)))).one()
+
+    async def has_user_by_id(self, uid: int) -> bool:
+        return (await self.db_session.scalars(select(User).where(User.id == uid))).one_or_none() is not None
+
+    async def has_user_in_event(self, ev_id, uid: int) -> bool:
+        return (await self.db_session.scalars(select(EventUsers).where(
+            EventUsers.user_id == uid, EventUsers.event_id == ev_id))).one_or_none() is not None
+
+    async def add_user_to_event(self, event, user) -> bool:
+        return await self.db_session.add_unique_model(EventUsers(event_id=event.id, user_id=user.id),
+                                                      ['event_id', 'user_id'])
+
+    async def remove_user_from_event(self, event, user):
+        await self.db_session.execute(
+            delete(EventUsers).where(EventUsers.event_id == event.id, EventUsers.user_id == user.id))
+
+    async def get_event_by_id(self, eid: int) -> Event:
+        return (await self.db_session.scalars(select(Event).where(Event.id == eid))).one()
+
+    @staticmethod
+    def events_by_user_query(uid: int, with_finished: bool):
+        query = select(Event).where(Event.users.any(User.id == uid))
+        if not with_finished:
+            query = query.where(Event.status == StatusEvent.UNFINISHED)
+        return query.options(selectinload(Event.interests), selectinload(Event.groups))
+
+    @staticmethod
+    def events_not_participate_user_query(uid: int):
         now = datetime.datetime.now()
-        return self.db_session.query(Event).filter(~Event.users.any(User.id == uid)).filter(
+        return select(Event).where(~Event.users.any(User.id == uid)).where(
             and_(Event.date != None, Event.date > now, Event.status == StatusEvent.UNFINISHED,
-                 Event.description != None, Event.lng != None, Event.lat != None)).all()
-
-    def get_count_visited(self, eid: int) -> int:
-        return len(self.db_session.query(User).filter(
-            and_(EventUsers.event_id == eid, EventUsers.status_attendion == StatusAttendion.ARRIVED)).all())
-
-    def get_visited_users(self, eid: int):
-        return self.db_session.query(User).filter(
-            and_(EventUsers.user_id == User.id, EventUsers.event_id == eid,
-                 EventUsers.status_attendion == StatusAttendion.ARRIVED, User.rank == Rank.USER)).all()
-
-    def get_editor_event(self, uid: int) -> EventEditors:
-        return self.db_session.query(EventEditors).filter(EventEditors.user_id == uid).one()
-
-    def get_event_by_editor(self, uid: int) -> Event:
-        event_id = self.db_session.query(EventEditors).filter(EventEditors.user_id == uid).one().event_id
-        return self.get_event_by_id(event_id)
-
-    def get_new_code(self) -> str:
-        code = None
-        while code is None or self.db_session.query(EventCodes).filter(EventCodes.code == code).count() > 0:
-            code = ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(8))
-        return code
-
-    def get_code_model_by_id(self, eid: int, uid: int) -> EventCodes:
-        return self.db_session.query(EventCodes).filter(
-            and_(EventCodes.event_id == eid, EventCodes.user_id == uid)).one()
-
-    def get_feedbacks(self, eid: int):
-        return self.db_session.query(EventFeedbacks).filter(EventFeedbacks.event_id == eid).all()
-
-    def get_feedbacks_statistics(self, eid):
-        tokenizer = RegexTokenizer()
-        model = FastTextSocialNetworkModel(tokenizer=tokenizer)
-
-        messages = []
-
-        for feedback in self.get_feedbacks(eid):
-            messages.append(str(feedback.fb_text))
-
-        results = model.predict(messages, k=2)
-        neutral_list = []
-        negative_list = []
-        positive_list = []
-        for sentiment in results:
-            neutral = sentiment.get('neutral')
-            negative = sentiment.get('negative')
-            positive = sentiment.get('positive')
-            if neutral is not None:
-                neutral_list.append(sentiment.get('neutral'))
-            if negative is not None:
-                negative_list.append(sentiment.get('negative'))
-            if positive is not None:
-                positive_list.append(sentiment.get('positive'))
-
-        return messages, neutral_list, negative_list, positive_list
-
-    def get_entity_by_model_id(self, model, mid):
-        return self.db_session.query(model).filter(model.id == mid).one()
-
-    def get_entities_by_model(self, model):
-        return self.db_session.query(model).all()
-
-    def add_new_user(self, uid):
-        self.db_session.add_model(model=User(id=uid, rank=Rank.USER, step=Step.FIRST_NAME, rating=0))
-
-    def get_entity_by_model_with_name(self, model, model_column, name):
-        return self.db_session.query(model).filter(model_column == name).one()
-
-    def set_step_to_user(self, user, step):
+                 Event.description != None, Event.lng != None, Event.lat != None)).options(
+            selectinload(Event.interests), selectinload(Event.groups))
+
+    async def get_events_page(self, query, cursor: int = None, backward: bool = False,
+                              limit: int = config.EVENTS_PAGE_SIZE):
+        key = func.coalesce(Event.date, datetime.datetime.min)
+        if cursor is not None:
+            cursor_event = aliased(Event)
+            cursor_key = select(func.coalesce(cursor_event.date, datetime.datetime.min)).where(
+                cursor_event.id == cursor).scalar_subquery()
+            if backward:
+                query = query.where(or_(key < cursor_key, and_(key == cursor_key, Event.id < cursor)))
+            else:
+                query = query.where(or_(key > cursor_key, and_(key == cursor_key, Event.id > cursor)))
+        order = (key.desc(), Event.id.desc()) if backward else (key, Event.id)
+        events = list((await self.db_session.scalars(query.order_by(*order).limit(limit + 1))).all())
+        has_more = len(events) > limit
+        events = events[:limit]
+        if backward:
+            events.reverse()
+            return events, has_more, cursor is not None
+        return events, cursor is not None, has_more
+
+    @staticmethod
+    def visitors_query(query, eid: int):
+        return query.select_from(EventUsers).join(User, EventUsers.user_id == User.id).where(
+            EventUsers.event_id == eid, User.rank == Rank.USER)
+
+    async def get_attendance_counts(self, eid: int) -> Dict[Optional[StatusAttendion], int]:
+        rows = await self.db_session.execute(
+            self.visitors_query(select(EventUsers.status_attendion, func.count()), eid).group_by(
+                EventUsers.status_attendion))
+        return {status: count for status, count in rows}
+
+    async def get_visited_user_ids(self, eid: int) -> List[int]:
+        return list((await self.db_session.scalars(self.visitors_query(select(User.id), eid).where(
+            EventUsers.status_attendion == StatusAttendion.ARRIVED))).all())
+
+    async def get_visited_users_page(self, eid: int, cursor: int = None, backward: bool = False,
+                                     limit: int = config.VISITORS_PAGE_SIZE):
+        query = self.visitors_query(select(User), eid).where(EventUsers.status_attendion == StatusAttendion.ARRIVED)
+        if cursor is not None:
+            query = query.where(User.id < cursor if backward else User.id > cursor)
+        users = list((await self.db_session.scalars(
+            query.order_by(User.id.desc() if backward else User.id).limit(limit + 1))).all())
+        has_more = len(users) > limit
+        users = users[:limit]
+        if backward:
+            users.reverse()
+            return users, has_more, cursor is not None
+        return users, cursor is not None, has_more
+
+    async def get_changed_since(self, model, since: datetime.datetime = None, after_id: int = None,
+                                limit: int = config.SYNC_BATCH_SIZE) -> list:
+        query = select(model)
+        if since is not None:
+            if after_id is None:
+                query = query.where(model.updated_at >= since)
+            else:
+                query = query.where(or_(model.updated_at > since, and_(model.updated_at == since, model.id > after_id)))
+        return list((await self.db_session.scalars(query.order_by(model.updated_at, model.id).limit(limit))).all())
+
+    async def get_step(self, uid: int) -> Step:
+        state = await self.storage.get_state(chat=uid, user=uid)
+        return Step.NONE if state is None else Step[state]
+
+    async def get_context(self, uid: int) -> dict:
+        if uid not in self.contexts:
+            self.contexts[uid] = await self.storage.get_data(chat=uid, user=uid)
+        return self.contexts[uid]
+
+    async def get_context_value(self, uid: int, key: str):
+        try:
+            return (await self.get_context(uid))[key]
+        except KeyError:
+            raise NotFoundObjectError
+
+    async def set_context_value(self, uid: int, key: str, value):
+        (await self.get_context(uid))[key] = value
+        self.changed_contexts.add(uid)
+
+    async def remove_context_value(self, uid: int, key: str):
+        if (await self.get_context(uid)).pop(key, None) is not None:
+            self.changed_contexts.add(uid)
+
+    async def get_editor_event(self, uid: int) -> int:
+        return await self.get_context_value(uid, 'event_id')
+
+    async def get_event_by_editor(self, uid: int) -> Event:
+        return await self.get_event_by_id(await self.get_editor_event(uid))
+
+    async def get_code_model_by_id(self, eid: int, uid: int) -> EventCodes:
+        return (await self.db_session.scalars(select(EventCodes).where(
+            and_(EventCodes.event_id == eid, EventCodes.user_id == uid)))).one()
+
+    async def get_feedbacks_page(self, eid: int, cursor: int = None, backward: bool = False,
+                                 limit: int = config.FEEDBACKS_PAGE_SIZE):
+        query = select(EventFeedbacks.id, EventFeedbacks.fb_text).where(EventFeedbacks.event_id == eid)
+        if cursor is not None:
+            query = query.where(EventFeedbacks.id < cursor if backward else EventFeedbacks.id > cursor)
+        feedbacks = list((await self.db_session.execute(
+            query.order_by(EventFeedbacks.id.desc() if backward else EventFeedbacks.id).limit(limit + 1))).all())
+        has_more = len(feedbacks) > limit
+        feedbacks = feedbacks[:limit]
+        if backward:
+            feedbacks.reverse()
+            return feedbacks, has_more, cursor is not None
+        return feedbacks, cursor is not None, has_more
+
+    async def stream_event_export(self, event: Event):
+        yield {'record': 'event', 'event_id': event.id, 'name': event.name, 'description': event.description,
+               'date': event.date, 'status': event.status, 'created_at': event.created_at}
+
+        attendance = await self.db_session.stream(
+            select(EventUsers.event_id, EventUsers.user_id, User.first_name, User.middle_name, User.last_name,
+                   EventUsers.status_attendion.label('attendance'), EventUsers.created_at)
+            .join(User, User.id == EventUsers.user_id).where(EventUsers.event_id == event.id)
+            .order_by(EventUsers.id).execution_options(yield_per=config.EXPORT_CHUNK_SIZE))
+        async for row in attendance:
+            yield {'record': 'attendance', **row._asdict()}
+
+        feedbacks = await self.db_session.stream(
+            select(EventFeedbacks.event_id, EventFeedbacks.fb_text.label('feedback'), EventFeedbacks.neutral,
+                   EventFeedbacks.negative, EventFeedbacks.positive, EventFeedbacks.created_at)
+            .where(EventFeedbacks.event_id == event.id)
+            .order_by(EventFeedbacks.id).execution_options(yield_per=config.EXPORT_CHUNK_SIZE))
+        async for row in feedbacks:
+            yield {'record': 'feedback', **row._asdict()}
+
+    async def get_feedback_summary(self, eid: int) -> EventFeedbackSummary:
+        return (await self.db_session.scalars(
+            select(EventFeedbackSummary).where(EventFeedbackSummary.event_id == eid))).one_or_none()
+
+    async def get_unscored_feedbacks(self, feedback_ids, limit: int):
+        query = select(EventFeedbacks).where(EventFeedbacks.neutral == None)
+        if feedback_ids is not None:
+            query = query.where(EventFeedbacks.id.in_(feedback_ids))
+        return (await self.db_session.scalars(query.order_by(EventFeedbacks.id).limit(limit))).all()
+
+    async def add_feedback_scores(self, feedbacks, results):
+        summaries = {}
+        for feedback, sentiment in zip(feedbacks, results):
+            feedback.set_sentiment(sentiment)
+            summary = summaries.get(feedback.event_id)
+            if summary is None:
+                summary = EventFeedbackSummary(event_id=feedback.event_id, count=0, neutral=0.0, negative=0.0,
+                                               positive=0.0)
+                summaries[feedback.event_id] = summary
+            summary.add_feedback(feedback)
+        for summary in summaries.values():
+            await self.db_session.add_to_model(summary, ['event_id'])
+
+    async def get_entity_by_model_id(self, model, mid):
+        return (await self.db_session.scalars(select(model).where(model.id == mid))).one()
+
+    async def get_entities_by_model(self, model):
+        return (await self.db_session.scalars(select(model))).all()
+
+    async def add_new_user(self, uid):
+        user = User(id=uid, rank=Rank.USER, step=Step.FIRST_NAME, rating=0)
+        await self.db_session.add_model(model=user)
+        self.users[uid] = user
+        self.audience_changes.append(('user', None, uid, True))
+        self.steps[uid] = Step.NONE
+
+    async def get_user_ranks(self, ids) -> Dict[int, Rank]:
+        if len(ids) == 0:
+            return {}
+        rows = await self.db_session.execute(select(User.id, User.rank).where(User.id.in_(ids)))
+        return {uid: rank for uid, rank in rows}
+
+    async def get_ids_by_names(self, model, model_column) -> Dict[str, int]:
+        return {name: eid for eid, name in await self.db_session.execute(select(model.id, model_column))}
+
+    async def import_users(self, ranks: Dict[int, Rank], groups: Set[Tuple[int, int]],
+                           interests: Set[Tuple[int, int]]):
+        if len(ranks) != 0:
+            users = User.__table__
+            await self.db_session.execute(
+                update(users).where(users.c.id == bindparam('b_id')).values(rank=bindparam('b_rank')),
+                [{'b_id': uid, 'b_rank': rank} for uid, rank in ranks.items()])
+        for kind, relation_model, relation_column, pairs in (('group', UserGroups, UserGroups.group_id, groups),
+                                                             ('interest', UserInterests, UserInterests.interest_id,
+                                                              interests)):
+            if len(pairs) == 0:
+                continue
+            existing = set((await self.db_session.execute(select(relation_model.user_id, relation_column).where(
+                relation_model.user_id.in_({uid for uid, _ in pairs})))).all())
+            new_pairs = sorted(pairs - existing)
+            if len(new_pairs) != 0:
+                await self.db_session.execute(insert(relation_model), [
+                    {'user_id': uid, relation_column.key: related_id} for uid, related_id in new_pairs])
+                self.audience_changes.extend((kind, related_id, uid, True) for uid, related_id in new_pairs)
+        await self.save()
+        for uid in ranks:
+            self.user_states.invalidate(uid)
+
+    async def get_entity_by_model_with_name(self, model, model_column, name):
+        return (await self.db_session.scalars(select(model).where(model_column == name))).one()
+
+    async def set_step_to_user(self, user, step):
         user.step = step
-        self.db_session.commit_session()
-
-    def add_feedback_to_event(self, user, feedback):
-        editor = self.get_editor_event(user.id)
-        eid = editor.event_id
-        self.db_session.add_model(EventFeedbacks(event_id=eid, fb_text=feedback))
-        self.db_session.delete_model(editor)
-
-    def mark_presents(self, user, code):
-        event_codes = self.db_session.query(EventCodes).filter(EventCodes.code == code).one()
-
-        event_users = self.db_session.query(EventUsers).filter(
-            and_(EventUsers.event_id == event_codes.event_id, EventUsers.user_id == event_codes.user_id)).one()
-        event_users.status_attendion = StatusAttendion.ARRIVED
-
-        self.db_session.delete_model(event_codes)
-        self.db_session.delete_model(self.get_editor_event(user.id))
-
-    def add_event_editor(self, event_id, user_id):
-        self.db_session.add_model(EventEditors(event_id=event_id, user_id=user_id))
-
-    def remove_code(self, event, user):
-        self.db_session.delete_model(self.get_code_model_by_id(event.id, user.id))
-
-    def add_code(self, event, user, code):
-        self.db_session.add_model(EventCodes(event_id=event.id, user_id=user.id, code=code))
-
-    def get_entities_by_model_with_relationship(self, entity, model, relation_model, relation_column,
-                                                relation_column_entity_id, de_attach):
-        return self.db_session.query(model).filter(model.id.not_in(
-            self.db_session.query(relation_model).with_entities(relation_column).filter(
-                relation_column_entity_id == entity.id))).all() if not de_attach \
-            else self.db_session.query(model).filter(
-            model.id.in_(self.db_session.query(relation_model).with_entities(relation_column)
-                         .filter(relation_column_entity_id == entity.id))).all()
-
-    def save(self):
-        self.db_session.commit_session()
-
-    def get_friend_list(self, user):
-        return self.db_session.query(UserFriends, User).filter(UserFriends.user_id == user.id,
-                                                               UserFriends.friend_id == User.id,
-                                                               UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED) \
-            .with_entities(User.first_name, User.middle_name, User.last_name, UserFriends.friend_id).all()
-
-    def add_friend(self, uid, fid, status):
-        self.db_session.add_model(UserFriends(user_id=uid, friend_id=fid, friend_request_status=status))
-
-    def has_friend_request(self, uid, fid):
-        return self.db_session.query(UserFriends).filter(UserFriends.user_id == uid,
-                                                         UserFriends.friend_id == fid).one_or_none() is not None
-
-    def get_friend_requests(self, uid):
-        return self.db_session.query(UserFriends, User).filter(UserFriends.user_id == uid,
-                                                               UserFriends.friend_id == User.id,
-                                                               UserFriends.friend_request_status == FriendRequestStatus.WAITING) \
-            .with_entities(User.first_name, User.middle_name, User.last_name, UserFriends.friend_id).all()
-
-    def accept_friend_request(self, uid, fid):
-        request = self.db_session.query(UserFriends).filter(UserFriends.user_id == uid,
-                                                            UserFriends.friend_id == fid).one()
+        await self.save()
+
+    async def add_feedback_to_event(self, user, feedback):
+        eid = await self.get_editor_event(user.id)
+        feedback = EventFeedbacks(event_id=eid, fb_text=feedback)
+        await self.db_session.add_model(feedback)
+        self.new_feedbacks.append(feedback)
+        await self.remove_event_editor(user.id)
+
+    async def start_check_in(self, eid: int):
+        rows = await self.db_session.execute(
+            select(EventCodes.code, EventCodes.user_id).where(EventCodes.event_id == eid))
+        return check_in_sessions.start(eid, {code: uid for code, uid in rows})
+
+    async def finish_check_in(self, eid: int):
+        check_in_sessions.finish(eid)
+
+    async def check_in_codes(self, eid: int, codes):
+        session = check_in_sessions.get(eid)
+        if session is None:
+            session = await self.start_check_in(eid)
+
+        found, unknown = session.take(codes)
+        if len(unknown) != 0:
+            rows = await self.db_session.execute(select(EventCodes.code, EventCodes.user_id).where(
+                EventCodes.event_id == eid, EventCodes.code.in_(unknown)))
+            found.update({code: uid for code, uid in rows})
+            unknown = [code for code in unknown if code not in found]
+
+        if len(found) != 0:
+            await self.db_session.execute(
+                update(EventUsers).where(EventUsers.event_id == eid, EventUsers.user_id.in_(set(found.values())))
+                .values(status_attendion=StatusAttendion.ARRIVED).execution_options(synchronize_session=False))
+            await self.db_session.execute(
+                delete(EventCodes).where(EventCodes.code.in_(found.keys())).execution_options(
+                    synchronize_session=False))
+            session.checked_in += len(found)
+
+        return list(found), unknown
+
+    async def add_event_editor(self, event_id, user_id):
+        await self.set_context_value(user_id, 'event_id', event_id)
+
+    async def remove_event_editor(self, user_id):
+        await self.remove_context_value(user_id, 'event_id')
+
+    async def remove_code(self, event, user):
+        code = await self.get_code_model_by_id(event.id, user.id)
+        check_in_sessions.discard_code(event.id, code.code)
+        await self.db_session.delete_model(code)
+
+    async def get_entities_by_model_with_relationship(self, entity, model, relation_model, relation_column,
+                                                      relation_column_entity_id, de_attach):
+        related_ids = select(relation_column).where(relation_column_entity_id == entity.id)
+        return (await self.db_session.scalars(select(model).where(
+            model.id.not_in(related_ids) if not de_attach else model.id.in_(related_ids)))).all()
+
+    async def manage_relationship(self, entity, related, relation_model, relation_column, relation_column_entity_id,
+                                  attach):
+        if attach:
+            await self.db_session.add_model(relation_model(**{relation_column_entity_id.key: entity.id,
+                                                              relation_column.key: related.id}))
+        else:
+            await self.db_session.execute(delete(relation_model).where(relation_column_entity_id == entity.id,
+                                                                       relation_column == related.id))
+        if relation_model is UserGroups or relation_model is UserInterests:
+            self.audience_changes.append(
+                ('group' if relation_model is UserGroups else 'interest', related.id, entity.id, attach))
+
+    async def save(self):
+        await self.db_session.commit_session()
+        for user in self.users.values():
+            if user.step != self.steps.get(user.id):
+                await self.storage.set_state(chat=user.id, user=user.id,
+                                             state=None if user.step == Step.NONE else user.step.name)
+                self.steps[user.id] = user.step
+            self.user_states.put(UserState.from_user(user))
+        for uid in self.changed_contexts:
+            await self.storage.set_data(chat=uid, user=uid, data=self.contexts[uid])
+        self.changed_contexts.clear()
+        if len(self.new_feedbacks) != 0:
+            feedback_scorer.submit(*(feedback.id for feedback in self.new_feedbacks))
+            self.new_feedbacks.clear()
+        for new_code in self.new_codes:
+            check_in_sessions.add_code(*new_code)
+        self.new_codes.clear()
+        for change in self.audience_changes:
+            audience_index.apply(*change)
+        self.audience_changes.clear()
+
+    async def get_friend_list(self, user):
+        return (await self.db_session.execute(
+            select(User.first_name, User.middle_name, User.last_name, UserFriends.friend_id).where(
+                UserFriends.user_id == user.id, UserFriends.friend_id == User.id,
+                UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED))).all()
+
+    async def add_friend(self, uid, fid, status):
+        await self.db_session.add_model(UserFriends(user_id=uid, friend_id=fid, friend_request_status=status))
+
+    async def has_friend_request(self, uid, fid):
+        return (await self.db_session.scalars(select(UserFriends).where(
+            UserFriends.user_id == uid, UserFriends.friend_id == fid))).one_or_none() is not None
+
+    async def get_friend_requests(self, uid):
+        return (await self.db_session.execute(
+            select(User.first_name, User.middle_name, User.last_name, UserFriends.friend_id).where(
+                UserFriends.user_id == uid, UserFriends.friend_id == User.id,
+                UserFriends.friend_request_status == FriendRequestStatus.WAITING))).all()
+
+    async def accept_friend_request(self, uid, fid):
+        request = (await self.db_session.scalars(select(UserFriends).where(
+            UserFriends.user_id == uid, UserFriends.friend_id == fid))).one()
         request.friend_request_status = FriendRequestStatus.ACCEPTED
-        self.db_session.commit_session()
-
-    def decline_friend_request(self, uid, fid):
-        request = self.db_session.query(UserFriends).filter(UserFriends.user_id == uid,
-                                                            UserFriends.friend_id == fid).one()
-        request2 = self.db_session.query(UserFriends).filter(UserFriends.user_id == fid,
-                                                             UserFriends.friend_id == uid).one()
-        self.db_session.delete_model(request)
-        self.db_session.delete_model(request2)
-        self.db_session.commit_session()
-
-    def delete_friend(self, uid, fid):
-        request = self.db_session.query(UserFriends).filter(UserFriends.user_id == uid, UserFriends.friend_id == fid,
-                                                            UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED).one()
-        request2 = self.db_session.query(UserFriends).filter(UserFriends.user_id == fid, UserFriends.friend_id == uid,
-                                                             UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED).one()
-        self.db_session.delete_model(request)
-        self.db_session.delete_model(request2)
-        self.db_session.commit_session()
-
-    def give_rate(self, uid, amount: int):
-        request = self.db_session.query(User).filter(User.id == uid).one()
+        await self.save()
+
+    async def decline_friend_request(self, uid, fid):
+        request = (await self.db_session.scalars(select(UserFriends).where(
+            UserFriends.user_id == uid, UserFriends.friend_id == fid))).one()
+        request2 = (await self.db_session.scalars(select(UserFriends).where(
+            UserFriends.user_id == fid, UserFriends.friend_id == uid))).one()
+        await self.db_session.delete_model(request)
+        await self.db_session.delete_model(request2)
+        await self.save()
+
+    async def delete_friend(self, uid, fid):
+        request = (await self.db_session.scalars(select(UserFriends).where(
+            UserFriends.user_id == uid, UserFriends.friend_id == fid,
+            UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED))).one()
+        request2 = (await self.db_session.scalars(select(UserFriends).where(
+            UserFriends.user_id == fid, UserFriends.friend_id == uid,
+            UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED))).one()
+        await self.db_session.delete_model(request)
+        await self.db_session.delete_model(request2)
+        await self.save()
+
+    async def give_rate(self, uid, amount: int):
+        request = await self.get_user_by_id(uid)
         request.rating += amount
-        self.db_session.commit_session()
-
-    def get_rate_editor(self, oid):
-        return self.db_session.query(OrganizerRateUser).filter(OrganizerRateUser.org_id == oid).one()
-
-    def get_achievement_by_creator(self, user: User) -> Achievement:
-        return self.db_session.query(Achievement).filter(
-            and_(Achievement.creator == user.id, Achievement.image == None)).one()
-
-    def get_achievement_list(self):
-        return self.db_session.query(Achievement).all()
-
-    def get_achievement_reciever(self, oid):
-        return self.db_session.query(OrganizerToUserAchievement).filter(
-            OrganizerToUserAchievement.organizer_id == oid).one()
-
-    def get_achievement_by_id(self, aid: int):
-        return self.db_session.query(Achievement).filter(Achievement.id == aid).one()
-
-    def get_users_not_at_event(self, event: Event):
-        query = self.db_session.query(User).filter(
-            User.id.not_in(self.db_session.query(EventUsers).with_entities(EventUsers.user_id).filter(
-                EventUsers.event_id == event.id)))
-        if len(event.groups) > 0:
-            query = query.filter(User.id.in_(
-                self.db_session.query(EventGroups).join(UserGroups, EventGroups.group_id == UserGroups.group_id).filter(
-                    EventGroups.event_id == event.id).with_entities(UserGroups.user_id)))
-        if len(event.interests) > 0:
-            query = query.filter(User.id.in_(self.db_session.query(EventInterests).join(UserInterests,
-                                                                                        EventInterests.interest_id == UserInterests.interest_id).filter(
-                EventInterests.event_id == event.id).with_entities(UserInterests.user_id)))
-        return query.all()
-
-    def get_friends_on_event(self, user, event):
-        return self.db_session.query(User).filter(UserFriends.friend_id == user.id).filter(
-            UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED).filter(
-            UserFriends.user_id == User.id).filter(
-            User.id.in_(self.db_session.query(EventUsers).with_entities(EventUsers.user_id).filter(
-                EventUsers.event_id == event.id))).all()
+        await self.save()
+
+    async def get_rate_editor(self, oid) -> int:
+        return await self.get_context_value(oid, 'rate_user_id')
+
+    async def add_rate_editor(self, oid, uid):
+        await self.set_context_value(oid, 'rate_user_id', uid)
+
+    async def remove_rate_editor(self, oid):
+        await self.remove_context_value(oid, 'rate_user_id')
+
+    async def get_achievement_by_creator(self, user: User) -> Achievement:
+        return (await self.db_session.scalars(select(Achievement).where(
+            and_(Achievement.creator == user.id, Achievement.image == None)))).one()
+
+    async def get_achievement_list(self):
+        return (await self.db_session.scalars(select(Achievement))).all()
+
+    async def get_achievement_reciever(self, oid) -> int:
+        return await self.get_context_value(oid, 'achievement_user_id')
+
+    async def add_achievement_reciever(self, oid, uid):
+        await self.set_context_value(oid, 'achievement_user_id', uid)
+
+    async def remove_achievement_reciever(self, oid):
+        await self.remove_context_value(oid, 'achievement_user_id')
+
+    async def get_achievement_ids_by_user(self, uid: int):
+        return (await self.db_session.scalars(
+            select(UserAchievements.achievement_id).where(UserAchievements.user_id == uid))).all()
+
+    async def get_achievement_image_versions(self, achievement_ids):
+        return (await self.db_session.execute(
+            select(Achievement.id, Achievement.updated_at).where(Achievement.id.in_(achievement_ids),
+                                                                 Achievement.image != None)
+            .order_by(Achievement.id))).all()
+
+    async def get_achievement_images(self, achievement_ids):
+        return (await self.db_session.scalars(
+            select(Achievement.image).where(Achievement.id.in_(achievement_ids), Achievement.image != None)
+            .order_by(Achievement.id))).all()
+
+    async def get_achievement_by_id(self, aid: int):
+        return (await self.db_session.scalars(select(Achievement).where(Achievement.id == aid))).one()
+
+    async def give_achievement(self, uid, achievement):
+        await self.db_session.add_model(UserAchievements(user_id=uid, achievement_id=achievement.id))
+
+    async def get_event_audience(self, event: Event) -> List[int]:
+        await audience_index.ensure_loaded(self.db_session)
+        group_ids = (await self.db_session.scalars(
+            select(EventGroups.group_id).where(EventGroups.event_id == event.id))).all()
+        interest_ids = (await self.db_session.scalars(
+            select(EventInterests.interest_id).where(EventInterests.event_id == event.id))).all()
+        participant_ids = (await self.db_session.scalars(
+            select(EventUsers.user_id).where(EventUsers.event_id == event.id))).all()
+        return audience_index.audience(group_ids, interest_ids, participant_ids)
+
+    async def get_friends_on_events(self, uid: int, event_ids) -> dict:
+        friends = {event_id: [] for event_id in event_ids}
+        if len(friends) != 0:
+            rows = await self.db_session.execute(
+                select(EventUsers.event_id, User).join(User, User.id == EventUsers.user_id)
+                .join(UserFriends, UserFriends.user_id == User.id).where(
+                    EventUsers.event_id.in_(friends.keys()), UserFriends.friend_id == uid,
+                    UserFriends.friend_request_status == FriendRequestStatus.ACCEPTED))
+            for event_id, friend in rows:
+                friends[event_id].append(friend)
+        return friends
+
+    async def get_event_feed(self, uid: int, cursor: int = None, backward: bool = False):
+        events, has_prev, has_next = await self.get_events_page(self.events_not_participate_user_query(uid),
+                                                                cursor, backward)
+        friends = await self.get_friends_on_events(uid, [event.id for event in events])
+        return [(event, friends[event.id]) for event in events], has_prev, has_next
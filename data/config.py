@@ -1,5 +1,64 @@
 from .secret import tg_token
 
 DATABASE_NAME = 'events.db'
+DATABASE_URL = f'sqlite+aiosqlite:///{DATABASE_NAME}'
+DATABASE_POOL_SIZE = 5
+DATABASE_MAX_OVERFLOW = 10
+DATABASE_POOL_TIMEOUT = 30
+DATABASE_POOL_RECYCLE = 1800
+DATABASE_ECHO = False
+DATABASE_PROFILE = 'wal'
+DATABASE_PROFILES = {
+    'default': {},
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 268435456,
+        'cache_size': -65536
+    },
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000
+    }
+}
+
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 300
+
+FSM_STORAGE = 'sqlite'
+FSM_STORAGE_PATH = 'fsm.db'
+
+BROADCAST_RATE = 25
+BROADCAST_CONCURRENCY = 8
+BROADCAST_MAX_RETRIES = 3
+
+EVENTS_PAGE_SIZE = 5
+VISITORS_PAGE_SIZE = 10
+FEEDBACKS_PAGE_SIZE = 10
+SYNC_BATCH_SIZE = 500
+AUDIENCE_CHUNK_SIZE = 10000
+AUDIENCE_TTL = 600
+EXPORT_CHUNK_SIZE = 1000
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_SIZE = 5 * 1024 * 1024
+IMPORT_MAX_REPORTED_ERRORS = 20
+
+ACHIEVEMENT_COLLAGE_PATH = 'achievements'
+COLLAGE_CACHE_SIZE = 10000
+
+SENTIMENT_WORKERS = 1
+SENTIMENT_BATCH_SIZE = 64
+
+IMAGE_WORKERS = 4
+QR_DECODE_MIN_SIDE = 320
+QR_DECODE_MAX_SIDE = 1024
+QR_CACHE_SIZE = 10000
+CODE_INSERT_ATTEMPTS = 5
+
+METRICS_ENABLED = True
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9464
 
 TG_TOKEN = tg_token
\ No newline at end of file
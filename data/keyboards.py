@@ -12,9 +12,10 @@ keyboards_by_rank = {
              'Мои заявки в друзья'),
     Rank.ORGANIZER: ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
         .row('Добавить мероприятие', 'Мои мероприятия')
-        .row('Добавить модератора', 'Добавить достижение'),
+        .row('Добавить модератора', 'Добавить достижение')
+        .row('Импорт пользователей'),
     Rank.ADMIN: ReplyKeyboardMarkup(resize_keyboard=True)
-        .add('Интересы', 'Группы', 'Добавить организатора')
+        .add('Интересы', 'Группы', 'Добавить организатора', 'Импорт пользователей')
 }
 
 keyboards_by_status_event_and_by_rank = {
@@ -28,7 +29,8 @@ keyboards_by_status_event_and_by_rank = {
             .row(InlineKeyboardButton('Добавить интерес', callback_data=f'eat_interest_{e.id}'),
                  InlineKeyboardButton('Удалить интерес', callback_data=f'edeat_interest_{e.id}')),
         Rank.USER: lambda e: InlineKeyboardMarkup()
-            .add(InlineKeyboardButton('Отменить заявку на участие', callback_data=f"ecan_{e.id}")),
+            .row(InlineKeyboardButton('Показать код', callback_data=f"qr_{e.id}"))
+            .row(InlineKeyboardButton('Отменить заявку на участие', callback_data=f"ecan_{e.id}")),
         Rank.MODER: lambda e: InlineKeyboardMarkup()
             .row(InlineKeyboardButton('Отменить заявку на участие', callback_data=f"ecan_{e.id}"))
             .row(InlineKeyboardButton('Отметить присутствующих', callback_data=f"marpr_{e.id}")),
@@ -36,7 +38,9 @@ keyboards_by_status_event_and_by_rank = {
     StatusEvent.FINISHED: {
         Rank.ORGANIZER: lambda e: InlineKeyboardMarkup().add(
             InlineKeyboardButton('Статистика посещения', callback_data=f"atst_{e.id}"),
-            InlineKeyboardButton('Просмотреть отзывы', callback_data=f"fbst_{e.id}")),
+            InlineKeyboardButton('Просмотреть отзывы', callback_data=f"fbst_{e.id}"))
+            .row(InlineKeyboardButton('Выгрузить CSV', callback_data=f"exp_csv_{e.id}"),
+                 InlineKeyboardButton('Выгрузить JSONL', callback_data=f"exp_jsonl_{e.id}")),
         Rank.USER: lambda e: InlineKeyboardMarkup().add(
             InlineKeyboardButton('Оставить отзыв', callback_data=f"feb_{e.id}"))
     }
@@ -0,0 +1,27 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from data import config
+
+
+def set_pragmas(pragmas: dict):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    return on_connect
+
+
+def create_database_engine(url: str = config.DATABASE_URL, profile: str = config.DATABASE_PROFILE,
+                           echo: bool = config.DATABASE_ECHO) -> AsyncEngine:
+    engine = create_async_engine(url, echo=echo, poolclass=AsyncAdaptedQueuePool, pool_size=config.DATABASE_POOL_SIZE,
+                                 max_overflow=config.DATABASE_MAX_OVERFLOW, pool_timeout=config.DATABASE_POOL_TIMEOUT,
+                                 pool_recycle=config.DATABASE_POOL_RECYCLE, pool_pre_ping=True)
+    if engine.dialect.name == 'sqlite':
+        pragmas = config.DATABASE_PROFILES[profile]
+        if len(pragmas) != 0:
+            event.listen(engine.sync_engine, 'connect', set_pragmas(pragmas))
+    return engine
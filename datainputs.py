@@ -1,3 +1,5 @@
+import csv
+import re
 from abc import ABC, abstractmethod
 from datetime import datetime
 from io import BytesIO
@@ -5,14 +7,16 @@ from io import BytesIO
 from aiogram.types import Message, ReplyKeyboardRemove
 from sqlalchemy.exc import NoResultFound
 
-from controller import Controller, get_code_from_photo
+from broadcast import broadcaster
+from controller import AsyncController, read_code_from_photo, photo_sizes_for_decoding
+from data import config
 from data.keyboards import keyboards_by_rank
 from enums.friend_request_status import FriendRequestStatus
 from enums.ranks import Rank
 from enums.steps import Step
 from exceptions import NotFoundObjectError, ObjectAlreadyCreatedError
 from models import User, Interest, LocalGroup, Achievement
-from models.user import OrganizerRateUser
+from userimport import UserImport, readers
 
 
 class DataInput(ABC):
@@ -26,13 +30,13 @@ class DataInput(ABC):
         self.can_be_canceled = can_be_canceled
 
     @abstractmethod
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         pass
 
-    async def input(self, controller: Controller, user: User, message: Message):
+    async def input(self, controller: AsyncController, user: User, message: Message):
         if self.can_be_canceled and message.text is not None and message.text.lower() in 'отмена':
             user.step = Step.NONE
-            controller.save()
+            await controller.save()
 
             await message.answer('Операция успешно отменена', reply_markup=keyboards_by_rank[user.rank])
             return
@@ -44,11 +48,15 @@ class DataInput(ABC):
         if user.step == Step.NONE:
             reply_markup = keyboards_by_rank[user.rank]
         await message.answer(text, reply_markup=reply_markup)
-        controller.save()
+        await controller.save()
 
     def can_input(self, user: User, message: Message) -> bool:
         return message.text is not None and user.step == self.from_step
 
+    @property
+    def from_steps(self) -> tuple:
+        return (self.from_step,)
+
 
 class UserDataInput(DataInput, ABC):
     def __init__(self, from_step, second_from_step, to_step, _lambda, next_message):
@@ -57,7 +65,7 @@ class UserDataInput(DataInput, ABC):
         self._lambda = _lambda
         self.next_message = next_message
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         self._lambda(user, message.text)
         if str(user.previous_step).endswith('ONLY'):
             user.step = Step.NONE
@@ -67,23 +75,26 @@ class UserDataInput(DataInput, ABC):
     def can_input(self, user: User, message: Message) -> bool:
         return message.text is not None and (user.step == self.from_step or user.step == self.second_from_step)
 
+    @property
+    def from_steps(self) -> tuple:
+        return (self.from_step, self.second_from_step)
+
 
 class EventDataInput(DataInput, ABC):
     def __init__(self, from_step, _lambda):
         super().__init__(from_step, Step.NONE, True)
         self._lambda = _lambda
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         try:
-            event_editor = controller.get_editor_event(user.id)
-            self._lambda(controller.get_event_by_id(event_editor.event_id), message)
+            self._lambda(await controller.get_event_by_editor(user.id), message)
 
-            controller.db_session.delete_model(event_editor)
-            controller.save()
+            await controller.remove_event_editor(user.id)
+            await controller.save()
             return 'Операция успешно выполнена'
-        except NoResultFound:
+        except (NotFoundObjectError, NoResultFound):
             if self.from_step == Step.EVENT_NAME:
-                controller.create_event(message.text, user)
+                await controller.create_event(message.text, user)
                 return 'Мероприятие успешно создано. Теперь вы можете перейти в его настройки и указать дату, ' \
                        'описание и местоположение '
             return 'Мероприятие не найдено'
@@ -97,14 +108,14 @@ class AddFriendRequestInput(DataInput, ABC):
     def __init__(self):
         super().__init__(Step.ADD_FRIEND, Step.NONE, True)
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         try:
             uid = int(message.text)
-            controller.get_user_by_id(uid)
-            if controller.has_friend_request(user.id, uid):
+            await controller.get_user_by_id(uid)
+            if await controller.has_friend_request(user.id, uid):
                 return 'Вы уже отправили этому человеку запрос на дружбу'
-            controller.add_friend(user.id, uid, FriendRequestStatus.ACCEPTED)
-            controller.add_friend(uid, user.id, FriendRequestStatus.WAITING)
+            await controller.add_friend(user.id, uid, FriendRequestStatus.ACCEPTED)
+            await controller.add_friend(uid, user.id, FriendRequestStatus.WAITING)
             return 'Заявка отправлена!'
         except ValueError or NoResultFound:
             user.step = Step.ADD_FRIEND
@@ -115,13 +126,11 @@ class GiveRatingInput(DataInput, ABC):
     def __init__(self):
         super().__init__(Step.GIVE_RATING, Step.NONE, False)
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
-        uid = controller.get_rate_editor(user.id)
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
+        uid = await controller.get_rate_editor(user.id)
         amount = int(message.text)
-        controller.give_rate(uid.user_id, amount)
-        req = controller.db_session.query(OrganizerRateUser).filter(OrganizerRateUser.org_id == user.id,
-                                                                    OrganizerRateUser.user_id == uid.user_id).one()
-        controller.db_session.delete_model(req)
+        await controller.give_rate(uid, amount)
+        await controller.remove_rate_editor(user.id)
         return 'Баллы успешно начислены!'
 
     def can_input(self, user: User, message: Message) -> bool:
@@ -137,12 +146,12 @@ class AppointAsInput(DataInput, ABC):
         self.rank = rank
         self.name = name
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         text = message.text
         try:
             uid = int(text)
             try:
-                target_user = controller.get_user_by_id(uid)
+                target_user = await controller.get_user_by_id(uid)
                 target_user.rank = self.rank
                 await message.bot.send_message(chat_id=target_user.id, text=f'Вас назначили {self.name}',
                                                reply_markup=keyboards_by_rank[self.rank])
@@ -164,11 +173,11 @@ class ManageSomethingDataInput(DataInput, ABC):
         self._lambda = _lambda
         self.removing = str(from_step).endswith('REMOVE')
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         new_name = message.text
         try:
-            controller.manage_something_model(self.model, self.model_column,
-                                              new_name, self._lambda, self.removing)
+            await controller.manage_something_model(self.model, self.model_column,
+                                                    new_name, self._lambda, self.removing)
             return 'Операция успешно выполнена'
         except NotFoundObjectError:
             user.step = self.from_step
@@ -182,37 +191,42 @@ class FeedbackToEventInput(DataInput, ABC):
     def __init__(self):
         super().__init__(Step.FEEDBACK_TEXT, Step.NONE, True)
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
-        controller.add_feedback_to_event(user, message.text)
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
+        await controller.add_feedback_to_event(user, message.text)
         return 'Отзыв отправлен!'
 
 
 class MarkPresentInput(DataInput, ABC):
     def __init__(self):
-        super().__init__(Step.VERIFICATION_PRESENT, Step.NONE, True)
+        super().__init__(Step.VERIFICATION_PRESENT, Step.VERIFICATION_PRESENT, True)
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         if message.text is not None:
-            code = message.text
+            codes = [code for code in re.split(r'[\s,;]+', message.text.strip().upper()) if code != '']
         else:
-            photo = message.photo[-1]
-
-            output = BytesIO()
-            await photo.download(destination_file=output)
-            output.seek(0)
-
-            code = get_code_from_photo(output)
+            code = None
+            for photo in photo_sizes_for_decoding(message.photo):
+                output = BytesIO()
+                await photo.download(destination_file=output)
+                output.seek(0)
+
+                code = await read_code_from_photo(output)
+                if code is not None:
+                    break
             if code is None:
-                user.step = Step.VERIFICATION_PRESENT
                 return 'Произошла ошибка при распознавании QR-кода. Попробуйте снова или напишите \'отмена\''
+            codes = [code]
 
         try:
-            controller.mark_presents(user, code)
+            checked_in, unknown = await controller.check_in_codes(await controller.get_editor_event(user.id), codes)
+        except NotFoundObjectError:
+            user.step = Step.NONE
+            return 'Мероприятие не найдено'
 
-            return 'Пользователь успешно отмечен'
-        except NoResultFound as e:
-            user.step = Step.VERIFICATION_PRESENT
-            return f'Произошла ошибка ({e.code}). Попробуйте снова или напишите \'отмена\''
+        text = f'Отмечено пользователей: {len(checked_in)}'
+        if len(unknown) != 0:
+            text += f'\nНе найдены коды: {", ".join(unknown)}'
+        return text + '\n\nПришлите следующий код или напишите \'отмена\' для завершения'
 
     def can_input(self, user, message: Message) -> bool:
         return (message.text is not None or len(message.photo) != 0) and user.step == self.from_step
@@ -222,14 +236,14 @@ class AddAchievementDataInput(DataInput, ABC):
     def __init__(self):
         super().__init__(Step.ACHIEVEMENT_NAME, Step.ACHIEVEMENT_IMAGE, True)
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         new_name = message.text
         try:
-            controller.get_entity_by_model_with_name(Achievement, Achievement.name, new_name)
+            await controller.get_entity_by_model_with_name(Achievement, Achievement.name, new_name)
             user.step = self.from_step
             return 'Уже существует достижение с данным названием. Попробуйте снова или напишите \'отмена\''
         except NoResultFound:
-            controller.db_session.add_model(Achievement(name=new_name, creator=user.id))
+            await controller.db_session.add_model(Achievement(name=new_name, creator=user.id))
             return 'Теперь вам необходимо предоставить картинку (200x200)'
 
 
@@ -237,13 +251,13 @@ class AchievementImageDataInput(DataInput, ABC):
     def __init__(self):
         super().__init__(Step.ACHIEVEMENT_IMAGE, Step.NONE, False)
 
-    async def abstract_input(self, controller: Controller, user: User, message: Message):
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
         photo = message.photo[-1]
         if photo.width != 200 or photo.height != 200:
             user.step = self.from_step
             return 'Размер картинки должен быть 200x200'
 
-        achievement = controller.get_achievement_by_creator(user)
+        achievement = await controller.get_achievement_by_creator(user)
 
         output = BytesIO()
         try:
@@ -260,6 +274,51 @@ class AchievementImageDataInput(DataInput, ABC):
         return len(message.photo) != 0 and user.step == self.from_step
 
 
+class ImportUsersInput(DataInput, ABC):
+    appointed_names = {
+        Rank.USER: 'пользователем',
+        Rank.MODER: 'модератором',
+        Rank.ORGANIZER: 'организатором'
+    }
+
+    def __init__(self):
+        super().__init__(Step.IMPORT_USERS, Step.NONE, True)
+
+    async def abstract_input(self, controller: AsyncController, user: User, message: Message):
+        document = message.document
+        kind = (document.file_name or '').rsplit('.', 1)[-1].lower() if document is not None else None
+        if kind not in readers:
+            user.step = self.from_step
+            return 'Поддерживаются только файлы .csv и .jsonl. Попробуйте снова или напишите \'отмена\''
+        if document.file_size is not None and document.file_size > config.IMPORT_MAX_SIZE:
+            user.step = self.from_step
+            return 'Файл слишком большой. Попробуйте снова или напишите \'отмена\''
+
+        output = BytesIO()
+        try:
+            await document.download(destination_file=output)
+            data = output.getvalue()
+        finally:
+            output.close()
+
+        user_import = UserImport(user.rank, (message.caption or '').strip().lower() == 'проверка')
+        try:
+            await user_import.run(controller, kind, data)
+        except (UnicodeDecodeError, csv.Error):
+            user.step = self.from_step
+            return 'Не удалось прочитать файл. Попробуйте снова или напишите \'отмена\''
+
+        for rank, recipients in user_import.appointed.items():
+            broadcaster.submit(message.bot, user.id, recipients, f'Вас назначили {self.appointed_names[rank]}',
+                               lambda job, name=self.appointed_names[rank]:
+                               f'Уведомление о назначении {name} получили {job.sent} из {job.total} пользователей',
+                               keyboards_by_rank[rank])
+        return user_import.report()
+
+    def can_input(self, user, message: Message) -> bool:
+        return (message.document is not None or message.text is not None) and user.step == self.from_step
+
+
 data_inputs = [
     UserDataInput(Step.FIRST_NAME, Step.FIRST_NAME_ONLY, Step.MIDDLE_NAME, lambda u, t: u.set_first_name(t),
                   'Теперь введите отчество'),
@@ -289,12 +348,24 @@ data_inputs = [
                              lambda n: LocalGroup(name=n)),
     ManageSomethingDataInput(Step.GROUP_NAME_FOR_REMOVE, Step.NONE, 'Группа', LocalGroup,
                              LocalGroup.name, None),
-    GiveRatingInput()
+    GiveRatingInput(),
+    ImportUsersInput()
 ]
 
 
+def index_by_step(_data_inputs) -> dict:
+    index = {}
+    for data_input in _data_inputs:
+        for step in data_input.from_steps:
+            index.setdefault(step, []).append(data_input)
+    return index
+
+
+data_inputs_by_step = index_by_step(data_inputs)
+
+
 def get_data_input(user, message):
-    for data_input in data_inputs:
+    for data_input in data_inputs_by_step.get(user.step, ()):
         if data_input.can_input(user, message):
             return data_input
     return None
@@ -30,4 +30,5 @@ class Step(Enum):
     EVENT_LOCATION = 25,
     ADD_FRIEND = 26,
     GIVE_RATING = 27,
-    GIVE_ACHIEVEMENT = 28
\ No newline at end of file
+    GIVE_ACHIEVEMENT = 28,
+    IMPORT_USERS = 29
\ No newline at end of file
@@ -0,0 +1,67 @@
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+
+from controller import AsyncController
+from data.keyboards import keyboards_by_status_event_and_by_rank
+from enums.ranks import Rank
+from formatter import plurals
+from models import User, Event
+
+empty_page_messages = {
+    'my': 'В данный момент у вас нет мероприятий',
+    'all': 'В данный момент нет активных мероприятий'
+}
+
+
+async def get_events_page(controller: AsyncController, user: User, kind: str, cursor: int = None,
+                          backward: bool = False):
+    if kind == 'all':
+        feed, has_prev, has_next = await controller.get_event_feed(user.id, cursor, backward)
+        return feed, has_prev, has_next
+    query = controller.events_by_user_query(user.id, user.rank == Rank.ORGANIZER)
+    events, has_prev, has_next = await controller.get_events_page(query, cursor, backward)
+    return [(event, None) for event in events], has_prev, has_next
+
+
+async def render_events_page(controller: AsyncController, user: User, kind: str, cursor: int = None,
+                             backward: bool = False) -> (str, InlineKeyboardMarkup):
+    page, has_prev, has_next = await get_events_page(controller, user, kind, cursor, backward)
+    if len(page) == 0:
+        return empty_page_messages[kind], None
+
+    lines = []
+    keyboard = InlineKeyboardMarkup()
+    for number, (event, friends) in enumerate(page, 1):
+        line = f'{number}. {event.name} — {event.date if event.date is not None else "дата не назначена"}'
+        if friends:
+            line += f' ({plurals(len(friends), "ваш друг", "ваших друга", "ваших друзей")})'
+        lines.append(line)
+        keyboard.row(InlineKeyboardButton(f'{number}. {event.name}', callback_data=f'evc_{kind}_{event.id}'))
+
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton('◀️', callback_data=f'evp_{kind}_p_{page[0][0].id}'))
+    if has_next:
+        navigation.append(InlineKeyboardButton('▶️', callback_data=f'evp_{kind}_n_{page[-1][0].id}'))
+    if len(navigation) != 0:
+        keyboard.row(*navigation)
+
+    return 'Мероприятия:\n\n' + '\n'.join(lines), keyboard
+
+
+async def send_event_card(controller: AsyncController, user: User, message: Message, kind: str, event: Event):
+    if kind == 'all':
+        keyboard = InlineKeyboardMarkup().add(
+            InlineKeyboardButton('Записаться на мероприятие', callback_data=f'tp_{event.id}'))
+        friends = (await controller.get_friends_on_events(user.id, [event.id]))[event.id]
+        friends_str = f'\n\n{plurals(len(friends), "ваш друг", "ваших друга", "ваших друзей")} на этом мероприятии: {", ".join(f"{friend.first_name} {friend.middle_name} {friend.last_name}" for friend in friends)}' if len(
+            friends) != 0 else ''
+    else:
+        try:
+            keyboard = keyboards_by_status_event_and_by_rank[event.status][user.rank](event)
+        except KeyError:
+            keyboard = None
+        friends_str = ''
+
+    if event.lat is not None and event.lng is not None:
+        await message.answer_location(event.lat, event.lng)
+    await message.answer(f'{event}{friends_str}', reply_markup=keyboard)
@@ -4,3 +4,7 @@ class NotFoundObjectError(Exception):
 
 class ObjectAlreadyCreatedError(Exception):
     pass
+
+
+class InvalidImportRowError(Exception):
+    pass
@@ -0,0 +1,57 @@
+import csv
+import datetime
+import json
+import os
+import tempfile
+from enum import Enum
+
+from controller import AsyncController
+from models import Event
+
+fields = ('record', 'event_id', 'name', 'description', 'date', 'status', 'user_id', 'first_name', 'middle_name',
+          'last_name', 'attendance', 'feedback', 'neutral', 'negative', 'positive', 'created_at')
+
+
+def export_value(value):
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+class CsvWriter(object):
+    def __init__(self, file):
+        self.writer = csv.DictWriter(file, fields, restval='')
+        self.writer.writeheader()
+
+    def write(self, row: dict):
+        self.writer.writerow({key: '' if value is None else export_value(value) for key, value in row.items()})
+
+
+class JsonLinesWriter(object):
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, row: dict):
+        self.file.write(json.dumps({key: export_value(value) for key, value in row.items()}, ensure_ascii=False))
+        self.file.write('\n')
+
+
+writers = {
+    'csv': CsvWriter,
+    'jsonl': JsonLinesWriter
+}
+
+
+async def write_event_export(controller: AsyncController, event: Event, kind: str) -> str:
+    descriptor, path = tempfile.mkstemp(suffix=f'.{kind}')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8', newline='') as file:
+            writer = writers[kind](file)
+            async for row in controller.stream_event_export(event):
+                writer.write(row)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
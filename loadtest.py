@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import datetime
+import itertools
+import logging
+import math
+import os
+import re
+import tempfile
+import time
+from collections import defaultdict, Counter
+from typing import Optional, List, Dict
+
+import aiogram.bot.api
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.utils.exceptions import MessageIsTooLong
+
+from data import config
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+
+CODE_PATTERN = re.compile(r'модератору мероприятия: (\S+)')
+MESSAGE_MAX_LENGTH = 4096
+FLOWS = ('registration', 'join', 'check_in', 'feedback')
+
+update_ids = itertools.count(1)
+
+
+def message_update(uid: int, text: str) -> Update:
+    update_id = next(update_ids)
+    message = {'message_id': update_id, 'date': int(time.time()), 'text': text,
+               'chat': {'id': uid, 'type': 'private'},
+               'from': {'id': uid, 'is_bot': False, 'first_name': f'User{uid}'}}
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return Update(update_id=update_id, message=message)
+
+
+def callback_update(uid: int, data: str) -> Update:
+    update_id = next(update_ids)
+    return Update(update_id=update_id, callback_query={
+        'id': str(update_id), 'chat_instance': str(uid), 'data': data,
+        'from': {'id': uid, 'is_bot': False, 'first_name': f'User{uid}'},
+        'message': {'message_id': update_id, 'date': int(time.time()), 'text': '',
+                    'chat': {'id': uid, 'type': 'private'}}})
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class FakeTelegram(object):
+    latency: float
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = Counter()
+        self.codes = {}
+        self.message_ids = itertools.count(1)
+
+    async def make_request(self, session, server, token, method, data=None, files=None, **kwargs):
+        self.calls[method] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        data = data or {}
+        chat_id = int(data.get('chat_id', 0))
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'loadtest', 'username': 'loadtest_bot'}
+        if method in ('answerCallbackQuery', 'deleteMessage'):
+            return True
+        if method == 'sendMessage':
+            if len(data.get('text', '')) > MESSAGE_MAX_LENGTH:
+                raise MessageIsTooLong('Bad Request: message is too long')
+            match = CODE_PATTERN.search(data.get('text', ''))
+            if match is not None:
+                self.codes[chat_id] = match.group(1)
+
+        message = {'message_id': next(self.message_ids), 'date': int(time.time()),
+                   'chat': {'id': chat_id, 'type': 'private'}}
+        if method == 'sendPhoto':
+            message['photo'] = [{'file_id': f'photo{message["message_id"]}', 'file_unique_id': 'photo',
+                                 'width': 1, 'height': 1}]
+        elif method == 'sendDocument':
+            message['document'] = {'file_id': f'document{message["message_id"]}', 'file_unique_id': 'document'}
+        else:
+            message['text'] = data.get('text', '')
+        return message
+
+
+class LoadTest(object):
+    dispatcher: Dispatcher
+    api: FakeTelegram
+    concurrency: int
+
+    def __init__(self, dispatcher: Dispatcher, api: FakeTelegram, concurrency: int):
+        self.dispatcher = dispatcher
+        self.api = api
+        self.concurrency = concurrency
+        self.event_id: Optional[int] = None
+        self.moderators: List[int] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors = Counter()
+        self.durations = {}
+
+    async def send(self, flow: str, update: Update):
+        start = time.perf_counter()
+        try:
+            await self.dispatcher.process_update(update)
+        except Exception:
+            self.errors[flow] += 1
+            logging.exception(f'Update {update.update_id} in flow {flow} failed')
+        finally:
+            self.latencies[flow].append(time.perf_counter() - start)
+
+    async def setup(self, session_factory, moderators: int, first_uid: int):
+        from models import User, Event
+
+        self.moderators = list(range(first_uid, first_uid + moderators))
+        async with session_factory() as session:
+            event = Event(name='Нагрузочный тест', status=StatusEvent.UNFINISHED,
+                          date=datetime.datetime.now() + datetime.timedelta(days=1))
+            session.add(event)
+            session.add_all(User(id=uid, first_name=f'Модератор{uid}', middle_name='-', last_name='-',
+                                 phone=f'+7{uid}', email=f'moder{uid}@example.com', rank=Rank.MODER, rating=0)
+                            for uid in self.moderators)
+            await session.commit()
+            self.event_id = event.id
+
+        for uid in self.moderators:
+            await self.send('setup', callback_update(uid, f'tp_{self.event_id}'))
+            await self.send('setup', callback_update(uid, f'marpr_{self.event_id}'))
+
+    async def registration(self, uid: int):
+        for text in ('/start', f'Имя{uid}', 'Отчество', 'Фамилия', f'+7{uid}', f'user{uid}@example.com'):
+            await self.send('registration', message_update(uid, text))
+
+    async def join(self, uid: int):
+        await self.send('join', callback_update(uid, f'tp_{self.event_id}'))
+
+    async def check_in(self, uid: int):
+        code = self.api.codes.get(uid)
+        if code is None:
+            self.errors['check_in'] += 1
+            return
+        await self.send('check_in', message_update(self.moderators[uid % len(self.moderators)], code))
+
+    async def feedback(self, uid: int):
+        await self.send('feedback', callback_update(uid, f'feb_{self.event_id}'))
+        await self.send('feedback', message_update(uid, 'Отличное мероприятие, спасибо организаторам!'))
+
+    async def run_flow(self, flow: str, uids: List[int]):
+        journey = getattr(self, flow)
+        pending = iter(uids)
+
+        async def worker():
+            for uid in pending:
+                await journey(uid)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(uids)))))
+        self.durations[flow] = time.perf_counter() - start
+
+    def report(self) -> str:
+        lines = [f'{"flow":<14}{"updates":>9}{"errors":>8}{"upd/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}']
+        for flow in FLOWS:
+            latencies = self.latencies.get(flow)
+            if not latencies:
+                continue
+            lines.append(f'{flow:<14}{len(latencies):>9}{self.errors[flow]:>8}'
+                         f'{len(latencies) / self.durations[flow]:>10.1f}'
+                         + ''.join(f'{percentile(latencies, q) * 1000:>10.1f}' for q in (50, 95, 99)))
+        lines.append('')
+        lines.append('API calls: ' + ', '.join(f'{method}={count}' for method, count in sorted(self.api.calls.items())))
+        return '\n'.join(lines)
+
+
+def temporary_database_url(name: str = 'loadtest.db') -> str:
+    return f'sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), name)}'
+
+
+def start_bot(api: FakeTelegram, database: Optional[str] = None):
+    config.TG_TOKEN = '1:loadtest'
+    config.DATABASE_URL = database or temporary_database_url()
+    config.FSM_STORAGE = 'memory'
+    config.METRICS_ENABLED = False
+    aiogram.bot.api.make_request = api.make_request
+
+    import telegrambot
+
+    Bot.set_current(telegrambot.bot)
+    Dispatcher.set_current(telegrambot.dp)
+    return telegrambot
+
+
+async def create_schema(engine):
+    from models.basemodel import Base
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def main(args):
+    api = FakeTelegram(args.api_latency / 1000)
+    telegrambot = start_bot(api, args.database)
+    from metrics import metrics
+
+    await create_schema(telegrambot.engine)
+    load_test = LoadTest(telegrambot.dp, api, args.concurrency)
+    try:
+        await load_test.setup(telegrambot.session_factory, args.moderators, args.first_uid)
+        uids = list(range(args.first_uid + args.moderators, args.first_uid + args.moderators + args.users))
+        for flow in FLOWS:
+            await load_test.run_flow(flow, uids)
+    finally:
+        await telegrambot.on_shutdown(telegrambot.dp)
+
+    print(load_test.report())
+    if args.metrics:
+        print()
+        print(metrics.render())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run scripted user journeys against the bot without Telegram')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--moderators', type=int, default=4)
+    parser.add_argument('--first-uid', type=int, default=1000000)
+    parser.add_argument('--api-latency', type=float, default=0, help='simulated Bot API latency, ms')
+    parser.add_argument('--database', help='empty database URL, a temporary SQLite file by default')
+    parser.add_argument('--metrics', action='store_true', help='print the collected Prometheus metrics')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
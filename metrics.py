@@ -0,0 +1,250 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple, Callable
+
+from aiogram import Bot
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def labels_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key: Tuple) -> str:
+    if len(key) == 0:
+        return ''
+    values = ','.join(f'{name}="{escape(str(value))}"' for name, value in key)
+    return f'{{{values}}}'
+
+
+def escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+    name: str
+    documentation: str
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = labels_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, key, value
+
+
+class Histogram(object):
+    name: str
+    documentation: str
+    buckets: Tuple[float, ...]
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value: float, **labels):
+        key = labels_key(labels)
+        counts = self.values.get(key)
+        if counts is None:
+            counts = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        counts[0][bisect.bisect_left(self.buckets, value)] += 1
+        counts[1] += value
+        counts[2] += 1
+
+    @contextmanager
+    def time(self, errors: Optional[Counter] = None, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if errors is not None:
+                errors.inc(**labels)
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        for key, (buckets, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), buckets):
+                cumulative += bucket
+                yield f'{self.name}_bucket', key + (('le', format_value(float(bound))),), cumulative
+            yield f'{self.name}_sum', key, total
+            yield f'{self.name}_count', key, count
+
+
+class Collected(object):
+    name: str
+    documentation: str
+    type: str
+
+    def __init__(self, name: str, documentation: str, metric_type: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.type = metric_type
+        self.collectors = []
+
+    def track(self, collect: Callable[[], float], **labels):
+        self.collectors.append((labels_key(labels), collect))
+
+    def samples(self):
+        for key, collect in self.collectors:
+            yield self.name, key, collect()
+
+
+class MetricRegistry(object):
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def gauge(self, name: str, documentation: str) -> Collected:
+        return self.register(Collected(name, documentation, 'gauge'))
+
+    def counter_of(self, name: str, documentation: str) -> Collected:
+        return self.register(Collected(name, documentation, 'counter'))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, key, value in metric.samples():
+                lines.append(f'{name}{format_labels(key)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class UpdateStats(object):
+    queries: int
+    query_seconds: float
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.started = time.perf_counter()
+
+
+metrics = MetricRegistry()
+update_stats: ContextVar[Optional[UpdateStats]] = ContextVar('update_stats', default=None)
+
+update_seconds = metrics.histogram('bot_update_seconds', 'Time spent processing an update')
+handler_seconds = metrics.histogram('bot_handler_seconds', 'Time spent in a command, callback or data input')
+handler_errors = metrics.counter('bot_handler_errors_total', 'Handlers that raised an exception')
+update_db_queries = metrics.histogram('bot_update_db_queries', 'Database queries executed per update', COUNT_BUCKETS)
+update_db_seconds = metrics.histogram('bot_update_db_seconds', 'Database time spent per update')
+db_queries = metrics.counter('bot_db_queries_total', 'Database queries executed')
+db_query_seconds = metrics.histogram('bot_db_query_seconds', 'Time spent executing a database query')
+api_seconds = metrics.histogram('bot_api_request_seconds', 'Telegram Bot API request latency')
+api_errors = metrics.counter('bot_api_errors_total', 'Telegram Bot API requests that failed')
+queue_depth = metrics.gauge('bot_queue_depth', 'Items waiting in background queues')
+cache_size = metrics.gauge('bot_cache_entries', 'Entries held in in-memory caches')
+cache_hits = metrics.counter_of('bot_cache_hits_total', 'In-memory cache hits')
+cache_misses = metrics.counter_of('bot_cache_misses_total', 'In-memory cache misses')
+
+
+def begin_update() -> UpdateStats:
+    stats = UpdateStats()
+    update_stats.set(stats)
+    return stats
+
+
+def finish_update(stats: UpdateStats, update_type: str):
+    update_seconds.observe(time.perf_counter() - stats.started, type=update_type)
+    update_db_queries.observe(stats.queries, type=update_type)
+    update_db_seconds.observe(stats.query_seconds, type=update_type)
+    update_stats.set(None)
+
+
+def measure_handler(kind: str, handler):
+    return handler_seconds.time(handler_errors, kind=kind, handler=type(handler).__name__)
+
+
+def track_cache(name: str, cache):
+    cache_size.track(lambda: len(cache), cache=name)
+    cache_hits.track(lambda: cache.hits, cache=name)
+    cache_misses.track(lambda: cache.misses, cache=name)
+
+
+def instrument_engine(engine: AsyncEngine):
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        db_queries.inc()
+        db_query_seconds.observe(elapsed)
+        stats = update_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    @event.listens_for(engine.sync_engine, 'handle_error')
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+
+class MeteredBot(Bot):
+    async def request(self, method, data=None, files=None, **kwargs):
+        with api_seconds.time(api_errors, method=method):
+            return await super().request(method, data, files, **kwargs)
+
+
+class MetricsServer(object):
+    host: str
+    port: int
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.runner: Optional[web.AppRunner] = None
+
+    @staticmethod
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=metrics.render().encode(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
@@ -0,0 +1,45 @@
+import sys
+
+from aiogram.dispatcher.middlewares import LifetimeControllerMiddleware
+from sqlalchemy.orm import sessionmaker
+
+from cache import UserStateCache
+from controller import AsyncController
+from metrics import begin_update, finish_update
+from models.dbsession import AsyncDBSession
+
+
+class DBSessionMiddleware(LifetimeControllerMiddleware):
+    skip_patterns = ['update', 'error']
+
+    def __init__(self, session_factory: sessionmaker, user_states: UserStateCache):
+        super().__init__()
+        self.session_factory = session_factory
+        self.user_states = user_states
+
+    async def pre_process(self, obj, data, *args):
+        data['controller'] = AsyncController(AsyncDBSession(self.session_factory()), self.user_states,
+                                             self.manager.dispatcher.storage)
+
+    async def post_process(self, obj, data, *args):
+        controller = data.get('controller')
+        if controller is None:
+            return
+
+        try:
+            if sys.exc_info()[0] is None:
+                await controller.save()
+        finally:
+            await controller.db_session.close_session()
+
+
+class MetricsMiddleware(LifetimeControllerMiddleware):
+    skip_patterns = ['update', 'error']
+
+    async def pre_process(self, obj, data, *args):
+        data['update_stats'] = begin_update()
+
+    async def post_process(self, obj, data, *args):
+        stats = data.get('update_stats')
+        if stats is not None:
+            finish_update(stats, type(obj).__name__)
@@ -1,5 +1,5 @@
 from .user import User, UserGroups, UserInterests, UserAchievements
 from .local_group import LocalGroup
-from .achievement import Achievement, OrganizerToUserAchievement
+from .achievement import Achievement
 from .interest import Interest
-from .event import Event, EventUsers, EventGroups, EventInterests, EventEditors, EventFeedbacks
+from .event import Event, EventUsers, EventGroups, EventInterests, EventFeedbacks, EventFeedbackSummary
@@ -1,17 +1,35 @@
-import datetime
-
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, TIMESTAMP
+from sqlalchemy import Column, Integer, BigInteger, TIMESTAMP
+from sqlalchemy.sql.expression import FunctionElement
 
 Base = declarative_base()
 
+TelegramId = BigInteger().with_variant(Integer, 'sqlite')
+
+
+class timestamp_now(FunctionElement):
+    type = TIMESTAMP()
+    inherit_cache = True
+
+
+@compiles(timestamp_now)
+def compile_timestamp_now(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(timestamp_now, 'sqlite')
+def compile_sqlite_timestamp_now(element, compiler, **kw):
+    # Same text format as the SQLite DateTime type stores, so bound datetimes compare correctly
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now', 'localtime')"
+
 
 class BaseModel(Base):
     __abstract__ = True
 
     id = Column(Integer, nullable=False, unique=True, primary_key=True, autoincrement=True)
-    created_at = Column(TIMESTAMP, nullable=False, default=datetime.datetime.now())
-    updated_at = Column(TIMESTAMP, nullable=False, default=datetime.datetime.now(), onupdate=datetime.datetime.now())
+    created_at = Column(TIMESTAMP, nullable=False, server_default=timestamp_now(), index=True)
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=timestamp_now(), onupdate=timestamp_now(), index=True)
 
     def __repr__(self):
         return "<{0.__class__.__name__}(id={0.id!r})>".format(self)
@@ -1,12 +1,17 @@
 from logging import getLogger
 
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError, DataError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from models.basemodel import BaseModel
+from models.basemodel import BaseModel, timestamp_now
 
 log = getLogger()
 
+UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
 
 class DBSession(object):
     _session: Session
@@ -59,3 +64,81 @@ class DBSession(object):
         except DataError as e:
             log.error(f'`{__name__}` {e}')
             raise
+
+
+class AsyncDBSession(object):
+    _session: AsyncSession
+
+    def __init__(self, session: AsyncSession, *args, **kwargs):
+        self._session = session
+
+    async def execute(self, statement, params=None):
+        return await self._session.execute(statement, params)
+
+    async def scalars(self, statement, params=None):
+        return await self._session.scalars(statement, params)
+
+    async def scalar(self, statement, params=None):
+        return await self._session.scalar(statement, params)
+
+    async def stream(self, statement, params=None):
+        return await self._session.stream(statement, params)
+
+    async def add_model(self, model: BaseModel, need_flush: bool = False):
+        self._session.add(model)
+
+        if need_flush:
+            await self._session.flush([model])
+
+    def _upsert(self, model: BaseModel):
+        values = {column.key: getattr(model, column.key) for column in inspect(model).mapper.column_attrs
+                  if column.key in model.__dict__}
+        return UPSERT_INSERTS[self._session.bind.dialect.name](type(model)).values(**values), values
+
+    async def add_unique_model(self, model: BaseModel, index_elements: list = None) -> bool:
+        insert, _ = self._upsert(model)
+        await self._session.flush()
+        result = await self._session.execute(insert.on_conflict_do_nothing(index_elements=index_elements))
+        return result.rowcount == 1
+
+    async def add_to_model(self, model: BaseModel, index_elements: list):
+        insert, values = self._upsert(model)
+        increments = {key: getattr(type(model), key) + insert.excluded[key] for key in values
+                      if key not in index_elements}
+        await self._session.flush()
+        await self._session.execute(insert.on_conflict_do_update(index_elements=index_elements,
+                                                                 set_={**increments, 'updated_at': timestamp_now()}))
+
+    async def delete_model(self, model: BaseModel):
+        if model is None:
+            log.warning(f'{__name__}: model is None')
+
+        try:
+            await self._session.delete(model)
+        except IntegrityError as e:
+            log.error(f'`{__name__}` {e}')
+        except DataError as e:
+            log.error(f'`{__name__}` {e}')
+
+    async def commit_session(self, need_close: bool = False):
+        try:
+            await self._session.commit()
+        except IntegrityError as e:
+            log.error(f'`{__name__}` {e}')
+            raise
+        except DataError as e:
+            log.error(f'`{__name__}` {e}')
+            raise
+
+        if need_close:
+            await self.close_session()
+
+    async def close_session(self):
+        try:
+            await self._session.close()
+        except IntegrityError as e:
+            log.error(f'`{__name__}` {e}')
+            raise
+        except DataError as e:
+            log.error(f'`{__name__}` {e}')
+            raise
@@ -1,14 +1,15 @@
-from sqlalchemy import Column, VARCHAR, ForeignKey, Integer, TIMESTAMP, Float, Enum
+from sqlalchemy import Column, VARCHAR, ForeignKey, Integer, TIMESTAMP, Float, Enum, Index
 from sqlalchemy.orm import relation
 
 from enums.status_attendion import StatusAttendion
 from enums.status_event import StatusEvent
 from models import User, Interest, LocalGroup
-from .basemodel import BaseModel
+from .basemodel import BaseModel, TelegramId
 
 
 class EventGroups(BaseModel):
     __tablename__ = 'event_groups'
+    __table_args__ = (Index('ix_event_groups_event_id_group_id', 'event_id', 'group_id', unique=True),)
 
     event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
     group_id = Column(Integer, ForeignKey('local_group.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -16,6 +17,7 @@ class EventGroups(BaseModel):
 
 class EventInterests(BaseModel):
     __tablename__ = 'event_interests'
+    __table_args__ = (Index('ix_event_interests_event_id_interest_id', 'event_id', 'interest_id', unique=True),)
 
     event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
     interest_id = Column(Integer, ForeignKey('interest.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -23,9 +25,11 @@ class EventInterests(BaseModel):
 
 class EventUsers(BaseModel):
     __tablename__ = 'event_users'
+    __table_args__ = (Index('ix_event_users_event_id_user_id', 'event_id', 'user_id', unique=True),
+                      Index('ix_event_users_event_id_status_attendion', 'event_id', 'status_attendion'))
 
     event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     status_attendion = Column(Enum(StatusAttendion), nullable=True, index=True)
 
 
@@ -34,21 +38,39 @@ class EventFeedbacks(BaseModel):
 
     event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
     fb_text = Column(VARCHAR(255), nullable=True)
+    neutral = Column(Float, nullable=True)
+    negative = Column(Float, nullable=True)
+    positive = Column(Float, nullable=True)
 
+    def set_sentiment(self, sentiment):
+        self.neutral = sentiment.get('neutral', 0.0)
+        self.negative = sentiment.get('negative', 0.0)
+        self.positive = sentiment.get('positive', 0.0)
 
-class EventEditors(BaseModel):
-    __tablename__ = 'event_editors'
 
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
-    event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
+class EventFeedbackSummary(BaseModel):
+    __tablename__ = 'event_feedback_summary'
+
+    event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
+    count = Column(Integer, nullable=False, default=0)
+    neutral = Column(Float, nullable=False, default=0.0)
+    negative = Column(Float, nullable=False, default=0.0)
+    positive = Column(Float, nullable=False, default=0.0)
+
+    def add_feedback(self, feedback: EventFeedbacks):
+        self.count += 1
+        self.neutral += feedback.neutral
+        self.negative += feedback.negative
+        self.positive += feedback.positive
 
 
 class EventCodes(BaseModel):
     __tablename__ = 'event_codes'
+    __table_args__ = (Index('ix_event_codes_event_id_user_id', 'event_id', 'user_id', unique=True),)
 
     event_id = Column(Integer, ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
-    code = Column(VARCHAR(8), nullable=False, index=True)
+    user_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    code = Column(VARCHAR(8), nullable=False, unique=True, index=True)
 
 
 class Event(BaseModel):
@@ -56,7 +78,7 @@ class Event(BaseModel):
 
     name = Column(VARCHAR(255), nullable=False)
     description = Column(VARCHAR(255), nullable=True)
-    date = Column(TIMESTAMP, nullable=True)
+    date = Column(TIMESTAMP, nullable=True, index=True)
     lat = Column(Float, nullable=True)
     lng = Column(Float, nullable=True)
     status = Column(Enum(StatusEvent), nullable=True)
@@ -1,63 +1,59 @@
-from sqlalchemy import Column, VARCHAR, Integer, ForeignKey, Enum
+from sqlalchemy import Column, VARCHAR, Integer, ForeignKey, Enum, Index
 from sqlalchemy.orm import relation
 
 from enums.friend_request_status import FriendRequestStatus
 from enums.ranks import Rank
 from enums.steps import Step
 from .achievement import Achievement
-from .basemodel import BaseModel
+from .basemodel import BaseModel, TelegramId
 from .interest import Interest
 from .local_group import LocalGroup
 
 
-class OrganizerRateUser(BaseModel):
-    __tablename__ = 'user_rate'
-
-    org_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
-
-
 class UserFriends(BaseModel):
     __tablename__ = 'user_friends'
+    __table_args__ = (Index('ix_user_friends_user_id_friend_id', 'user_id', 'friend_id', unique=True),)
 
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
-    friend_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    friend_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     friend_request_status = Column(Enum(FriendRequestStatus), nullable=True)
 
 
 class UserAchievements(BaseModel):
     __tablename__ = 'user_achievements'
 
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     achievement_id = Column(Integer, ForeignKey('achievement.id', ondelete='CASCADE'), nullable=False, index=True)
 
 
 class UserInterests(BaseModel):
     __tablename__ = 'user_interests'
+    __table_args__ = (Index('ix_user_interests_user_id_interest_id', 'user_id', 'interest_id', unique=True),)
 
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     interest_id = Column(Integer, ForeignKey('interest.id', ondelete='CASCADE'), nullable=False, index=True)
 
 
 class UserGroups(BaseModel):
     __tablename__ = 'user_groups'
+    __table_args__ = (Index('ix_user_groups_user_id_group_id', 'user_id', 'group_id', unique=True),)
 
-    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = Column(TelegramId, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     group_id = Column(Integer, ForeignKey('local_group.id', ondelete='CASCADE'), nullable=False, index=True)
 
 
 class User(BaseModel):
     __tablename__ = 'user'
 
-    BaseModel.id = Column(Integer, nullable=False, unique=True, primary_key=True)
+    id = Column(TelegramId, nullable=False, unique=True, primary_key=True, autoincrement=False)
     first_name = Column(VARCHAR(255), nullable=True)
     middle_name = Column(VARCHAR(255), nullable=True)
     last_name = Column(VARCHAR(255), nullable=True)
     email = Column(VARCHAR(255), nullable=True, unique=True)
     phone = Column(VARCHAR(255), nullable=True, unique=True)
     rank = Column(Enum(Rank), nullable=True)
-    step = Column(Enum(Step), nullable=True)
     rating = Column(Integer, nullable=True)
+    step: Step = Step.NONE
 
     achievements = relation(
         Achievement,
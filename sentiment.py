@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Callable
+
+from dostoevsky.models import FastTextSocialNetworkModel
+from dostoevsky.tokenization import RegexTokenizer
+
+from data import config
+
+model: Optional[FastTextSocialNetworkModel] = None
+
+
+def get_model() -> FastTextSocialNetworkModel:
+    global model
+    if model is None:
+        model = FastTextSocialNetworkModel(tokenizer=RegexTokenizer())
+    return model
+
+
+def predict(messages: List[str]) -> List[dict]:
+    return get_model().predict(messages, k=2)
+
+
+class SentimentAnalyzer(object):
+    workers: int
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def predict(self, messages: List[str]) -> List[dict]:
+        if len(messages) == 0:
+            return []
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=get_model)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, predict, messages)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+class FeedbackScorer(object):
+    analyzer: SentimentAnalyzer
+    batch_size: int
+
+    def __init__(self, analyzer: SentimentAnalyzer, batch_size: int):
+        self.analyzer = analyzer
+        self.batch_size = batch_size
+        self.controller_factory: Optional[Callable] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+
+    def start(self, controller_factory: Callable):
+        self.controller_factory = controller_factory
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self.work())
+
+    @property
+    def pending(self) -> int:
+        return 0 if self.queue is None else self.queue.qsize()
+
+    def submit(self, *feedback_ids: int):
+        if self.queue is not None:
+            for feedback_id in feedback_ids:
+                self.queue.put_nowait(feedback_id)
+
+    async def stop(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+            self.queue = None
+
+    async def work(self):
+        try:
+            while await self.score() == self.batch_size:
+                pass
+        except Exception:
+            logging.exception('Failed to score the feedback backlog')
+
+        while True:
+            feedback_ids = [await self.queue.get()]
+            while len(feedback_ids) < self.batch_size and not self.queue.empty():
+                feedback_ids.append(self.queue.get_nowait())
+            try:
+                await self.score(feedback_ids)
+            except Exception:
+                logging.exception(f'Failed to score feedbacks {feedback_ids}')
+
+    async def score(self, feedback_ids: List[int] = None) -> int:
+        controller = self.controller_factory()
+        try:
+            feedbacks = await controller.get_unscored_feedbacks(feedback_ids, self.batch_size)
+            if len(feedbacks) != 0:
+                results = await self.analyzer.predict([str(feedback.fb_text) for feedback in feedbacks])
+                await controller.add_feedback_scores(feedbacks, results)
+                await controller.save()
+            return len(feedbacks)
+        finally:
+            await controller.db_session.close_session()
+
+
+sentiment_analyzer = SentimentAnalyzer(config.SENTIMENT_WORKERS)
+feedback_scorer = FeedbackScorer(sentiment_analyzer, config.SENTIMENT_BATCH_SIZE)
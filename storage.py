@@ -0,0 +1,101 @@
+import asyncio
+import json
+import typing
+
+import aiosqlite
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.dispatcher.storage import BaseStorage
+
+
+class SQLiteStorage(BaseStorage):
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: typing.Optional[aiosqlite.Connection] = None
+        self._connection_lock = asyncio.Lock()
+
+    async def connection(self) -> aiosqlite.Connection:
+        async with self._connection_lock:
+            if self._connection is None:
+                connection = await aiosqlite.connect(self.path)
+                await connection.execute('PRAGMA journal_mode=WAL')
+                await connection.execute('PRAGMA synchronous=NORMAL')
+                await connection.execute('CREATE TABLE IF NOT EXISTS fsm_storage ('
+                                         'chat TEXT NOT NULL, '
+                                         'user TEXT NOT NULL, '
+                                         'state TEXT NULL, '
+                                         'data TEXT NOT NULL DEFAULT \'{}\', '
+                                         'PRIMARY KEY (chat, user))')
+                await connection.commit()
+                self._connection = connection
+        return self._connection
+
+    def resolve_address(self, chat, user):
+        return tuple(map(str, self.check_address(chat=chat, user=user)))
+
+    async def _fetch(self, chat, user, column):
+        connection = await self.connection()
+        async with connection.execute(f'SELECT {column} FROM fsm_storage WHERE chat = ? AND user = ?',
+                                      self.resolve_address(chat, user)) as cursor:
+            row = await cursor.fetchone()
+        return None if row is None else row[0]
+
+    async def _store(self, chat, user, column, value):
+        connection = await self.connection()
+        await connection.execute(f'INSERT INTO fsm_storage (chat, user, {column}) VALUES (?, ?, ?) '
+                                 f'ON CONFLICT (chat, user) DO UPDATE SET {column} = excluded.{column}',
+                                 (*self.resolve_address(chat, user), value))
+        await connection.commit()
+
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        state = await self._fetch(chat, user, 'state')
+        return self.resolve_state(default) if state is None else state
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[typing.Dict] = None) -> typing.Dict:
+        data = await self._fetch(chat, user, 'data')
+        return dict(default or {}) if data is None else json.loads(data)
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.Optional[typing.AnyStr] = None):
+        await self._store(chat, user, 'state', self.resolve_state(state))
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        await self._store(chat, user, 'data', json.dumps(data or {}))
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None,
+                          **kwargs):
+        current = await self.get_data(chat=chat, user=user)
+        current.update(data or {}, **kwargs)
+        await self.set_data(chat=chat, user=user, data=current)
+
+    async def close(self):
+        async with self._connection_lock:
+            if self._connection is not None:
+                await self._connection.close()
+                self._connection = None
+
+    async def wait_closed(self):
+        pass
+
+
+def create_storage(kind: str, path: str) -> BaseStorage:
+    if kind == 'memory':
+        return MemoryStorage()
+    if kind == 'sqlite':
+        return SQLiteStorage(path)
+    raise ValueError(f'Unknown FSM storage: {kind}')
@@ -1,75 +1,119 @@
 from aiogram import Bot, Dispatcher
 from aiogram.types import Message, CallbackQuery, ContentType
 from aiogram.utils import executor
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
-from callbacks import get_callback
+from broadcast import broadcaster
+from cache import UserStateCache
+from callbacks import get_callback, qr_code_file_ids
+from collage import achievement_collages
 from commands import get_command
-from controller import Controller
+from controller import AsyncController
 from data import config
 from data.keyboards import keyboards_by_rank
+from database import create_database_engine
 from datainputs import get_data_input
 from enums.steps import Step
-
-bot: Bot = Bot(token=config.TG_TOKEN)
-dp: Dispatcher = Dispatcher(bot)
-controller: Controller = Controller()
-
-
-@dp.message_handler(commands=['start'])
-async def send_welcome(message: Message):
-    if controller.has_user_by_id(message.from_user.id):
+from metrics import MeteredBot, MetricsServer, instrument_engine, measure_handler, queue_depth, track_cache
+from middlewares import DBSessionMiddleware, MetricsMiddleware
+from models.dbsession import AsyncDBSession
+from sentiment import sentiment_analyzer, feedback_scorer
+from storage import create_storage
+
+bot: Bot = MeteredBot(token=config.TG_TOKEN)
+dp: Dispatcher = Dispatcher(bot, storage=create_storage(config.FSM_STORAGE, config.FSM_STORAGE_PATH))
+engine = create_database_engine()
+instrument_engine(engine)
+user_states = UserStateCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+dp.middleware.setup(DBSessionMiddleware(session_factory, user_states))
+dp.middleware.setup(MetricsMiddleware())
+metrics_server = MetricsServer(config.METRICS_HOST, config.METRICS_PORT)
+
+queue_depth.track(lambda: broadcaster.pending_jobs, queue='broadcast_jobs')
+queue_depth.track(lambda: broadcaster.pending_messages, queue='broadcast_messages')
+queue_depth.track(lambda: feedback_scorer.pending, queue='feedback_scoring')
+track_cache('user_states', user_states)
+track_cache('qr_code_file_ids', qr_code_file_ids)
+track_cache('achievement_collages', achievement_collages.file_ids)
+
+
+@dp.message_handler(commands=['start'], state='*')
+async def send_welcome(message: Message, controller: AsyncController):
+    if await controller.has_user_by_id(message.from_user.id):
         await message.answer('Вы уже авторизованы')
     else:
-        controller.add_new_user(message.from_user.id)
+        await controller.add_new_user(message.from_user.id)
         await message.answer(f'Привет, {message.from_user.first_name}. Я бот, помогающий в организации/проведении '
                              f'мероприятий'
                              f'\n\n'
                              f'Пожалуйста, напиши свое имя')
 
 
-@dp.message_handler(commands=['menu'])
-async def send_menu(message: Message):
-    user = controller.get_user_by_id(message.from_user.id)
+@dp.message_handler(commands=['menu'], state='*')
+async def send_menu(message: Message, controller: AsyncController):
+    state = await controller.get_user_state(message.from_user.id)
 
-    if user.step != Step.NONE:
+    if state.step != Step.NONE:
         await message.answer('Для начала завершите предыдущее действие, пожалуйста')
     else:
-        await message.answer('Буп', reply_markup=keyboards_by_rank[user.rank])
+        await message.answer('Буп', reply_markup=keyboards_by_rank[state.rank])
 
 
-@dp.message_handler(commands=['id'])
+@dp.message_handler(commands=['id'], state='*')
 async def send_id(message: Message):
     await message.answer(f"Ваш ID: {message.from_user.id}")
 
 
-@dp.message_handler(content_types=[ContentType.PHOTO, ContentType.TEXT, ContentType.LOCATION])
-async def send_other(message: Message):
-    user = controller.get_user_by_id(message.from_user.id)
-    data_input = get_data_input(user, message)
+@dp.message_handler(content_types=[ContentType.PHOTO, ContentType.TEXT, ContentType.LOCATION, ContentType.DOCUMENT],
+                    state='*')
+async def send_other(message: Message, controller: AsyncController):
+    state = await controller.get_user_state(message.from_user.id)
+    data_input = get_data_input(state, message)
 
     if data_input is not None:
-        await data_input.input(controller, user, message)
+        with measure_handler('data_input', data_input):
+            await data_input.input(controller, await controller.get_user_by_id(state.id), message)
         return
-    command = get_command(user, message)
+    command = get_command(state, message)
     if command is not None:
-        if user.step != Step.NONE:
+        if state.step != Step.NONE:
             await message.answer('Для начала завершите предыдущее действие, пожалуйста')
         else:
-            await command.execute(controller, user, message)
+            with measure_handler('command', command):
+                await command.execute(controller, await controller.get_user_by_id(state.id), message)
 
 
-@dp.callback_query_handler()
-async def process_callback(query: CallbackQuery):
-    user = controller.get_user_by_id(query.from_user.id)
-    callback = get_callback(user, query)
+@dp.callback_query_handler(state='*')
+async def process_callback(query: CallbackQuery, controller: AsyncController):
+    state = await controller.get_user_state(query.from_user.id)
+    callback = get_callback(state, query)
     if callback is not None:
-        if user.step != Step.NONE:
+        if state.step != Step.NONE:
             await query.message.answer('Для начала завершите предыдущее действие, пожалуйста')
         else:
-            await callback.callback(controller, user, query)
+            with measure_handler('callback', callback):
+                await callback.callback(controller, await controller.get_user_by_id(state.id), query)
     else:
         await query.answer()
 
 
+async def on_startup(dispatcher: Dispatcher):
+    feedback_scorer.start(lambda: AsyncController(AsyncDBSession(session_factory()), user_states, dispatcher.storage))
+    if config.METRICS_ENABLED:
+        await metrics_server.start()
+
+
+async def on_shutdown(dispatcher: Dispatcher):
+    await metrics_server.stop()
+    await broadcaster.stop()
+    await feedback_scorer.stop()
+    sentiment_analyzer.close()
+    await engine.dispose()
+    await dispatcher.storage.close()
+    await dispatcher.storage.wait_closed()
+
+
 def run():
-    executor.start_polling(dp)
+    executor.start_polling(dp, on_startup=on_startup, on_shutdown=on_shutdown)
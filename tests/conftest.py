@@ -0,0 +1,22 @@
+import os
+import sys
+import types
+
+import pytest
+
+try:
+    import data.secret
+except ImportError:
+    secret = types.ModuleType('data.secret')
+    secret.tg_token = '1:test'
+    sys.modules['data.secret'] = secret
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path) -> str:
+    if request.param == 'postgresql':
+        url = os.environ.get('TEST_POSTGRES_URL')
+        if url is None:
+            pytest.skip('TEST_POSTGRES_URL is not set')
+        return url
+    return f'sqlite+aiosqlite:///{tmp_path / "events.db"}'
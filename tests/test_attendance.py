@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+
+from data import config
+from enums.ranks import Rank
+from enums.status_attendion import StatusAttendion
+from enums.status_event import StatusEvent
+from models import User, Event, EventUsers
+from tests.utils import open_database, create_controller, QueryCounter
+
+EVENT_ID = 1
+
+
+async def seed(engine, registered: int):
+    statuses = (StatusAttendion.ARRIVED, StatusAttendion.ARRIVED, StatusAttendion.NOT_ARRIVED, None)
+    async with engine.begin() as connection:
+        await connection.execute(insert(Event).values(id=EVENT_ID, name='Event', status=StatusEvent.FINISHED))
+        await connection.execute(insert(User), [
+            {'id': uid, 'first_name': f'User{uid}', 'rank': Rank.USER if uid != 1 else Rank.MODER, 'rating': 0}
+            for uid in range(1, registered + 1)])
+        await connection.execute(insert(EventUsers), [
+            {'event_id': EVENT_ID, 'user_id': uid, 'status_attendion': statuses[uid % len(statuses)]}
+            for uid in range(1, registered + 1)])
+
+
+async def attendance_statistics(database_url: str, registered: int):
+    async with open_database(database_url) as engine:
+        await seed(engine, registered)
+        controller = create_controller(engine)
+        session = controller.db_session._session
+        try:
+            with QueryCounter(engine) as counts_queries:
+                counts = await controller.get_attendance_counts(EVENT_ID)
+            counts_objects = len(session.identity_map)
+
+            with QueryCounter(engine) as page_queries:
+                visitors, has_prev, has_next = await controller.get_visited_users_page(EVENT_ID)
+            page_objects = len(session.identity_map)
+        finally:
+            await controller.db_session.close_session()
+        return counts, counts_queries.statements, counts_objects, visitors, has_next, page_queries.statements, \
+            page_objects
+
+
+@pytest.mark.parametrize('registered', [20, 5000])
+def test_attendance_statistics_are_aggregated_in_sql(database_url, registered):
+    counts, counts_statements, counts_objects, visitors, has_next, page_statements, page_objects = asyncio.run(
+        attendance_statistics(database_url, registered))
+
+    users = range(2, registered + 1)
+    assert counts == {StatusAttendion.ARRIVED: sum(uid % 4 in (0, 1) for uid in users),
+                      StatusAttendion.NOT_ARRIVED: sum(uid % 4 == 2 for uid in users),
+                      None: sum(uid % 4 == 3 for uid in users)}
+    assert len(counts_statements) == 1
+    assert 'count(' in counts_statements[0] and 'GROUP BY' in counts_statements[0]
+    assert counts_objects == 0
+
+    arrived = counts[StatusAttendion.ARRIVED]
+    assert len(visitors) == min(arrived, config.VISITORS_PAGE_SIZE)
+    assert has_next == (arrived > config.VISITORS_PAGE_SIZE)
+    assert all(visitor.rank is Rank.USER for visitor in visitors)
+    assert len(page_statements) == 1 and 'LIMIT' in page_statements[0]
+    assert page_objects <= config.VISITORS_PAGE_SIZE + 1
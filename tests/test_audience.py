@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from sqlalchemy import delete
+
+import audience
+from audience import AudienceIndex
+from enums.ranks import Rank
+from models import User, LocalGroup, UserGroups
+from tests.utils import open_database, create_controller
+
+TTL = 60
+
+
+async def add_member(engine, uid: int):
+    controller = create_controller(engine)
+    await controller.db_session.add_model(User(id=uid, first_name=f'User{uid}', rank=Rank.USER, rating=0), True)
+    await controller.db_session.add_model(UserGroups(user_id=uid, group_id=1))
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+async def audiences(database_url: str, monkeypatch) -> list:
+    now = [time.monotonic()]
+    monkeypatch.setattr(audience.time, 'monotonic', lambda: now[0])
+    index = AudienceIndex(1, TTL)
+    result = []
+
+    async def snapshot():
+        controller = create_controller(engine)
+        await index.ensure_loaded(controller.db_session)
+        await controller.db_session.close_session()
+        result.append(index.audience([1], [], []))
+
+    async with open_database(database_url) as engine:
+        controller = create_controller(engine)
+        await controller.db_session.add_model(LocalGroup(id=1, name='Группа'), True)
+        await controller.save()
+        await controller.db_session.close_session()
+        await add_member(engine, 1)
+        await snapshot()
+
+        await add_member(engine, 2)
+        await snapshot()
+        now[0] += TTL
+        await snapshot()
+
+        controller = create_controller(engine)
+        await controller.db_session.execute(delete(UserGroups).where(UserGroups.user_id == 1))
+        await controller.save()
+        await controller.db_session.close_session()
+        now[0] += TTL - 1
+        await snapshot()
+        now[0] += 1
+        await snapshot()
+    return result
+
+
+def test_audience_index_reloads_after_ttl(database_url, monkeypatch):
+    assert asyncio.run(audiences(database_url, monkeypatch)) == [[1], [1], [1, 2], [1, 2], [2]]
@@ -0,0 +1,114 @@
+import asyncio
+import os
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text, DateTime
+from sqlalchemy.dialects import postgresql, sqlite
+
+from data import config
+from database import create_database_engine
+from enums.friend_request_status import FriendRequestStatus
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from models import User, Event
+from models.basemodel import Base, TelegramId
+from tests.utils import open_database, create_controller
+
+USER_ID = 2 ** 40 + 1
+FRIEND_ID = 2 ** 33 + 7
+ALEMBIC_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'alembic')
+
+
+def telegram_id_columns():
+    return [column for table in Base.metadata.sorted_tables for column in table.columns
+            if column.type is TelegramId]
+
+
+def test_telegram_ids_are_big_integers_outside_sqlite():
+    columns = telegram_id_columns()
+    assert {f'{column.table.name}.{column.name}' for column in columns} >= {'user.id', 'event_users.user_id',
+                                                                            'event_codes.user_id'}
+    for column in columns:
+        assert column.type.compile(dialect=postgresql.dialect()) == 'BIGINT'
+        assert column.type.compile(dialect=sqlite.dialect()) == 'INTEGER'
+
+
+async def store_big_ids(database_url: str):
+    async with open_database(database_url) as engine:
+        controller = create_controller(engine)
+        user = User(id=USER_ID, first_name='User', rank=Rank.USER, rating=0)
+        await controller.db_session.add_model(user)
+        await controller.db_session.add_model(User(id=FRIEND_ID, first_name='Friend', rank=Rank.USER, rating=0))
+        event = Event(name='Event', status=StatusEvent.UNFINISHED)
+        await controller.db_session.add_model(event, True)
+        await controller.add_user_to_event(event, user)
+        code = await controller.add_new_code(event, user)
+        await controller.add_friend(FRIEND_ID, USER_ID, FriendRequestStatus.WAITING)
+        await controller.save()
+        await controller.db_session.close_session()
+
+        controller = create_controller(engine)
+        try:
+            return ((await controller.get_user_by_id(USER_ID)).id,
+                    await controller.has_user_in_event(event.id, USER_ID),
+                    (await controller.get_code_model_by_id(event.id, USER_ID)).code == code,
+                    await controller.has_friend_request(FRIEND_ID, USER_ID))
+        finally:
+            await controller.db_session.close_session()
+
+
+def test_telegram_ids_round_trip(database_url):
+    assert asyncio.run(store_big_ids(database_url)) == (USER_ID, True, True, True)
+
+
+async def clear_database(database_url: str):
+    async with open_database(database_url) as engine:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.execute(text('DROP TABLE IF EXISTS alembic_version'))
+
+
+def compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    # The init migration created event.date as DATETIME, which SQLite stores exactly like TIMESTAMP
+    if context.dialect.name == 'sqlite' and isinstance(inspected_type, DateTime) and isinstance(metadata_type,
+                                                                                                DateTime):
+        return False
+    return None
+
+
+def include_object(schema_object, name, type_, reflected, compare_to):
+    # Primary keys declared with unique=True are already unique, PostgreSQL reports no separate constraint for them
+    return not (type_ == 'unique_constraint' and not reflected and
+                set(schema_object.columns) == set(schema_object.table.primary_key.columns))
+
+
+def current_state(connection):
+    context = MigrationContext.configure(connection, opts={'compare_type': compare_type,
+                                                           'include_object': include_object})
+    return context.get_current_revision(), compare_metadata(context, Base.metadata)
+
+
+async def compare_with_models(database_url: str):
+    engine = create_database_engine(database_url)
+    try:
+        async with engine.connect() as connection:
+            return await connection.run_sync(current_state)
+    finally:
+        await engine.dispose()
+
+
+def test_migrations_upgrade_empty_database_to_models(database_url, monkeypatch):
+    asyncio.run(clear_database(database_url))
+    monkeypatch.setattr(config, 'DATABASE_URL', database_url)
+    alembic = Config()
+    alembic.set_main_option('script_location', ALEMBIC_PATH)
+
+    command.upgrade(alembic, 'head')
+    revision, differences = asyncio.run(compare_with_models(database_url))
+
+    assert revision == ScriptDirectory.from_config(alembic).get_current_head()
+    assert differences == []
@@ -0,0 +1,67 @@
+import asyncio
+
+from aiogram.utils.exceptions import RetryAfter, BotBlocked
+
+from broadcast import Broadcaster
+
+
+class FakeBot(object):
+    def __init__(self, errors=None, delay: float = 0.0):
+        self.errors = {chat_id: list(chat_errors) for chat_id, chat_errors in (errors or {}).items()}
+        self.delay = delay
+        self.delivered = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            chat_errors = self.errors.get(chat_id)
+            if chat_errors:
+                raise chat_errors.pop(0)
+            self.delivered.append((chat_id, text))
+        finally:
+            self.in_flight -= 1
+
+
+def report(job) -> str:
+    return f'sent={job.sent} failed={job.failed}'
+
+
+async def broadcast(bot: FakeBot, recipients, concurrency: int = 4, max_retries: int = 2):
+    broadcaster = Broadcaster(1000, concurrency, max_retries)
+    try:
+        job = broadcaster.submit(bot, 0, recipients, 'hello', report)
+        await asyncio.wait_for(job.done.wait(), 10)
+        return job
+    finally:
+        await broadcaster.stop()
+
+
+def test_retry_after_pauses_and_redelivers():
+    bot = FakeBot({2: [RetryAfter(1)]})
+    job = asyncio.run(broadcast(bot, [1, 2, 3]))
+
+    assert (job.sent, job.failed) == (3, 0)
+    assert sorted(chat_id for chat_id, _ in bot.delivered if chat_id != 0) == [1, 2, 3]
+    assert (0, 'sent=3 failed=0') in bot.delivered
+
+
+def test_retry_after_gives_up_after_max_retries():
+    bot = FakeBot({2: [RetryAfter(0)] * 3})
+    job = asyncio.run(broadcast(bot, [1, 2], max_retries=2))
+
+    assert (job.sent, job.failed) == (1, 1)
+    assert (0, 'sent=1 failed=1') in bot.delivered
+
+
+def test_unexpected_errors_count_as_failed_recipients():
+    bot = FakeBot({2: [asyncio.TimeoutError()], 3: [BotBlocked('blocked')], 4: [RuntimeError()]}, delay=0.01)
+    job = asyncio.run(broadcast(bot, list(range(1, 11)), concurrency=3))
+
+    assert (job.sent, job.failed) == (7, 3)
+    assert (0, 'sent=7 failed=3') in bot.delivered
+    assert bot.max_in_flight <= 3
+    assert bot.in_flight == 0
@@ -0,0 +1,46 @@
+import asyncio
+
+from checkin import check_in_sessions
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from models import User, Event
+from tests.utils import open_database, create_controller
+
+
+async def seed(engine):
+    controller = create_controller(engine)
+    await controller.db_session.add_model(User(id=1, first_name='User', rank=Rank.USER, rating=0))
+    await controller.db_session.add_model(Event(id=1, name='Event', status=StatusEvent.UNFINISHED))
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+async def issue_code(engine, save: bool):
+    controller = create_controller(engine)
+    user = await controller.get_user_by_id(1)
+    event = await controller.get_event_by_id(1)
+    code = await controller.add_new_code(event, user)
+    pending = code in check_in_sessions.get(1).codes
+    if save:
+        await controller.save()
+    await controller.db_session.close_session()
+    return code, pending
+
+
+async def codes_in_session(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        await controller.start_check_in(1)
+        await controller.db_session.close_session()
+        try:
+            discarded, discarded_pending = await issue_code(engine, False)
+            saved, saved_pending = await issue_code(engine, True)
+            codes = check_in_sessions.get(1).codes
+            return discarded_pending, discarded in codes, saved_pending, codes.get(saved)
+        finally:
+            check_in_sessions.finish(1)
+
+
+def test_new_code_joins_check_in_session_after_commit(database_url):
+    assert asyncio.run(codes_in_session(database_url)) == (False, False, False, 1)
@@ -0,0 +1,66 @@
+import asyncio
+from io import BytesIO
+
+from PIL import Image
+from aiogram.types import InputFile
+
+from collage import AchievementCollageCache
+from models import Achievement
+from tests.utils import open_database, create_controller
+
+
+def image(color) -> bytes:
+    output = BytesIO()
+    Image.new('RGB', (200, 200), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+async def set_image(engine, aid: int, color):
+    controller = create_controller(engine)
+    (await controller.get_achievement_by_id(aid)).image = image(color)
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+async def collage(engine, collages: AchievementCollageCache, achievement_ids):
+    controller = create_controller(engine)
+    try:
+        return await collages.get(controller, achievement_ids)
+    finally:
+        await controller.db_session.close_session()
+
+
+async def scenario(database_url: str, path: str):
+    collages = AchievementCollageCache(path, 2)
+    async with open_database(database_url) as engine:
+        controller = create_controller(engine)
+        await controller.db_session.add_model(Achievement(id=1, name='First', image=image((255, 0, 0))))
+        await controller.db_session.add_model(Achievement(id=2, name='Second'))
+        await controller.save()
+        await controller.db_session.close_session()
+
+        key, photo = await collage(engine, collages, [1, 2])
+        assert isinstance(photo, InputFile)
+        collages.remember(key, 'first-file-id')
+        assert await collage(engine, collages, [2, 1]) == (key, 'first-file-id')
+
+        await asyncio.sleep(0.01)
+        await set_image(engine, 2, (0, 255, 0))
+        second_key, photo = await collage(engine, collages, [1, 2])
+        assert second_key != key
+        assert isinstance(photo, InputFile)
+
+        await asyncio.sleep(0.01)
+        await set_image(engine, 2, (0, 0, 255))
+        third_key, _ = await collage(engine, collages, [1, 2])
+        assert third_key not in (key, second_key)
+
+        assert await collage(engine, collages, [3]) == (None, None)
+
+        for number in range(3):
+            collages.remember(f'key{number}', f'file{number}')
+        assert len(collages.file_ids) == 2
+
+
+def test_collage_is_rebuilt_when_an_image_is_uploaded(database_url, tmp_path):
+    asyncio.run(scenario(database_url, str(tmp_path / 'achievements')))
@@ -0,0 +1,68 @@
+import itertools
+
+import pytest
+from aiogram.types import Message
+
+from cache import UserState
+from commands import commands, get_command, unknown_command
+from datainputs import data_inputs, get_data_input
+from enums.ranks import Rank
+from enums.steps import Step
+
+CHAT = {'id': 1, 'type': 'private'}
+SENDER = {'id': 1, 'is_bot': False, 'first_name': 'Test'}
+
+MESSAGES = {
+    'text': {'text': 'Иван'},
+    'cancel': {'text': 'отмена'},
+    'photo': {'photo': [{'file_id': 'photo', 'file_unique_id': 'photo', 'width': 640, 'height': 640}]},
+    'location': {'location': {'latitude': 56.8, 'longitude': 60.6}},
+    'document': {'document': {'file_id': 'document', 'file_unique_id': 'document', 'file_name': 'users.csv'}},
+    'sticker': {'sticker': {'file_id': 'sticker', 'file_unique_id': 'sticker', 'width': 1, 'height': 1,
+                            'is_animated': False, 'is_video': False, 'type': 'regular'}},
+}
+
+TEXTS = [command.phrase for command in commands] + [
+    command.phrase.upper() for command in commands] + [
+    f'Покажи {command.phrase} пожалуйста' for command in commands] + [
+    'Мои мероприятия и мои друзья', 'Добавить', 'привет', '', 'Импорт пользователей']
+
+
+def message(**content) -> Message:
+    return Message(message_id=1, date=0, chat=CHAT, **{'from': SENDER}, **content)
+
+
+def linear_data_input(user, _message):
+    for data_input in data_inputs:
+        if data_input.can_input(user, _message):
+            return data_input
+    return None
+
+
+def linear_command(user, _message):
+    for command in commands:
+        if _message.text is not None and command.can_execute(user, _message):
+            return command
+    return unknown_command
+
+
+@pytest.mark.parametrize('step,rank,kind', list(itertools.product(Step, Rank, MESSAGES)))
+def test_data_input_index_matches_linear_scan(step, rank, kind):
+    user = UserState(1, rank, step)
+    _message = message(**MESSAGES[kind])
+
+    assert get_data_input(user, _message) is linear_data_input(user, _message)
+
+
+@pytest.mark.parametrize('rank,text', list(itertools.product(Rank, TEXTS)))
+def test_command_matcher_matches_linear_scan(rank, text):
+    user = UserState(1, rank, Step.NONE)
+    _message = message(text=text)
+
+    assert get_command(user, _message) is linear_command(user, _message)
+
+
+@pytest.mark.parametrize('rank', list(Rank))
+def test_command_matcher_ignores_messages_without_text(rank):
+    assert get_command(UserState(1, rank, Step.NONE), message(**MESSAGES['photo'])) is unknown_command
+
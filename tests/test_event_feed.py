@@ -0,0 +1,60 @@
+import asyncio
+import datetime
+
+import pytest
+
+from enums.friend_request_status import FriendRequestStatus
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from eventpages import render_events_page
+from models import User, Event, EventUsers, Interest, LocalGroup
+from models.event import EventInterests, EventGroups
+from models.user import UserFriends
+from tests.utils import open_database, create_controller, QueryCounter
+
+VIEWER = 1
+FRIEND = 2
+
+
+async def seed(engine, events: int):
+    controller = create_controller(engine)
+    session = controller.db_session
+    await session.add_model(User(id=VIEWER, first_name='Viewer', rank=Rank.USER, rating=0))
+    await session.add_model(User(id=FRIEND, first_name='Friend', rank=Rank.USER, rating=0))
+    await session.add_model(Interest(id=1, name='Музыка'))
+    await session.add_model(LocalGroup(id=1, name='ИКН'))
+    now = datetime.datetime.now()
+    for eid in range(1, events + 1):
+        await session.add_model(Event(id=eid, name=f'Event{eid}', description='-', lat=0.0, lng=0.0,
+                                      date=now + datetime.timedelta(days=eid), status=StatusEvent.UNFINISHED))
+    await controller.save()
+
+    await session.add_model(UserFriends(user_id=FRIEND, friend_id=VIEWER,
+                                        friend_request_status=FriendRequestStatus.ACCEPTED))
+    for eid in range(1, events + 1):
+        await session.add_model(EventInterests(event_id=eid, interest_id=1))
+        await session.add_model(EventGroups(event_id=eid, group_id=1))
+        await session.add_model(EventUsers(event_id=eid, user_id=FRIEND))
+    await controller.save()
+    await session.close_session()
+
+
+async def count_feed_queries(database_url: str, events: int) -> int:
+    async with open_database(database_url) as engine:
+        await seed(engine, events)
+        controller = create_controller(engine)
+        user = await controller.get_user_by_id(VIEWER)
+        with QueryCounter(engine) as queries:
+            feed, _, _ = await controller.get_event_feed(VIEWER)
+            await render_events_page(controller, user, 'all')
+            for event, friends in feed:
+                assert [interest.name for interest in event.interests] == ['Музыка']
+                assert [group.name for group in event.groups] == ['ИКН']
+                assert [friend.id for friend in friends] == [FRIEND]
+        await controller.db_session.close_session()
+        return len(queries)
+
+
+@pytest.mark.parametrize('events', [2, 5, 50])
+def test_event_feed_query_count_is_constant(database_url, events):
+    assert asyncio.run(count_feed_queries(database_url, events)) == asyncio.run(count_feed_queries(database_url, 1))
@@ -0,0 +1,163 @@
+import asyncio
+import csv
+import json
+import os
+
+import pytest
+
+import export
+from callbacks import ExportEventCallback
+from enums.ranks import Rank
+from enums.status_attendion import StatusAttendion
+from enums.status_event import StatusEvent
+from export import fields, write_event_export
+from models import User, Event, EventUsers
+from models.event import EventFeedbacks
+from tests.test_take_part import FakeQuery
+from tests.utils import open_database, create_controller
+
+ORGANIZER = User(id=1, first_name='Organizer', rank=Rank.ORGANIZER, rating=0)
+RECORDS = ['event', 'attendance', 'attendance', 'attendance', 'feedback', 'feedback']
+
+
+class ExportQuery(FakeQuery):
+    def __init__(self, data: str):
+        super().__init__(data)
+        self.message.documents = []
+
+        async def answer_document(document, **kwargs):
+            self.message.documents.append((document.get_filename(), document.get_file().read().decode('utf-8'),
+                                           document._path))
+
+        self.message.answer_document = answer_document
+
+
+async def seed(engine):
+    controller = create_controller(engine)
+    for uid in range(1, 4):
+        await controller.db_session.add_model(User(id=uid, first_name=f'User{uid}', middle_name=None,
+                                                   last_name='Фамилия', rank=Rank.USER, rating=0), True)
+    for eid, status in ((1, StatusEvent.FINISHED), (2, StatusEvent.UNFINISHED), (3, StatusEvent.FINISHED)):
+        await controller.db_session.add_model(Event(id=eid, name=f'Event{eid}', description='Описание',
+                                                    status=status), True)
+    await controller.db_session.add_model(EventUsers(event_id=1, user_id=1))
+    await controller.db_session.add_model(EventUsers(event_id=1, user_id=2, status_attendion=StatusAttendion.ARRIVED))
+    await controller.db_session.add_model(EventUsers(event_id=1, user_id=3,
+                                                     status_attendion=StatusAttendion.NOT_ARRIVED))
+    await controller.db_session.add_model(EventUsers(event_id=2, user_id=1))
+    await controller.db_session.add_model(EventUsers(event_id=3, user_id=2))
+    await controller.db_session.add_model(EventFeedbacks(event_id=1, fb_text='Отлично', neutral=0.1, negative=0.0,
+                                                         positive=0.9))
+    await controller.db_session.add_model(EventFeedbacks(event_id=1, fb_text='Не оценен'))
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+def read_export(path: str, kind: str) -> list:
+    with open(path, encoding='utf-8', newline='') as file:
+        if kind == 'csv':
+            reader = csv.DictReader(file)
+            assert tuple(reader.fieldnames) == fields
+            return list(reader)
+        return [json.loads(line) for line in file]
+
+
+def check_rows(rows: list, kind: str):
+    empty = '' if kind == 'csv' else None
+    assert [row['record'] for row in rows] == RECORDS
+    assert all(set(row) <= set(fields) for row in rows)
+    event, attendance, feedbacks = rows[0], rows[1:4], rows[4:]
+    assert event['name'] == 'Event1' and event['description'] == 'Описание' and event['status'] == 'FINISHED'
+    assert [str(row['user_id']) for row in attendance] == ['1', '2', '3']
+    assert [row['attendance'] for row in attendance] == [empty, 'ARRIVED', 'NOT_ARRIVED']
+    assert [row['last_name'] for row in attendance] == ['Фамилия'] * 3
+    assert [row['feedback'] for row in feedbacks] == ['Отлично', 'Не оценен']
+    assert [row['positive'] for row in feedbacks] == (['0.9', ''] if kind == 'csv' else [0.9, None])
+    if kind == 'csv':
+        assert all(row['feedback'] == '' for row in rows[:4])
+    else:
+        assert all('feedback' not in row for row in rows[:4])
+        assert all('user_id' not in row for row in feedbacks)
+
+
+async def export_rows(database_url: str, kind: str) -> list:
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        event = await controller.get_event_by_id(1)
+        path = await write_event_export(controller, event, kind)
+        await controller.db_session.close_session()
+        try:
+            return read_export(path, kind)
+        finally:
+            os.remove(path)
+
+
+async def failed_export(database_url: str, monkeypatch) -> str:
+    paths = []
+    mkstemp = export.tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        descriptor, path = mkstemp(*args, **kwargs)
+        paths.append(path)
+        return descriptor, path
+
+    monkeypatch.setattr(export.tempfile, 'mkstemp', recording_mkstemp)
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        event = await controller.get_event_by_id(1)
+
+        async def broken_stream(event):
+            yield {'record': 'event', 'event_id': event.id}
+            raise ConnectionError
+
+        monkeypatch.setattr(controller, 'stream_event_export', broken_stream)
+        with pytest.raises(ConnectionError):
+            await write_event_export(controller, event, 'csv')
+        await controller.db_session.close_session()
+    return paths[0]
+
+
+async def export_callbacks(database_url: str) -> list:
+    queries = []
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        for data in ('exp_csv_1', 'exp_jsonl_1', 'exp_csv_2', 'exp_csv_3', 'exp_csv_4'):
+            controller = create_controller(engine)
+            query = ExportQuery(data)
+            assert ExportEventCallback().can_callback(ORGANIZER, query)
+            await ExportEventCallback().callback(controller, ORGANIZER, query)
+            await controller.db_session.close_session()
+            queries.append(query)
+    return queries
+
+
+@pytest.mark.parametrize('kind', ['csv', 'jsonl'])
+def test_export_row_shapes(database_url, kind):
+    check_rows(asyncio.run(export_rows(database_url, kind)), kind)
+
+
+def test_failed_export_removes_file(database_url, monkeypatch):
+    assert not os.path.exists(asyncio.run(failed_export(database_url, monkeypatch)))
+
+
+def test_export_callback(database_url):
+    csv_query, jsonl_query, unfinished, foreign, missing = asyncio.run(export_callbacks(database_url))
+
+    for query, kind in ((csv_query, 'csv'), (jsonl_query, 'jsonl')):
+        [(filename, content, path)] = query.message.documents
+        assert filename == f'event_1.{kind}' and not os.path.exists(path)
+        assert content.count('\n') == len(RECORDS) + (kind == 'csv')
+        assert query.message.answers == []
+
+    assert unfinished.message.answers == ['Выгрузка доступна только для завершенных мероприятий']
+    assert foreign.message.answers == ['Выгрузка доступна только организатору мероприятия']
+    assert missing.message.answers == ['Такого мероприятия нет']
+    assert not any(query.message.documents for query in (unfinished, foreign, missing))
+
+
+def test_export_requires_organizer():
+    query = ExportQuery('exp_csv_1')
+    assert not ExportEventCallback().can_callback(User(id=2, rank=Rank.MODER), query)
+    assert not ExportEventCallback().can_callback(ORGANIZER, ExportQuery('exp_xml_1'))
@@ -0,0 +1,49 @@
+import asyncio
+
+from callbacks import render_feedbacks_page
+from data import config
+from enums.status_event import StatusEvent
+from models import Event
+from models.event import EventFeedbacks
+from tests.utils import open_database, create_controller
+
+FEEDBACKS = 25
+
+
+async def scenario(database_url: str):
+    async with open_database(database_url) as engine:
+        controller = create_controller(engine)
+        await controller.db_session.add_model(Event(id=1, name='Event', status=StatusEvent.FINISHED))
+        for number in range(FEEDBACKS):
+            await controller.db_session.add_model(EventFeedbacks(event_id=1, fb_text=f'{number:03}' + 'x' * 252))
+        await controller.save()
+
+        pages = []
+        feedbacks, has_prev, has_next = await controller.get_feedbacks_page(1)
+        pages.append(feedbacks)
+        assert not has_prev
+        while has_next:
+            feedbacks, has_prev, has_next = await controller.get_feedbacks_page(1, pages[-1][-1].id)
+            assert has_prev
+            pages.append(feedbacks)
+        assert [feedback.fb_text[:3] for page in pages for feedback in page] == [
+            f'{number:03}' for number in range(FEEDBACKS)]
+        assert all(len(page) <= config.FEEDBACKS_PAGE_SIZE for page in pages)
+
+        feedbacks, has_prev, has_next = await controller.get_feedbacks_page(1, pages[-1][0].id, True)
+        assert feedbacks == pages[-2] and has_prev and has_next
+
+        cursor = None
+        while True:
+            text, keyboard = await render_feedbacks_page(controller, 1, cursor)
+            assert len(text) <= 4096
+            if keyboard is None or keyboard.inline_keyboard[0][-1].text != '▶️':
+                break
+            cursor = int(keyboard.inline_keyboard[0][-1].callback_data.split('_')[-1])
+
+        assert await render_feedbacks_page(controller, 2) == (None, None)
+        await controller.db_session.close_session()
+
+
+def test_feedbacks_are_paged(database_url):
+    asyncio.run(scenario(database_url))
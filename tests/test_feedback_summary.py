@@ -0,0 +1,53 @@
+import asyncio
+
+from sqlalchemy import select
+
+from enums.status_event import StatusEvent
+from models import Event
+from models.event import EventFeedbacks, EventFeedbackSummary
+from tests.utils import open_database, create_controller
+
+SENTIMENT = {'neutral': 0.5, 'negative': 0.25, 'positive': 0.25}
+
+
+async def seed(engine):
+    controller = create_controller(engine)
+    for eid in (1, 2):
+        await controller.db_session.add_model(Event(id=eid, name=f'Event{eid}', status=StatusEvent.FINISHED), True)
+    await controller.db_session.add_model(EventFeedbackSummary(event_id=1, count=1, neutral=1.0, negative=0.0,
+                                                               positive=0.0))
+    for fid, eid in enumerate((1, 1, 1, 1, 2), 1):
+        await controller.db_session.add_model(EventFeedbacks(id=fid, event_id=eid, fb_text=f'Отзыв {fid}'))
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+async def score(engine, feedback_ids: list, loaded: asyncio.Barrier):
+    controller = create_controller(engine)
+    try:
+        feedbacks = await controller.get_unscored_feedbacks(feedback_ids, len(feedback_ids))
+        await loaded.wait()
+        await controller.add_feedback_scores(feedbacks, [SENTIMENT] * len(feedbacks))
+        await controller.save()
+    finally:
+        await controller.db_session.close_session()
+
+
+async def concurrent_scores(database_url: str) -> list:
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        loaded = asyncio.Barrier(2)
+        await asyncio.gather(score(engine, [1, 2], loaded), score(engine, [3, 4, 5], loaded))
+
+        controller = create_controller(engine)
+        summaries = (await controller.db_session.execute(
+            select(EventFeedbackSummary.event_id, EventFeedbackSummary.count, EventFeedbackSummary.neutral,
+                   EventFeedbackSummary.negative, EventFeedbackSummary.positive)
+            .order_by(EventFeedbackSummary.event_id))).all()
+        assert len(await controller.get_unscored_feedbacks(None, 10)) == 0
+        await controller.db_session.close_session()
+        return [tuple(summary) for summary in summaries]
+
+
+def test_concurrent_scores_add_up(database_url):
+    assert asyncio.run(concurrent_scores(database_url)) == [(1, 5, 3.0, 1.0, 1.0), (2, 1, 0.5, 0.25, 0.25)]
@@ -0,0 +1,122 @@
+import asyncio
+import bisect
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from cache import UserStateCache
+from controller import AsyncController
+from loadtest import message_update
+from metrics import COUNT_BUCKETS, MetricRegistry, Histogram, instrument_engine, update_db_queries, update_stats
+from middlewares import DBSessionMiddleware, MetricsMiddleware
+from models import User
+from tests.utils import open_database, QueryCounter
+
+
+def test_render_prometheus_text():
+    registry = MetricRegistry()
+    requests = registry.counter('requests_total', 'Handled "requests"\nper method')
+    requests.inc(method='get')
+    requests.inc(2.5, method='p"o\\st\n')
+    latency = registry.histogram('latency_seconds', 'Latency', (0.1, 1.0))
+    latency.observe(0.5, kind='a')
+    size = registry.gauge('queue_size', 'Queue size')
+    size.track(lambda: 3, queue='q')
+    hits = registry.counter_of('hits_total', 'Hits')
+    hits.track(lambda: 7)
+
+    assert registry.render() == (
+        '# HELP requests_total Handled \\"requests\\"\\nper method\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{method="get"} 1\n'
+        'requests_total{method="p\\"o\\\\st\\n"} 2.5\n'
+        '# HELP latency_seconds Latency\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{kind="a",le="0.1"} 0\n'
+        'latency_seconds_bucket{kind="a",le="1.0"} 1\n'
+        'latency_seconds_bucket{kind="a",le="+Inf"} 1\n'
+        'latency_seconds_sum{kind="a"} 0.5\n'
+        'latency_seconds_count{kind="a"} 1\n'
+        '# HELP queue_size Queue size\n'
+        '# TYPE queue_size gauge\n'
+        'queue_size{queue="q"} 3\n'
+        '# HELP hits_total Hits\n'
+        '# TYPE hits_total counter\n'
+        'hits_total 7\n')
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram('h', 'Histogram', (1, 2, 5))
+    for value in (0.5, 1, 1.5, 5, 7):
+        histogram.observe(value)
+
+    assert list(histogram.samples()) == [
+        ('h_bucket', (('le', '1.0'),), 2),
+        ('h_bucket', (('le', '2.0'),), 3),
+        ('h_bucket', (('le', '5.0'),), 4),
+        ('h_bucket', (('le', '+Inf'),), 5),
+        ('h_sum', (), 15.0),
+        ('h_count', (), 5),
+    ]
+
+
+def test_histogram_time_counts_errors():
+    registry = MetricRegistry()
+    histogram = registry.histogram('handler_seconds', 'Handlers')
+    errors = registry.counter('handler_errors_total', 'Errors')
+    with histogram.time(errors, handler='ok'):
+        pass
+    with pytest.raises(ValueError):
+        with histogram.time(errors, handler='failed'):
+            raise ValueError
+
+    assert errors.values == {(('handler', 'failed'),): 1}
+    assert {key: counts[2] for key, counts in histogram.values.items()} == {
+        (('handler', 'ok'),): 1, (('handler', 'failed'),): 1}
+
+
+def message_queries() -> list:
+    counts = update_db_queries.values.get((('type', 'Message'),))
+    if counts is None:
+        return [0] * (len(COUNT_BUCKETS) + 1) + [0]
+    return list(counts[0]) + [counts[1]]
+
+
+async def counted_updates(database_url: str) -> tuple:
+    async with open_database(database_url) as engine:
+        instrument_engine(engine)
+        session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        bot = Bot('1:test')
+        dispatcher = Dispatcher(bot, storage=MemoryStorage())
+        dispatcher.middleware.setup(DBSessionMiddleware(session_factory, UserStateCache(100, 60)))
+        dispatcher.middleware.setup(MetricsMiddleware())
+
+        async def handler(message, controller: AsyncController):
+            for _ in range(int(message.text)):
+                await controller.db_session.scalar(select(func.count()).select_from(User))
+
+        dispatcher.register_message_handler(handler)
+        Bot.set_current(bot)
+        buckets = []
+        with QueryCounter(engine) as counter:
+            for queries in (0, 3, 30):
+                before, executed = message_queries(), len(counter)
+                await dispatcher.process_update(message_update(1, str(queries)))
+                buckets.append(([after - count for after, count in zip(message_queries(), before)],
+                                len(counter) - executed))
+
+        return buckets, update_stats.get()
+
+
+def test_update_queries_are_counted_per_update(database_url):
+    buckets, stats = asyncio.run(counted_updates(database_url))
+
+    for (observed, executed), queries in zip(buckets, (0, 3, 30)):
+        *observed, total = observed
+        assert executed == total == queries
+        assert observed == [int(index == bisect.bisect_left(COUNT_BUCKETS, queries)) for index in range(len(observed))]
+    assert stats is None
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+
+from enums.friend_request_status import FriendRequestStatus
+from enums.ranks import Rank
+from enums.status_attendion import StatusAttendion
+from enums.status_event import StatusEvent
+from models import User, Event, EventUsers
+from models.event import EventCodes
+from models.user import UserFriends
+from tests.utils import open_database, create_controller, QueryCounter
+
+USERS = 200
+EVENTS = 20
+
+QUERIES = [
+    ('has_user_in_event', lambda controller: controller.has_user_in_event(3, 7),
+     {'ix_event_users_event_id_user_id'}),
+    ('has_friend_request', lambda controller: controller.has_friend_request(7, 8),
+     {'ix_user_friends_user_id_friend_id'}),
+    ('get_code_model_by_id', lambda controller: controller.get_code_model_by_id(3, 7),
+     {'ix_event_codes_event_id_user_id'}),
+    ('get_attendance_counts', lambda controller: controller.get_attendance_counts(3),
+     {'ix_event_users_event_id_status_attendion', 'ix_event_users_event_id_user_id'}),
+]
+
+
+async def seed(engine):
+    statuses = (StatusAttendion.ARRIVED, StatusAttendion.NOT_ARRIVED, None)
+    async with engine.begin() as connection:
+        await connection.execute(insert(User), [{'id': uid, 'first_name': f'User{uid}', 'rank': Rank.USER, 'rating': 0}
+                                                for uid in range(1, USERS + 1)])
+        await connection.execute(insert(Event), [{'id': eid, 'name': f'Event{eid}', 'status': StatusEvent.UNFINISHED}
+                                                 for eid in range(1, EVENTS + 1)])
+        await connection.execute(insert(EventUsers), [
+            {'event_id': eid, 'user_id': uid, 'status_attendion': statuses[uid % len(statuses)]}
+            for eid in range(1, EVENTS + 1) for uid in range(1, USERS + 1)])
+        await connection.execute(insert(EventCodes), [
+            {'event_id': eid, 'user_id': uid, 'code': f'{eid:04}{uid:04}'}
+            for eid in range(1, EVENTS + 1) for uid in range(1, USERS + 1)])
+        await connection.execute(insert(UserFriends), [
+            {'user_id': uid, 'friend_id': fid, 'friend_request_status': FriendRequestStatus.ACCEPTED}
+            for uid in range(1, USERS + 1) for fid in range(uid + 1, min(uid + 20, USERS + 1))])
+
+
+async def explain(connection, statement: str, parameters) -> str:
+    if connection.dialect.name == 'sqlite':
+        rows = await connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        return '\n'.join(row[-1] for row in rows)
+    # Test tables are small enough for PostgreSQL to prefer sequential scans, so ask whether an index can serve
+    await connection.exec_driver_sql('SET enable_seqscan = off')
+    rows = await connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)
+    return '\n'.join(row[0] for row in rows)
+
+
+async def query_plan(database_url: str, query) -> str:
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        try:
+            with QueryCounter(engine) as queries:
+                await query(controller)
+        finally:
+            await controller.db_session.close_session()
+
+        assert len(queries) == 1
+        async with engine.connect() as connection:
+            return await explain(connection, queries.statements[0], queries.parameters[0])
+
+
+@pytest.mark.parametrize('name, query, indexes', QUERIES, ids=[name for name, _, _ in QUERIES])
+def test_hot_query_uses_index(database_url, name, query, indexes):
+    plan = asyncio.run(query_plan(database_url, query))
+
+    assert any(index in plan for index in indexes), plan
+    assert 'Seq Scan' not in plan, plan
+    assert all('USING' in line for line in plan.splitlines() if line.startswith('SCAN ')), plan
@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+from callbacks import TakePartCallback
+from models import EventUsers
+from models.event import EventCodes
+from tests.test_unique_models import seed, count
+from tests.utils import open_database, create_controller
+
+
+class FakeMessage(object):
+    def __init__(self):
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+    async def answer_photo(self, photo, **kwargs):
+        self.answers.append('photo')
+        return SimpleNamespace(photo=[SimpleNamespace(file_id='photo')])
+
+
+class FakeQuery(object):
+    def __init__(self, data: str):
+        self.data = data
+        self.message = FakeMessage()
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+
+async def take_part(engine, checked: list, both_checked: asyncio.Event) -> list:
+    controller = create_controller(engine)
+    has_user_in_event = controller.has_user_in_event
+
+    async def has_user_in_event_concurrently(*args):
+        result = await has_user_in_event(*args)
+        checked.append(result)
+        if len(checked) == 2:
+            both_checked.set()
+        await both_checked.wait()
+        return result
+
+    controller.has_user_in_event = has_user_in_event_concurrently
+    query = FakeQuery('tp_1')
+    try:
+        await TakePartCallback().callback(controller, await controller.get_user_by_id(1), query)
+        await controller.save()
+    finally:
+        await controller.db_session.close_session()
+    return query.message.answers
+
+
+async def concurrent_joins(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        checked, both_checked = [], asyncio.Event()
+        answers = await asyncio.gather(take_part(engine, checked, both_checked),
+                                       take_part(engine, checked, both_checked))
+        return checked, answers, await count(engine, EventUsers), await count(engine, EventCodes)
+
+
+def test_concurrent_joins_issue_one_code(database_url):
+    checked, answers, participants, codes = asyncio.run(concurrent_joins(database_url))
+
+    assert checked == [False, False]
+    assert sorted(len(texts) for texts in answers) == [1, 3]
+    assert ['Вы уже принимаете участие в мероприятии'] in answers
+    assert (participants, codes) == (1, 1)
@@ -0,0 +1,117 @@
+import asyncio
+
+from sqlalchemy import select, func
+
+from enums.ranks import Rank
+from enums.status_event import StatusEvent
+from models import User, Event, EventUsers
+from models.event import EventCodes
+from tests.utils import open_database, create_controller
+
+
+async def seed(engine):
+    controller = create_controller(engine)
+    await controller.db_session.add_model(User(id=1, first_name='User', rank=Rank.USER, rating=0))
+    await controller.db_session.add_model(Event(id=1, name='Event', status=StatusEvent.UNFINISHED))
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+async def count(engine, model) -> int:
+    controller = create_controller(engine)
+    try:
+        return await controller.db_session.scalar(select(func.count()).select_from(model))
+    finally:
+        await controller.db_session.close_session()
+
+
+async def close_after_unique_model(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        assert await controller.db_session.add_unique_model(EventUsers(event_id=1, user_id=1))
+        await controller.db_session.close_session()
+        return await count(engine, EventUsers)
+
+
+async def duplicate_keeps_transaction(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        assert await controller.db_session.add_unique_model(EventUsers(event_id=1, user_id=1))
+        await controller.db_session.add_model(EventCodes(event_id=1, user_id=1, code='AAAAAAAA'))
+        assert not await controller.db_session.add_unique_model(EventUsers(event_id=1, user_id=1))
+        await controller.save()
+        await controller.db_session.close_session()
+        return await count(engine, EventUsers), await count(engine, EventCodes)
+
+
+def test_closing_without_save_discards_unique_model(database_url):
+    assert asyncio.run(close_after_unique_model(database_url)) == 0
+
+
+def test_duplicate_keeps_previous_changes(database_url):
+    assert asyncio.run(duplicate_keeps_transaction(database_url)) == (1, 1)
+
+
+async def pending_user_before_unique_model(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        await controller.db_session.add_model(User(id=2, first_name='Pending', rank=Rank.USER, rating=0))
+        assert await controller.db_session.add_unique_model(EventUsers(event_id=1, user_id=2))
+        pending = len(controller.db_session._session.new)
+        await controller.save()
+        await controller.db_session.close_session()
+        return pending, await count(engine, User), await count(engine, EventUsers)
+
+
+def test_pending_models_are_flushed_before_unique_model(database_url):
+    assert asyncio.run(pending_user_before_unique_model(database_url)) == (0, 2, 1)
+
+
+async def join_event(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        user = await controller.get_user_by_id(1)
+        event = await controller.get_event_by_id(1)
+        await controller.add_user_to_event(event, user)
+        await controller.db_session.close_session()
+        discarded = await count(engine, EventUsers)
+
+        controller = create_controller(engine)
+        user = await controller.get_user_by_id(1)
+        event = await controller.get_event_by_id(1)
+        await controller.add_user_to_event(event, user)
+        await controller.add_user_to_event(event, user)
+        await controller.save()
+        await controller.db_session.close_session()
+        return discarded, await count(engine, EventUsers)
+
+
+def test_add_user_to_event_is_part_of_the_update_transaction(database_url):
+    assert asyncio.run(join_event(database_url)) == (0, 1)
+
+
+async def issue_codes(database_url: str):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        await controller.db_session.add_model(User(id=2, first_name='Other', rank=Rank.USER, rating=0), True)
+        await controller.db_session.add_model(EventCodes(event_id=1, user_id=2, code='AAAAAAAA'))
+        await controller.save()
+        user = await controller.get_user_by_id(1)
+        event = await controller.get_event_by_id(1)
+        code = await controller.add_new_code(event, user)
+        again = await controller.add_new_code(event, user)
+        await controller.save()
+        await controller.db_session.close_session()
+        return code, again, await count(engine, EventCodes)
+
+
+def test_new_code_retries_collisions_and_keeps_existing_code(database_url, monkeypatch):
+    characters = iter('A' * 8 + 'B' * 8)
+    monkeypatch.setattr('secrets.choice', lambda sequence: next(characters))
+
+    assert asyncio.run(issue_codes(database_url)) == ('BBBBBBBB', 'BBBBBBBB', 2)
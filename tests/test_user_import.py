@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from enums.ranks import Rank
+from models import User, Interest, LocalGroup, UserGroups, UserInterests
+from tests.utils import open_database, create_controller
+from userimport import UserImport, read_csv, read_jsonl
+
+USERS = {1: Rank.USER, 2: Rank.USER, 3: Rank.MODER, 4: Rank.ORGANIZER, 5: Rank.ADMIN}
+
+CSV = '﻿id,rank,groups,interests\n' \
+      '1,moder,ИКН; ИЕНиМ,Музыка\n' \
+      '2,,,\n' \
+      'abc,,,\n' \
+      '99,,,\n' \
+      '2,king,,\n' \
+      '2,,Нет такой,\n'.encode()
+
+JSONL = '{"id": 1, "rank": "MODER", "groups": ["ИКН", "ИЕНиМ"], "interests": "Музыка"}\n' \
+        '\n' \
+        '{"id": 2}\n' \
+        'not json\n' \
+        '[1, 2]\n'.encode()
+
+
+def test_csv_rows_keep_file_line_numbers():
+    assert list(read_csv(CSV))[:2] == [(2, {'id': '1', 'rank': 'moder', 'groups': 'ИКН; ИЕНиМ',
+                                            'interests': 'Музыка'}),
+                                       (3, {'id': '2', 'rank': '', 'groups': '', 'interests': ''})]
+
+
+def test_jsonl_skips_blank_lines_and_marks_invalid_rows():
+    assert list(read_jsonl(JSONL)) == [(1, {'id': 1, 'rank': 'MODER', 'groups': ['ИКН', 'ИЕНиМ'],
+                                            'interests': 'Музыка'}),
+                                       (3, {'id': 2}), (4, None), (5, None)]
+
+
+async def seed(engine):
+    controller = create_controller(engine)
+    for uid, rank in USERS.items():
+        await controller.db_session.add_model(User(id=uid, first_name=f'User{uid}', rank=rank, rating=0))
+    await controller.db_session.add_model(LocalGroup(id=1, name='ИКН'))
+    await controller.db_session.add_model(LocalGroup(id=2, name='ИЕНиМ'))
+    await controller.db_session.add_model(Interest(id=1, name='Музыка'))
+    await controller.save()
+    await controller.db_session.close_session()
+
+
+async def import_users(database_url: str, importer_rank: Rank, dry_run: bool, kind: str, data: bytes):
+    async with open_database(database_url) as engine:
+        await seed(engine)
+        controller = create_controller(engine)
+        user_import = UserImport(importer_rank, dry_run)
+        await user_import.run(controller, kind, data)
+        await controller.save()
+        await controller.db_session.close_session()
+
+        controller = create_controller(engine)
+        try:
+            ranks = await controller.get_user_ranks(list(USERS))
+            groups = set((await controller.db_session.execute(select(UserGroups.user_id, UserGroups.group_id))).all())
+            interests = set((await controller.db_session.execute(
+                select(UserInterests.user_id, UserInterests.interest_id))).all())
+        finally:
+            await controller.db_session.close_session()
+        return user_import, ranks, groups, interests
+
+
+def test_import_applies_valid_rows_and_reports_row_errors(database_url):
+    user_import, ranks, groups, interests = asyncio.run(
+        import_users(database_url, Rank.ADMIN, False, 'csv', CSV))
+
+    assert (user_import.rows, user_import.applied) == (6, 2)
+    assert sorted(user_import.errors) == [(4, 'некорректный ID abc'), (5, 'пользователь 99 не найден'),
+                                          (6, 'неизвестный ранг KING'), (7, 'группа Нет такой не существует')]
+    assert ranks[1] is Rank.MODER and user_import.appointed == {Rank.MODER: [1]}
+    assert groups == {(1, 1), (1, 2)} and interests == {(1, 1)}
+    report = user_import.report()
+    assert report.startswith('Импорт завершен') and 'Ошибок: 4' in report and 'Строка 5: пользователь 99' in report
+
+
+def test_dry_run_validates_without_changes(database_url):
+    user_import, ranks, groups, interests = asyncio.run(
+        import_users(database_url, Rank.ADMIN, True, 'jsonl', JSONL))
+
+    assert (user_import.rows, user_import.applied, len(user_import.errors)) == (4, 2, 2)
+    assert ranks == USERS and groups == set() and interests == set()
+    assert user_import.appointed == {}
+    assert user_import.report().startswith('Проверка завершена\n\nСтрок: 4\nБудет применено: 2')
+
+
+@pytest.mark.parametrize('row, error', [
+    ('3,user,,', 'нельзя назначить ранг USER'),
+    ('1,organizer,,', 'нельзя назначить ранг ORGANIZER'),
+    ('3,,ИКН,', None),
+    ('5,,ИКН,', 'нельзя изменить пользователя 5'),
+])
+def test_organizer_can_only_promote_users_to_moderators(database_url, row, error):
+    user_import, ranks, groups, _ = asyncio.run(import_users(
+        database_url, Rank.ORGANIZER, False, 'csv', f'id,rank,groups,interests\n{row}\n'.encode()))
+
+    assert user_import.errors == ([] if error is None else [(2, error)])
+    assert ranks == USERS
+    assert groups == ({(3, 1)} if error is None else set())
+
+
+def test_organizer_promotes_user_to_moderator(database_url):
+    user_import, ranks, _, _ = asyncio.run(import_users(
+        database_url, Rank.ORGANIZER, False, 'csv', 'id,rank\n2,moder\n4,moder\n'.encode()))
+
+    assert user_import.errors == [(3, 'нельзя изменить ранг пользователя 4')]
+    assert ranks[2] is Rank.MODER and ranks[4] is Rank.ORGANIZER
@@ -0,0 +1,50 @@
+from contextlib import asynccontextmanager
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
+from sqlalchemy.orm import sessionmaker
+
+from cache import UserStateCache
+from controller import AsyncController
+from database import create_database_engine
+from models.basemodel import Base
+from models.dbsession import AsyncDBSession
+
+
+@asynccontextmanager
+async def open_database(url: str):
+    engine = create_database_engine(url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
+
+
+def create_controller(engine: AsyncEngine) -> AsyncController:
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    return AsyncController(AsyncDBSession(session_factory()), UserStateCache(100, 60), MemoryStorage())
+
+
+class QueryCounter(object):
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine.sync_engine
+        self.statements = []
+        self.parameters = []
+
+    def __enter__(self) -> 'QueryCounter':
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+    def __len__(self):
+        return len(self.statements)
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+from controller import AsyncController
+from data import config
+from enums.ranks import Rank
+from exceptions import InvalidImportRowError
+from models import Interest, LocalGroup
+
+assignable_ranks = {
+    Rank.ADMIN: (Rank.USER, Rank.MODER, Rank.ORGANIZER),
+    Rank.ORGANIZER: (Rank.MODER,)
+}
+changeable_ranks = {
+    Rank.ADMIN: (Rank.USER, Rank.MODER, Rank.ORGANIZER),
+    Rank.ORGANIZER: (Rank.USER,)
+}
+
+
+def split_names(value) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(name).strip() for name in value if str(name).strip() != '']
+    return [name.strip() for name in str(value).split(';') if name.strip() != '']
+
+
+def read_csv(data: bytes):
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8-sig')))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(data: bytes):
+    for line, text in enumerate(data.decode('utf-8-sig').splitlines(), 1):
+        if text.strip() == '':
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, None
+            continue
+        yield line, row if isinstance(row, dict) else None
+
+
+readers = {
+    'csv': read_csv,
+    'jsonl': read_jsonl
+}
+
+
+class UserImport(object):
+    importer_rank: Rank
+    dry_run: bool
+
+    def __init__(self, importer_rank: Rank, dry_run: bool):
+        self.importer_rank = importer_rank
+        self.dry_run = dry_run
+        self.rows = 0
+        self.applied = 0
+        self.errors: List[Tuple[int, str]] = []
+        self.appointed: Dict[Rank, List[int]] = {}
+        self.groups: Dict[str, int] = {}
+        self.interests: Dict[str, int] = {}
+
+    async def run(self, controller: AsyncController, kind: str, data: bytes):
+        self.groups = await controller.get_ids_by_names(LocalGroup, LocalGroup.name)
+        self.interests = await controller.get_ids_by_names(Interest, Interest.name)
+
+        batch = []
+        for line, row in readers[kind](data):
+            self.rows += 1
+            batch.append((line, row))
+            if len(batch) == config.IMPORT_BATCH_SIZE:
+                await self.run_batch(controller, batch)
+                batch = []
+        if len(batch) != 0:
+            await self.run_batch(controller, batch)
+
+    async def run_batch(self, controller: AsyncController, batch: list):
+        parsed = []
+        for line, row in batch:
+            try:
+                parsed.append((line, *self.parse(row)))
+            except InvalidImportRowError as e:
+                self.errors.append((line, str(e)))
+
+        current_ranks = await controller.get_user_ranks([uid for _, uid, _, _, _ in parsed])
+        ranks: Dict[int, Rank] = {}
+        groups: Set[Tuple[int, int]] = set()
+        interests: Set[Tuple[int, int]] = set()
+        for line, uid, rank, group_ids, interest_ids in parsed:
+            if uid not in current_ranks:
+                self.errors.append((line, f'пользователь {uid} не найден'))
+                continue
+            if current_ranks[uid].value > self.importer_rank.value:
+                self.errors.append((line, f'нельзя изменить пользователя {uid}'))
+                continue
+            if rank is not None and rank != current_ranks[uid]:
+                if current_ranks[uid] not in changeable_ranks[self.importer_rank]:
+                    self.errors.append((line, f'нельзя изменить ранг пользователя {uid}'))
+                    continue
+                ranks[uid] = rank
+            groups.update((uid, gid) for gid in group_ids)
+            interests.update((uid, iid) for iid in interest_ids)
+            self.applied += 1
+
+        if not self.dry_run:
+            await controller.import_users(ranks, groups, interests)
+            for uid, rank in ranks.items():
+                self.appointed.setdefault(rank, []).append(uid)
+
+    def parse(self, row: Optional[dict]) -> Tuple[int, Optional[Rank], List[int], List[int]]:
+        if row is None:
+            raise InvalidImportRowError('строка не является JSON-объектом')
+        try:
+            uid = int(str(row.get('id')).strip())
+        except ValueError:
+            raise InvalidImportRowError(f'некорректный ID {row.get("id")}')
+
+        rank = None
+        rank_name = str(row.get('rank') or '').strip().upper()
+        if rank_name != '':
+            try:
+                rank = Rank[rank_name]
+            except KeyError:
+                raise InvalidImportRowError(f'неизвестный ранг {rank_name}')
+            if rank not in assignable_ranks[self.importer_rank]:
+                raise InvalidImportRowError(f'нельзя назначить ранг {rank_name}')
+
+        return uid, rank, self.resolve(row.get('groups'), self.groups, 'группа'), \
+            self.resolve(row.get('interests'), self.interests, 'интерес')
+
+    @staticmethod
+    def resolve(value, ids: Dict[str, int], name: str) -> List[int]:
+        resolved = []
+        for item in split_names(value):
+            if item not in ids:
+                raise InvalidImportRowError(f'{name} {item} не существует')
+            resolved.append(ids[item])
+        return resolved
+
+    def report(self) -> str:
+        text = f'{"Проверка завершена" if self.dry_run else "Импорт завершен"}\n\n' \
+               f'Строк: {self.rows}\n' \
+               f'{"Будет применено" if self.dry_run else "Применено"}: {self.applied}\n' \
+               f'Ошибок: {len(self.errors)}'
+        if len(self.errors) != 0:
+            text += '\n\n' + '\n'.join(f'Строка {line}: {error}'
+                                       for line, error in sorted(self.errors)[:config.IMPORT_MAX_REPORTED_ERRORS])
+            if len(self.errors) > config.IMPORT_MAX_REPORTED_ERRORS:
+                text += f'\n... и еще {len(self.errors) - config.IMPORT_MAX_REPORTED_ERRORS}'
+        return text